@@ -0,0 +1,133 @@
+"""Compara la exportación en memoria (openpyxl normal) contra la streaming (write_only).
+
+Arma un formulario de ejemplo con las mismas hojas que exporta el formulario,
+con tablas del tamaño de un cliente agro grande, y mide tiempo y pico de
+memoria de escribir_libro() en cada modo.
+
+    python benchmarks/bench_exportacion.py [--escala 1 5 20] [--repeticiones 3]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import exportacion
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+         "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+TIPOS = ["AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
+SUBTIPOS_AGRO = ["AGRICULTURA", "GANADERIA", "TAMBO", "OTROS"]
+COLUMNAS_ANIO = ["Año en curso", "Año 1", "Año 2", "Año 3"]
+
+
+def _tabla(filas, columnas_texto, columnas_numero, rng):
+    datos = {col: [f"{col} {i}" for i in range(filas)] for col in columnas_texto}
+    datos.update({col: rng.uniform(0, 1e6, filas).round(2) for col in columnas_numero})
+    return pd.DataFrame(datos)
+
+
+def _ventas(rng, escala, con_region=False):
+    filas = []
+    for _ in range(escala):
+        for tipo in TIPOS:
+            for mes in MESES:
+                for subtipo in (SUBTIPOS_AGRO if tipo == "AGROPECUARIO" else ["COMPLETAR"]):
+                    fila = {"Mes": mes, "Tipo": tipo, "Subtipo": subtipo}
+                    fila.update({col: float(rng.uniform(0, 1e7)) for col in COLUMNAS_ANIO})
+                    if con_region:
+                        fila["Región"] = "Mercosur"
+                    filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def formulario_de_ejemplo(escala, semilla=0):
+    """[(nombre_hoja, DataFrame, con_indice)] con la forma de las hojas del formulario"""
+    rng = np.random.default_rng(semilla)
+    respuestas = {f"Pregunta {i}": f"Respuesta bastante larga número {i}" for i in range(70)}
+    hojas = [("Resumen Info General", pd.DataFrame([respuestas]), False)]
+
+    for nombre in ["Avales", "Filiatorios", "Empresas Controlantes", "Empresas Vinculadas",
+                   "Clientes a Descontar", "Proveedores", "Clientes", "Competidores", "Referencias Bancarias"]:
+        hojas.append((nombre, _tabla(5 * escala, ["Denominación", "CUIT", "Tipo", "Detalle"], ["Monto", "%"], rng), False))
+
+    hojas.append(("Deuda Bancaria", _tabla(10 * escala, ["Entidad", "Tipo de Moneda", "Garantía (*)", "Régimen"],
+                                           [f"Monto {i}" for i in range(14)], rng), False))
+    hojas.append(("Deuda Mercado", _tabla(2 * escala, ["Otros (1)", "Otros (2)", "Tipo de Moneda"],
+                                          [f"Monto {i}" for i in range(6)], rng), False))
+    hojas.append(("Deuda Comercial", _tabla(5 * escala, ["A favor de", "Tipo de Moneda", "Garantía"],
+                                            ["Monto", "Tasa", "Plazo (días)"], rng), False))
+    hojas.append(("Resumen Deuda Bancaria", _tabla(10 * escala, ["Entidad", "Tipo de Moneda", "Garantía (*)"],
+                                                   ["Monto", "Tasa"], rng), False))
+
+    hojas.append(("Ventas Interno", _ventas(rng, escala), False))
+    hojas.append(("Ventas Externo", _ventas(rng, escala, con_region=True), False))
+    hojas.append(("Compras", _ventas(rng, escala), False))
+    hojas.append(("Plan Ventas Actividad", _tabla(48 * escala, ["Actividad", "Mes"], [f"Producto {i}" for i in range(10)], rng), False))
+
+    hojas.append(("Campos Propios", _tabla(8 * escala, ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Titularidad"],
+                                           ["Has", "Valor U$/ha", "Has Hipotecadas"], rng), False))
+    hojas.append(("Campos Arrendados", _tabla(8 * escala, ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Arrendador"],
+                                              ["Has Arrendadas", "Precio"], rng), False))
+    hojas.append(("Agricultura", _tabla(24 * escala, ["Campaña"], [f"Cultivo {i}" for i in range(9)], rng), False))
+    for nombre in ["Ganadería", "Base Forrajera", "Hacienda de Terceros", "Otras Actividades"]:
+        hojas.append((nombre, _tabla(12, ["Categoría"], ["Cantidad", "Valor"], rng), False))
+    for nombre in ["Cría", "Invernada", "Feedlot", "Tambo"]:
+        df = pd.DataFrame(rng.uniform(0, 1e4, (4, 5)), index=["Propias", "De Terceros", "Gasto Directo", "Gasto Comercial"])
+        hojas.append((nombre, df, True))
+    for nombre in ["Índices Cría", "Índices Invernada", "Índices Feedlot", "Índices Tambo"]:
+        hojas.append((nombre, _tabla(5, ["Ítem"], ["Valor"], rng), False))
+
+    hojas.append(("Datos Detallados", pd.DataFrame(columns=["Origen"]), False))
+    hojas.append(("Resumen 12 Meses", _tabla(12, ["Mes-Año"], SUBTIPOS_AGRO, rng), False))
+    hojas.append(("Resumen Ventas", _tabla(12, ["Mes"], COLUMNAS_ANIO, rng), False))
+    hojas.append(("Resumen Compras", _tabla(12, ["Mes"], COLUMNAS_ANIO, rng), False))
+    hojas.append(("Comercialización", pd.DataFrame([{f"Comercializa.{i}": "Acopio" for i in range(8)}]), False))
+    return hojas
+
+
+def _exportar(hojas, streaming):
+    # Se mide también la serialización: es lo que se paga cuando la caché de hojas está fría
+    serializadas = [(nombre, exportacion.serializar_hoja(df, con_indice)) for nombre, df, con_indice in hojas]
+    return exportacion.escribir_libro(serializadas, streaming=streaming)
+
+
+def medir(hojas, streaming, repeticiones):
+    """(mediana de tiempo, pico de memoria, tamaño del xlsx); tracemalloc va en una pasada aparte"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        datos = _exportar(hojas, streaming)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    _exportar(hojas, streaming)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico, len(datos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=int, nargs="+", default=[1, 5, 20],
+                        help="multiplicador de filas de las tablas dinámicas")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'escala':>6} {'celdas':>9} {'modo':>10} {'tiempo (s)':>11} {'pico MB':>9} {'xlsx KB':>9}")
+    for escala in args.escala:
+        hojas = formulario_de_ejemplo(escala)
+        celdas = sum(df.size for _, df, _ in hojas)
+        for streaming in (False, True):
+            tiempo, pico, tamanio = medir(hojas, streaming, args.repeticiones)
+            modo = "streaming" if streaming else "memoria"
+            print(f"{escala:>6} {celdas:>9} {modo:>10} {tiempo:>11.3f} {pico / 2**20:>9.1f} {tamanio / 2**10:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
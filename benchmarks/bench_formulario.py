@@ -0,0 +1,361 @@
+"""Tiempo de rerun por pestaña, tiempo de exportación y pico de memoria según el tamaño del formulario.
+
+Carga en una sesión de streamlit.testing (AppTest) estados generados de
+tamaño creciente, como si se hubiera restaurado un progreso guardado. La
+escala 1 es un cliente chico; a más escala, más campos propios y arrendados,
+más filas de deuda, socios y libradores, y la grilla de ventas y compras
+repetida. Siempre van las tres campañas de agricultura y las cuatro
+actividades del plan de ventas. Para cada escala mide:
+
+- el rerun completo y cuánto de él se va en cada pestaña;
+- el rerun en el que se pide "Preparar archivo" con las cachés de hojas y del
+  libro vacías, o sea, la exportación completa;
+- el pico de memoria (tracemalloc) de cada uno.
+
+Sólo se cuenta la ejecución del script, no el armado del árbol de elementos de
+AppTest. Los resultados se pueden guardar en benchmarks/resultados/ y comparar
+contra la última corrida guardada: si algún tiempo empeora más que la
+tolerancia, el script termina con código 1.
+
+    python benchmarks/bench_formulario.py [--escala 1 4 16] [--repeticiones 3]
+                                          [--guardar] [--comparar] [--tolerancia 0.25] [--minimo-ms 50]
+
+Para medir otra versión del formulario, pasarla en --script. Los tiempos por
+fragmento están en bench_reruns.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "bench_formulario.jsonl"
+
+import streamlit as st
+import streamlit.runtime.scriptrunner.script_runner as script_runner
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.testing.v1 import AppTest
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+         "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+TIPOS = ["AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
+SUBTIPOS_AGRO = ["AGRICULTURA", "GANADERIA", "TAMBO", "OTROS"]
+COLUMNAS_ANIO = ["Año en curso", "Año 1", "Año 2", "Año 3"]
+CULTIVOS = ["Maíz", "Soja", "Soja 2da", "Trigo", "Cebada", "Sorgo", "Girasol", "Poroto", "Otros Cultivos"]
+INDICADORES = ["Has p/adm", "Has a %", "% Propio", "Rendimiento (tn/ha)",
+               "Gastos Comerc. y Cosecha (US$/ha)", "Gastos Directos (US$/ha)",
+               "Stock actual (tn)", "Precio Actual/Futuro (US$/tn)"]
+
+
+# --- Estado de ejemplo ---
+
+def _ventas(rng, escala, con_region=False):
+    filas = []
+    for _ in range(escala):
+        for tipo in TIPOS:
+            for mes in MESES:
+                for subtipo in (SUBTIPOS_AGRO if tipo == "AGROPECUARIO" else ["COMPLETAR"]):
+                    fila = {"Mes": mes, "Tipo": tipo, "Subtipo": subtipo}
+                    fila.update({col: round(float(rng.uniform(0, 1e7)), 2) for col in COLUMNAS_ANIO})
+                    if con_region:
+                        fila["Región"] = "Mercosur"
+                    filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def _campos(rng, filas, arrendados=False):
+    datos = {
+        "Nombre del Campo": [f"Campo {i}" for i in range(filas)],
+        "Provincia": ["Buenos Aires"] * filas,
+        "Partido": [f"Partido {i % 7}" for i in range(filas)],
+        "Localidad": [f"Localidad {i % 11}" for i in range(filas)],
+    }
+    if arrendados:
+        datos.update({
+            "Arrendador": [f"Arrendador {i}" for i in range(filas)],
+            "Has Arrendadas": rng.uniform(50, 2000, filas).round(0),
+            "Precio: US$/qq/kg. Nov": rng.uniform(5, 20, filas).round(1),
+            "Metodología de Pago (Adelantado/A cosecha/Otros)": ["Adelantado"] * filas,
+            "Duración del Contrato (años)": ["3"] * filas,
+        })
+    else:
+        datos.update({
+            "Titularidad": ["Propia"] * filas,
+            "Has": rng.uniform(50, 5000, filas).round(0),
+            "Valor U$/ha": rng.uniform(3000, 15000, filas).round(0),
+            "Has Hipotecadas": np.zeros(filas),
+            "Estado Actual (Agricola/Ganadero/Tambo/Otros)": ["Agricola"] * filas,
+        })
+    return pd.DataFrame(datos)
+
+
+def _bancos(rng, filas):
+    montos = ["Margen Total Asignado (Calificación)", "Sola Firma Utilizado", "Saldo Préstamos Amortizables Utilizado",
+              "Valor de la Cuota", "Cantidad Cuotas Faltantes", "Descuento de Cheques Utilizado",
+              "Adelanto en Cta Cte Utilizado", "Otros", "Avales SGR", "Tarjeta de Crédito Utilizado",
+              "Leasing Utilizado", "Impo/Expo Utilizado"]
+    bancos = pd.DataFrame({
+        "Entidad": rng.choice(["Banco Nación", "Galicia", "Santander", "Macro", "BBVA"], filas),
+        "Tipo de Moneda": rng.choice(["ARS", "USD"], filas),
+        "Garantía (*)": rng.choice(["Fianza / Sola Firma (F)", "Prenda (P)", "Hipoteca (H)"], filas),
+        "Régimen de Amortización (**)": rng.choice(["Mensual", "Trimestral"], filas),
+        "Tasa Promedio $": rng.uniform(30, 90, filas).round(2),
+        "Tasa Promedio USD": rng.uniform(3, 12, filas).round(2),
+        "Fecha desembolso (dd/mm/yyyy)": ["01/02/2024"] * filas,
+        "Fecha último vencimiento (dd/mm/yyyy)": ["01/02/2027"] * filas,
+    })
+    for columna in montos:
+        bancos[columna] = rng.integers(0, 1_000_000, filas)
+    return bancos
+
+
+def estado_de_ejemplo(escala, semilla=0):
+    """Claves de session_state de un formulario completo, con las tablas dinámicas escaladas"""
+    import ventas
+
+    rng = np.random.default_rng(semilla)
+    planes = {
+        "Agricultura": ["Trigo", "Maíz", "Soja", "Girasol"],
+        "Ganadería": ["Novillos", "Vaquillonas", "Terneros", "Vacas"],
+        "Tambo": ["Litros"],
+        "Otros": ["Actividad Otros"],
+    }
+    return {
+        "avales": [{"Tipo Aval": "Aval bancario", "Detalle Aval": f"Aval {i}", "Monto": 1000.0 * (i + 1),
+                    "Tipo Contragarantía": "Hipoteca", "Detalle Contragarantía": ""} for i in range(2 * escala)],
+        "filiatorios": [{"Nombre y Apellido": f"Socio {i}", "CUIT / CUIL": f"20{i:09d}", "Cargo": "SOCIO",
+                         "% Participación": round(100 / (4 * escala), 2), "Estado Civil": "CASADO",
+                         "Nombre Cónyuge": "", "CUIT / CUIL Cónyuge": "", "Fiador": "SI"} for i in range(4 * escala)],
+        "clientes_descontar": [{"Denominación": f"Librador {i}", "CUIT": f"30{i:09d}", "Tipo": "LIBRADOR A DESCONTAR",
+                                "Modalidad de Cobro": "60 DIAS", "Descuenta de Cheques": "SI"} for i in range(5 * escala)],
+        "bancos": _bancos(rng, 10 * escala),
+        "acuerdo_descubierto": 1_000_000.0,
+        "cpd_descontados": 500_000.0,
+        "ventas_compras": ventas.desde_anchas({
+            "ventas_interno": _ventas(rng, escala),
+            "ventas_externo": _ventas(rng, escala, con_region=True),
+            "compras": _ventas(rng, escala),
+        }),
+        "actividades_seleccionadas": list(planes),
+        "planes_guardados_por_actividad": {
+            actividad: pd.DataFrame({"Mes": MESES, **{col: rng.uniform(0, 1e5, 12).round(0) for col in columnas}})
+            for actividad, columnas in planes.items()
+        },
+        "df_campos": _campos(rng, 8 * escala),
+        "df_campos_arrendados": _campos(rng, 8 * escala, arrendados=True),
+        "agricultura_por_campania": {
+            campania: pd.DataFrame(rng.uniform(0, 1000, (len(INDICADORES), len(CULTIVOS))).round(1),
+                                   index=INDICADORES, columns=CULTIVOS)
+            for campania in ["ej 24/25", "ej 23/24", "ej 25/26"]
+        },
+    }
+
+
+# --- Medición ---
+
+_medicion = {"script": 0.0, "tabs": {}, "pico": 0, "memoria": False}
+
+
+def _medir_ejecucion(funcion, ctx, _original=script_runner.exec_func_with_error_handling):
+    if _medicion["memoria"]:
+        tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    try:
+        return _original(funcion, ctx)
+    finally:
+        _medicion["script"] += time.perf_counter() - inicio
+        if _medicion["memoria"]:
+            _medicion["pico"] = max(_medicion["pico"], tracemalloc.get_traced_memory()[1])
+
+
+def _tabs(etiquetas, *args, _original=st.tabs, **kwargs):
+    # Se marca cada contenedor con su etiqueta para medir los bloques ``with tabs[i]:``
+    contenedores = _original(etiquetas, *args, **kwargs)
+    for etiqueta, contenedor in zip(etiquetas, contenedores):
+        contenedor._bench_tab = etiqueta.strip("*")
+    return contenedores
+
+
+# DeltaGenerator.__getattr__ responde cualquier nombre: la marca se busca en el __dict__ de la instancia
+def _entrar(self, _original=DeltaGenerator.__enter__):
+    if "_bench_tab" in vars(self):
+        self._bench_inicio = time.perf_counter()
+    return _original(self)
+
+
+def _salir(self, *exc, _original=DeltaGenerator.__exit__):
+    tab = vars(self).get("_bench_tab")
+    if tab is not None:
+        _medicion["tabs"][tab] = _medicion["tabs"].get(tab, 0.0) + time.perf_counter() - self._bench_inicio
+    return _original(self, *exc)
+
+
+def _instrumentar():
+    script_runner.exec_func_with_error_handling = _medir_ejecucion
+    st.tabs = _tabs
+    DeltaGenerator.__enter__ = _entrar
+    DeltaGenerator.__exit__ = _salir
+
+
+def _correr(at, accion=None):
+    """(ms del script, {pestaña: ms}) de una corrida; ``accion`` la prepara (por ejemplo, un clic)"""
+    _medicion["script"] = 0.0
+    _medicion["tabs"] = {}
+    if accion is not None:
+        accion(at)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return _medicion["script"] * 1000, {tab: s * 1000 for tab, s in _medicion["tabs"].items()}
+
+
+def _pico(at, accion=None):
+    """Pico de memoria en MB durante la ejecución del script"""
+    _medicion["memoria"] = True
+    _medicion["pico"] = 0
+    tracemalloc.start()
+    try:
+        _correr(at, accion)
+    finally:
+        tracemalloc.stop()
+        _medicion["memoria"] = False
+    return _medicion["pico"] / 2**20
+
+
+def _pedir_exportacion(at):
+    # Cachés vacías: se mide el armado de todas las hojas y la escritura del libro
+    for clave in ("_excel_cache", "_hojas_cache"):
+        if clave in at.session_state:
+            del at.session_state[clave]
+    at.run()
+    [boton for boton in at.sidebar.button if "Preparar" in boton.label][0].click()
+
+
+def medir(script, escala, repeticiones):
+    at = AppTest.from_file(script, default_timeout=300)
+    at.session_state["autenticado"] = True
+    at.session_state["formulario_identificado"] = True
+    at.session_state["codigo_usuario"] = "20000000001"
+    for clave, valor in estado_de_ejemplo(escala).items():
+        at.session_state[clave] = valor
+    _correr(at)
+
+    reruns = [_correr(at) for _ in range(repeticiones)]
+    exportaciones = [_correr(at, _pedir_exportacion)[0] for _ in range(repeticiones)]
+    tabs = {tab: statistics.median(r[1].get(tab, 0.0) for r in reruns) for tab in reruns[0][1]}
+    return {
+        "escala": escala,
+        "filas_ventas": len(at.session_state["ventas_compras"]),
+        "rerun_ms": statistics.median(r[0] for r in reruns),
+        "tabs_ms": tabs,
+        "exportacion_ms": statistics.median(exportaciones),
+        "pico_rerun_mb": _pico(at),
+        "pico_exportacion_mb": _pico(at, _pedir_exportacion),
+    }
+
+
+# --- Resultados ---
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ultima_corrida(ruta=RESULTADOS):
+    if not ruta.exists():
+        return None
+    lineas = [linea for linea in ruta.read_text(encoding="utf-8").splitlines() if linea.strip()]
+    return json.loads(lineas[-1]) if lineas else None
+
+
+def regresiones(actual, anterior, tolerancia, minimo_ms):
+    """[(escala, métrica, antes, ahora)] de los tiempos que empeoraron más que ``tolerancia``.
+
+    Las diferencias de menos de ``minimo_ms`` no cuentan: en las pestañas livianas son ruido.
+    """
+    previos = {r["escala"]: r for r in anterior["resultados"]}
+    encontradas = []
+    for resultado in actual["resultados"]:
+        previo = previos.get(resultado["escala"])
+        if previo is None:
+            continue
+        metricas = [("rerun_ms", resultado["rerun_ms"], previo["rerun_ms"]),
+                    ("exportacion_ms", resultado["exportacion_ms"], previo["exportacion_ms"])]
+        metricas += [(f"tab {tab}", ms, previo["tabs_ms"].get(tab)) for tab, ms in resultado["tabs_ms"].items()]
+        for metrica, ahora, antes in metricas:
+            if antes and ahora > antes * (1 + tolerancia) and ahora - antes >= minimo_ms:
+                encontradas.append((resultado["escala"], metrica, antes, ahora))
+    return encontradas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=str(RAIZ / "formulario_streamlit_final.py"))
+    parser.add_argument("--escala", type=int, nargs="+", default=[1, 4, 16],
+                        help="multiplicador de las tablas dinámicas del estado de ejemplo")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--guardar", action="store_true", help=f"agregar la corrida a {RESULTADOS.relative_to(RAIZ)}")
+    parser.add_argument("--comparar", action="store_true", help="comparar contra la última corrida guardada")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="cuánto puede empeorar un tiempo antes de contarlo como regresión (0.25 = 25%%)")
+    parser.add_argument("--minimo-ms", type=float, default=50,
+                        help="diferencia mínima en ms para contar una regresión")
+    args = parser.parse_args()
+
+    # Borradores en una base temporal para no tocar la real
+    os.environ["FORMULARIO_PROGRESO_DB"] = str(Path(tempfile.mkdtemp()) / "progreso.sqlite3")
+    sys.path.insert(0, str(Path(args.script).resolve().parent))
+    _instrumentar()
+
+    corrida = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "maquina": platform.machine(),
+        "cpus": os.cpu_count(),
+        "resultados": [],
+    }
+    print(f"{'escala':>6} {'filas':>6} {'rerun ms':>9} {'export ms':>10} {'pico rerun MB':>14} {'pico export MB':>15}  por pestaña (ms)")
+    for escala in args.escala:
+        resultado = medir(args.script, escala, args.repeticiones)
+        corrida["resultados"].append(resultado)
+        tabs = ", ".join(f"{tab} {ms:.0f}" for tab, ms in resultado["tabs_ms"].items())
+        print(f"{escala:>6} {resultado['filas_ventas']:>6} {resultado['rerun_ms']:>9.1f} {resultado['exportacion_ms']:>10.1f} "
+              f"{resultado['pico_rerun_mb']:>14.1f} {resultado['pico_exportacion_mb']:>15.1f}  {tabs}")
+
+    anterior = ultima_corrida() if args.comparar else None
+    if args.guardar:
+        RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+        with open(RESULTADOS, "a", encoding="utf-8") as f:
+            f.write(json.dumps(corrida, ensure_ascii=False) + "\n")
+
+    if args.comparar:
+        if anterior is None:
+            print("No hay corridas guardadas para comparar.")
+            return
+        encontradas = regresiones(corrida, anterior, args.tolerancia, args.minimo_ms)
+        for escala, metrica, antes, ahora in encontradas:
+            print(f"⚠️ escala {escala}, {metrica}: {antes:.1f} -> {ahora:.1f} ms (+{ahora / antes - 1:.0%})")
+        if encontradas:
+            print(f"{len(encontradas)} regresiones contra la corrida de {anterior['fecha']} ({anterior.get('commit')})")
+            sys.exit(1)
+        print(f"Sin regresiones contra la corrida de {anterior['fecha']} ({anterior.get('commit')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Cuánto tarda guardar un borrador y si sobrevive a que maten el proceso a mitad de un guardado.
+
+Primero compara los compresores instalados (compresion.py) sobre las secciones
+de un borrador de ejemplo: tamaño total y ms para comprimir y descomprimir.
+Para cada almacén mide ``--guardados`` guardados completos de un borrador de
+ejemplo (bench_libro.estado_de_ejemplo) y da p50/p95 de codificar las secciones
+y de escribirlas. Después lanza ``--cortes`` veces un proceso que guarda sin
+parar, lo mata con SIGKILL en un momento al azar y verifica que el borrador se
+siga pudiendo cargar entero.
+
+    python benchmarks/bench_guardado.py [--almacen sqlite:///... archivos:///...]
+                                        [--guardados 50] [--cortes 20] [--niveles 1 3 9]
+
+Sin --almacen prueba un SQLite y una carpeta temporales.
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+import compresion
+import estado
+import progreso
+from bench_libro import estado_de_ejemplo
+
+CUIT = "20123456789"
+
+
+def _percentiles(tiempos):
+    ordenados = sorted(tiempos)
+    return ordenados[len(ordenados) // 2] * 1000, ordenados[int(len(ordenados) * 0.95)] * 1000
+
+
+def comparar_codecs(niveles, repeticiones=20):
+    """[(codec, nivel, bytes, ms comprimir, ms descomprimir)] para las secciones de ejemplo"""
+    secciones = estado.extraer(estado_de_ejemplo(1))
+    # El JSON de cada sección, antes de comprimir
+    textos = [compresion.descomprimir(estado.serializar_seccion(valores)) for valores in secciones.values()]
+    filas = [("sin comprimir", None, sum(len(texto) for texto in textos), 0.0, 0.0)]
+    for codec, disponible in compresion.DISPONIBLES.items():
+        if not disponible:
+            continue
+        for nivel in [None, *niveles]:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                comprimidos = [compresion.comprimir(texto, codec, nivel) for texto in textos]
+            medio = time.perf_counter()
+            for _ in range(repeticiones):
+                for comprimido in comprimidos:
+                    compresion.descomprimir(comprimido)
+            fin = time.perf_counter()
+            filas.append((codec, nivel, sum(len(comprimido) for comprimido in comprimidos),
+                          (medio - inicio) / repeticiones * 1000, (fin - medio) / repeticiones * 1000))
+    return filas
+
+
+def medir(destino, guardados):
+    """(ms codificar p50, p95, ms escribir p50, p95, bytes) de ``guardados`` guardados completos"""
+    almacen = progreso.crear_almacen(destino)
+    secciones = estado.extraer(estado_de_ejemplo(1))
+    codificar, escribir = [], []
+    for _ in range(guardados):
+        inicio = time.perf_counter()
+        bloques = {nombre: estado.serializar_seccion(valores) for nombre, valores in secciones.items()}
+        medio = time.perf_counter()
+        tamanio = almacen.guardar_codificado(CUIT, bloques)
+        codificar.append(medio - inicio)
+        escribir.append(time.perf_counter() - medio)
+    return (*_percentiles(codificar), *_percentiles(escribir), tamanio)
+
+
+def guardar_sin_parar(destino, listo):
+    almacen = progreso.crear_almacen(destino)
+    base = estado_de_ejemplo(1)
+    vuelta = 0
+    while True:
+        almacen.guardar(CUIT, estado.extraer({**base, "marca_widget": vuelta}))
+        vuelta += 1
+        listo.set()
+
+
+def cortar(destino, cortes):
+    """Errores al cargar después de matar ``cortes`` veces a un proceso que guarda"""
+    contexto = multiprocessing.get_context("spawn")
+    esperado = set(estado.extraer(estado_de_ejemplo(1)))
+    errores = []
+    for corte in range(cortes):
+        listo = contexto.Event()
+        hijo = contexto.Process(target=guardar_sin_parar, args=(destino, listo))
+        hijo.start()
+        listo.wait()
+        time.sleep(random.uniform(0, 0.05))
+        hijo.kill()
+        hijo.join()
+        try:
+            cargado = progreso.crear_almacen(destino).cargar(CUIT)
+            faltan = esperado - set(estado.extraer(cargado or {}))
+            if cargado is None or faltan:
+                errores.append(f"corte {corte}: borrador incompleto, faltan {sorted(faltan)}")
+        except Exception as e:
+            errores.append(f"corte {corte}: {type(e).__name__}: {e}")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--almacen", nargs="+", help="almacenes a probar (ver progreso.crear_almacen)")
+    parser.add_argument("--guardados", type=int, default=50)
+    parser.add_argument("--cortes", type=int, default=20, help="procesos matados a mitad de un guardado")
+    parser.add_argument("--niveles", type=int, nargs="*", default=[1, 3, 9],
+                        help="niveles a comparar además del de cada biblioteca")
+    args = parser.parse_args()
+
+    print(f"{'compresión':<14} {'nivel':>7} {'bytes':>8} {'comprimir ms':>13} {'descomprimir ms':>16}")
+    for codec, nivel, tamanio, ms_comprimir, ms_descomprimir in comparar_codecs(args.niveles):
+        print(f"{codec:<14} {'-' if nivel is None else nivel:>7} {tamanio:>8} {ms_comprimir:>13.2f} "
+              f"{ms_descomprimir:>16.2f}")
+    print(f"se guarda con {compresion.CODEC}, nivel {'por defecto' if compresion.NIVEL is None else compresion.NIVEL}\n")
+
+    carpeta = tempfile.mkdtemp()
+    destinos = args.almacen or [f"sqlite://{carpeta}/progreso.sqlite3", f"archivos://{carpeta}/borradores"]
+    fallo = False
+    print(f"{'almacén':<50} {'codificar p50/p95':>18} {'escribir p50/p95':>17} {'bytes':>8} {'cortes con error':>17}")
+    for destino in destinos:
+        cod50, cod95, esc50, esc95, tamanio = medir(destino, args.guardados)
+        errores = cortar(destino, args.cortes)
+        print(f"{destino:<50} {cod50:>8.2f}/{cod95:<6.2f}ms {esc50:>7.2f}/{esc95:<6.2f}ms {tamanio:>8} "
+              f"{len(errores):>17}")
+        for error in errores[:10]:
+            print(f"  ❌ {error}", file=sys.stderr)
+        fallo = fallo or bool(errores)
+    sys.exit(1 if fallo else 0)
+
+
+if __name__ == "__main__":
+    main()
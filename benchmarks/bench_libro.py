@@ -0,0 +1,93 @@
+"""Mide lo que cuesta usar libro.py desde un proceso aparte (lote, pruebas).
+
+Importa libro en un intérprete nuevo y verifica que no cargue pandas,
+openpyxl ni Streamlit. Después arma un estado de ejemplo (ventas y compras con
+la grilla completa, deuda bancaria, respuestas) y mide exportar(estado): la
+primera llamada, que carga las dependencias, y las siguientes.
+
+    python benchmarks/bench_libro.py [--escala 1 10] [--repeticiones 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+PESADOS = ["pandas", "numpy", "openpyxl", "streamlit"]
+
+MEDIR_IMPORT = f"""
+import json, sys, time
+inicio = time.perf_counter()
+import libro
+print(json.dumps([time.perf_counter() - inicio, [m for m in {PESADOS!r} if m in sys.modules]]))
+"""
+
+
+def medir_import(repeticiones):
+    """(mediana en segundos, módulos pesados cargados) de ``import libro`` en procesos nuevos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", MEDIR_IMPORT], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout
+        segundos, cargados = json.loads(salida)
+        tiempos.append(segundos)
+    return statistics.median(tiempos), cargados
+
+
+def estado_de_ejemplo(escala):
+    """Estado como el que guarda el formulario, con las tablas repetidas ``escala`` veces"""
+    from bench_resumenes import bancos_de_ejemplo, ventas_de_ejemplo
+
+    import ventas
+
+    return {
+        "respuestas": {f"Pregunta {i}": f"Respuesta {i}" for i in range(70)},
+        "avales": [{"Tipo Aval": "Aval bancario", "Detalle Aval": "", "Monto": 1000,
+                    "Tipo Contragarantía": "Hipoteca", "Detalle Contragarantía": ""}] * escala,
+        "ventas_compras": ventas.desde_anchas({
+            "ventas_interno": ventas_de_ejemplo(escala, 0),
+            "ventas_externo": ventas_de_ejemplo(escala, 1, con_region=True),
+            "compras": ventas_de_ejemplo(escala, 2),
+        }),
+        "bancos": bancos_de_ejemplo(escala),
+        "acuerdo_descubierto": 1000.0,
+        "cpd_descontados": 2000.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=int, nargs="+", default=[1, 10],
+                        help="cuántas veces se repiten las tablas del estado de ejemplo")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    segundos, cargados = medir_import(args.repeticiones)
+    print(f"import libro: {segundos * 1000:.1f} ms, módulos pesados cargados: {cargados or 'ninguno'}")
+
+    import libro
+
+    inicio = time.perf_counter()
+    libro.exportar(estado_de_ejemplo(1))
+    print(f"primera exportación (carga pandas y openpyxl): {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    print(f"{'escala':>6} {'exportar (ms)':>14} {'libros/s':>9} {'tamaño (KB)':>12}")
+    for escala in args.escala:
+        estado = estado_de_ejemplo(escala)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            contenido = libro.exportar(estado)
+            tiempos.append(time.perf_counter() - inicio)
+        mediana = statistics.median(tiempos)
+        print(f"{escala:>6} {mediana * 1000:>14.1f} {1 / mediana:>9.1f} {len(contenido) / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
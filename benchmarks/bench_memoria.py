@@ -0,0 +1,115 @@
+"""Compara la memoria que cuesta servir el índice geográfico y las listas de opciones
+con st.cache_data (una copia por llamada) y con objetos compartidos.
+
+st.cache_data guarda el valor en pickle y cada llamada lo vuelve a construir,
+así cada rerun de cada sesión tiene su propia copia. st.cache_resource (y las
+tuplas de opciones.py) devuelven siempre el mismo objeto. Se simulan
+``--sesiones`` reruns simultáneos que retienen lo que recibieron y se mide con
+tracemalloc lo que queda asignado, además del tiempo por llamada.
+
+El índice sale del snapshot de georef si tiene localidades; si no, se arma uno
+de ejemplo con ``--localidades`` localidades repartidas en 24 provincias.
+
+    python benchmarks/bench_memoria.py [--sesiones 1 10 50] [--localidades 4000]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import MappingProxyType
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import streamlit as st
+import streamlit.logger
+
+import georef
+import opciones
+
+# Sin runtime, Streamlit avisa en cada llamada que usa la caché en memoria
+streamlit.logger.set_log_level("error")
+
+
+def indice_de_ejemplo(cantidad, semilla=0):
+    """IndiceGeografico con ``cantidad`` localidades, 24 provincias y ~8 localidades por departamento"""
+    azar = random.Random(semilla)
+
+    def nombre():
+        palabras = azar.randint(1, 3)
+        return " ".join("".join(azar.choices(string.ascii_lowercase, k=azar.randint(4, 9))).title()
+                        for _ in range(palabras))
+
+    provincias = [f"Provincia {nombre()}" for _ in range(24)]
+    departamentos = {provincia: [] for provincia in provincias}
+    localidades = {}
+    for i in range(cantidad):
+        provincia = provincias[i % len(provincias)]
+        if i // len(provincias) % 8 == 0:
+            departamentos[provincia].append(f"Departamento {nombre()}")
+        localidades.setdefault((provincia, departamentos[provincia][-1]), []).append(nombre())
+    return georef.IndiceGeografico(provincias, departamentos, localidades)
+
+
+# Todas las tuplas de opciones.py: lo que el formulario lee directamente del módulo
+OPCIONES = MappingProxyType({nombre: valor for nombre, valor in vars(opciones).items() if isinstance(valor, tuple)})
+
+
+def medir(obtener, sesiones):
+    """(ms por llamada, MB retenidos, mismo objeto en todas) para ``sesiones`` llamadas simultáneas"""
+    obtener()  # la primera llamada llena la caché
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    retenidos = [obtener() for _ in range(sesiones)]
+    segundos = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mismo = all(valor is retenidos[0] for valor in retenidos)
+    return segundos / sesiones * 1000, memoria / 1e6, mismo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 10, 50],
+                        help="reruns simultáneos que retienen lo que recibieron de la caché")
+    parser.add_argument("--localidades", type=int, default=4000,
+                        help="tamaño del índice de ejemplo si el snapshot no tiene localidades")
+    args = parser.parse_args()
+
+    indice = georef.cargar_snapshot()
+    if indice is None or not any(indice.localidades(provincia) for provincia in indice.provincias):
+        indice = indice_de_ejemplo(args.localidades)
+    total = sum(len(indice.localidades(provincia)) for provincia in indice.provincias)
+    print(f"índice: {len(indice.provincias)} provincias, {total} localidades")
+
+    # Lo que devolvía la versión con st.cache_data: {provincia: [localidades]} y listas sueltas
+    @st.cache_data
+    def geodatos_copiados():
+        return {provincia: list(indice.localidades(provincia)) for provincia in indice.provincias}
+
+    @st.cache_data
+    def opciones_copiadas():
+        return {nombre: list(valores) for nombre, valores in OPCIONES.items()}
+
+    @st.cache_resource
+    def geodatos_compartidos():
+        return indice
+
+    casos = [
+        ("geodatos", "cache_data (copia)", geodatos_copiados),
+        ("geodatos", "cache_resource", geodatos_compartidos),
+        ("opciones", "cache_data (copia)", opciones_copiadas),
+        ("opciones", "opciones.py (tuplas)", lambda: OPCIONES),
+    ]
+    print(f"{'datos':<9} {'forma':<22} {'sesiones':>8} {'ms/llamada':>11} {'MB retenidos':>13} {'mismo objeto':>13}")
+    for datos, forma, obtener in casos:
+        for sesiones in args.sesiones:
+            ms, mb, mismo = medir(obtener, sesiones)
+            print(f"{datos:<9} {forma:<22} {sesiones:>8} {ms:>11.3f} {mb:>13.2f} {'sí' if mismo else 'no':>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Varios procesos contra el mismo almacén de progreso, como réplicas detrás de un balanceador.
+
+Cada proceso guarda borradores completos de sus propios CUIT y carga los que
+escribieron los otros, verificando que cada borrador leído sea uno entero (las
+secciones de un mismo guardado, nunca mezcla de dos). Además todos hacen
+guardados parciales del mismo CUIT, cada uno sobre una sección distinta, como
+el autoguardado de dos pestañas; al final tienen que estar las últimas
+escrituras de todos (ninguna pisada por otra).
+
+Informa operaciones por segundo por almacén y termina con código 1 si alguna
+verificación falla.
+
+    python benchmarks/bench_multiproceso.py [--almacen sqlite:///... archivos:///... redis://...]
+                                            [--procesos 2] [--cuits 10] [--rondas 20]
+
+Sin --almacen prueba un SQLite y una carpeta temporales.
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+# Sección que cada proceso escribe en el CUIT compartido (todas distintas)
+SECCIONES_PARCIALES = ["respuestas", "avales", "ventas", "deudas"]
+CUIT_COMPARTIDO = "99999999999"
+
+
+def _borrador(base, marca):
+    """Secciones de un borrador completo con ``marca`` en dos secciones distintas"""
+    import estado
+
+    return estado.extraer({**base, "respuestas": {**base["respuestas"], "marca": marca}, "marca_widget": marca})
+
+
+def _parcial(base, seccion, marca):
+    """{sección: bytes} con sólo esa sección del borrador, marcada con ``marca``"""
+    import estado
+
+    valores = {**estado.extraer(base)[seccion], f"marca_{seccion}": marca}
+    return {seccion: estado.serializar_seccion(valores)}
+
+
+def trabajar(destino, numero, procesos, cuits, rondas, barrera, resultados):
+    import progreso
+    from bench_libro import estado_de_ejemplo
+
+    almacen = progreso.crear_almacen(destino)
+    base = estado_de_ejemplo(1)
+    propios = [f"2{numero:02d}{i:08d}" for i in range(cuits)]
+    ajenos = [f"2{otro:02d}{i:08d}" for otro in range(procesos) if otro != numero for i in range(cuits)]
+    seccion = SECCIONES_PARCIALES[numero]
+    errores = []
+    operaciones = 0
+
+    barrera.wait()
+    inicio = time.perf_counter()
+    for ronda in range(rondas):
+        for cuit in propios:
+            almacen.guardar(cuit, _borrador(base, f"{numero}-{ronda}"))
+            operaciones += 1
+        for cuit in ajenos:
+            cargado = almacen.cargar(cuit)
+            operaciones += 1
+            if cargado is None:
+                continue  # el otro proceso todavía no lo guardó
+            if cargado["respuestas"]["marca"] != cargado["marca_widget"]:
+                errores.append(f"{cuit}: borrador mezclado {cargado['respuestas']['marca']} / {cargado['marca_widget']}")
+        # Guardado parcial del CUIT compartido: sólo la sección de este proceso
+        almacen.guardar_codificado(CUIT_COMPARTIDO, _parcial(base, seccion, f"{numero}-{ronda}"), completo=False)
+        operaciones += 1
+    resultados.put((numero, operaciones, time.perf_counter() - inicio, errores))
+
+
+def probar(destino, procesos, cuits, rondas):
+    """(operaciones/s, errores) de ``procesos`` procesos contra ``destino``"""
+    import progreso
+
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(procesos)
+    resultados = contexto.Queue()
+    hijos = [contexto.Process(target=trabajar, args=(destino, numero, procesos, cuits, rondas, barrera, resultados))
+             for numero in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    finales = [resultados.get() for _ in hijos]
+    for hijo in hijos:
+        hijo.join()
+
+    errores = [error for *_, errores_hijo in finales for error in errores_hijo]
+    # Cada proceso tiene que encontrar su última escritura parcial en el CUIT compartido
+    compartido = progreso.crear_almacen(destino).cargar(CUIT_COMPARTIDO)
+    for numero in range(procesos):
+        seccion = SECCIONES_PARCIALES[numero]
+        encontrada = compartido.get(f"marca_{seccion}")
+        if encontrada != f"{numero}-{rondas - 1}":
+            errores.append(f"CUIT compartido: la sección {seccion} del proceso {numero} quedó en {encontrada}")
+    operaciones = sum(operaciones for _, operaciones, _, _ in finales)
+    segundos = max(segundos for _, _, segundos, _ in finales)
+    return operaciones / segundos, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--almacen", nargs="+", help="almacenes a probar (ver progreso.crear_almacen)")
+    parser.add_argument("--procesos", type=int, default=2)
+    parser.add_argument("--cuits", type=int, default=10, help="borradores propios de cada proceso")
+    parser.add_argument("--rondas", type=int, default=20)
+    args = parser.parse_args()
+    if args.procesos > len(SECCIONES_PARCIALES):
+        parser.error(f"hasta {len(SECCIONES_PARCIALES)} procesos")
+
+    carpeta = tempfile.mkdtemp()
+    destinos = args.almacen or [f"sqlite://{carpeta}/progreso.sqlite3", f"archivos://{carpeta}/borradores"]
+    fallo = False
+    print(f"{'almacén':<60} {'ops/s':>8} {'errores':>8}")
+    for destino in destinos:
+        por_segundo, errores = probar(destino, args.procesos, args.cuits, args.rondas)
+        print(f"{destino:<60} {por_segundo:>8.0f} {len(errores):>8}")
+        for error in errores[:10]:
+            print(f"  ❌ {error}", file=sys.stderr)
+        fallo = fallo or bool(errores)
+    sys.exit(1 if fallo else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Mide cuánto tarda un rerun completo del formulario y el de cada fragmento por separado.
+
+Corre el script con streamlit.testing (AppTest), ya identificado, y toma sólo
+el tiempo de ejecución del script (sin el armado del árbol de elementos que
+hace AppTest). Los reruns de fragmento se piden igual que los pide el
+navegador al tocar un widget dentro de una sección.
+
+    python benchmarks/bench_reruns.py [--script formulario_streamlit_final.py] [--repeticiones 5]
+
+Para comparar contra una versión anterior, pasar esa versión en --script.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+import streamlit.runtime.scriptrunner.script_runner as script_runner
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+_tiempos = []
+_fragmento_pedido = None
+
+
+def _medir_ejecucion(funcion, ctx, _original=script_runner.exec_func_with_error_handling):
+    inicio = time.perf_counter()
+    try:
+        return _original(funcion, ctx)
+    finally:
+        _tiempos.append(time.perf_counter() - inicio)
+
+
+def _correr(self, widget_state=None, query_params=None, timeout=3, page_hash="",
+            _original=local_script_runner.LocalScriptRunner.run):
+    if _fragmento_pedido is not None:
+        # AppTest arranca cada corrida con un pedido de rerun completo, que se combinaría con
+        # el del fragmento: se reemplaza el pedido pendiente por uno sólo del fragmento
+        def pedir_fragmento(datos):
+            self._requests._rerun_data = replace(datos, fragment_id_queue=[_fragmento_pedido],
+                                                 is_fragment_scoped_rerun=True)
+            return True
+        self.request_rerun = pedir_fragmento
+    return _original(self, widget_state, query_params, timeout, page_hash)
+
+
+def _nombre_fragmento(envoltura):
+    # La función decorada y sus argumentos quedan en la clausura del wrapper de st.fragment
+    nombre, argumentos = "?", ()
+    for celda in envoltura.__closure__ or ():
+        contenido = celda.cell_contents
+        if callable(contenido) and getattr(contenido, "__name__", "").startswith(("seccion", "mostrar")):
+            nombre = contenido.__name__
+        elif isinstance(contenido, tuple) and contenido and all(isinstance(a, str) for a in contenido):
+            argumentos = contenido
+    return f"{nombre}({argumentos[-1]})" if argumentos else nombre
+
+
+def medir(at, repeticiones, fragmento=None):
+    """Mediana en ms del tiempo de ejecución del script (o de un fragmento)"""
+    global _fragmento_pedido
+    _fragmento_pedido = fragmento
+    muestras = []
+    try:
+        for _ in range(repeticiones):
+            _tiempos.clear()
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            muestras.append(sum(_tiempos) * 1000)
+    finally:
+        _fragmento_pedido = None
+    return statistics.median(muestras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=str(RAIZ / "formulario_streamlit_final.py"))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    # Borradores en una base temporal para no tocar la real
+    os.environ["FORMULARIO_PROGRESO_DB"] = str(Path(tempfile.mkdtemp()) / "progreso.sqlite3")
+    script_runner.exec_func_with_error_handling = _medir_ejecucion
+    local_script_runner.LocalScriptRunner.run = _correr
+
+    at = AppTest.from_file(args.script, default_timeout=120)
+    at.session_state["autenticado"] = True
+    at.session_state["formulario_identificado"] = True
+    at.session_state["codigo_usuario"] = "20000000001"
+    at.run()
+
+    print(f"{'rerun':<50} {'ms':>8}")
+    print(f"{'completo':<50} {medir(at, args.repeticiones):>8.1f}")
+    fragmentos = list(at._fragment_storage._fragments.items())
+    for fragmento_id, envoltura in fragmentos:
+        tiempo = medir(at, args.repeticiones, fragmento_id)
+        print(f"{'fragmento ' + _nombre_fragmento(envoltura):<50} {tiempo:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
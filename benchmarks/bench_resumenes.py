@@ -0,0 +1,226 @@
+"""Compara los resúmenes de resumenes.py con las versiones anteriores.
+
+Las versiones anteriores de los de ventas concatenaban en loop sobre las tablas
+anchas. Se arman tablas de ventas y compras con la grilla completa del
+formulario: los cinco tipos, los doce meses y, en AGROPECUARIO, una fila por
+cada subtipo (incluido COMPLETAR). Los resúmenes nuevos leen la tabla larga de
+ventas.py. El de deuda bancaria usaba apply fila por fila; se compara sobre
+una tabla de bancos con categóricas, como la guarda el formulario. Se verifica
+que las dos versiones den exactamente el mismo DataFrame y se mide el tiempo
+de cada una.
+
+    python benchmarks/bench_resumenes.py [--escala 1 10 100] [--repeticiones 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import opciones
+import resumenes
+import ventas
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+         "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+TIPOS = ["AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
+SUBCATEGORIAS_AGRO = ["COMPLETAR", "AGRICULTURA", "GANADERIA", "TAMBO", "OTROS"]
+
+
+def ventas_de_ejemplo(escala, semilla=0, con_region=False):
+    """Tabla de ventas como la del formulario, repetida ``escala`` veces"""
+    rng = np.random.default_rng(semilla)
+    filas = []
+    for _ in range(escala):
+        for tipo in TIPOS:
+            for mes in MESES:
+                for subtipo in (SUBCATEGORIAS_AGRO if tipo == "AGROPECUARIO" else ["COMPLETAR"]):
+                    fila = {"Mes": mes, "Tipo": tipo, "Subtipo": subtipo}
+                    fila.update({col: round(float(rng.uniform(0, 1e7)), 2) for col in ventas.COLUMNAS_ANIO})
+                    if con_region:
+                        fila["Región"] = "Mercosur"
+                    filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def resumen_12_meses_anterior(tablas, meses_largos, subcategorias_agro):
+    """La versión anterior de resumenes.resumen_12_meses, sin Streamlit"""
+    hoy = pd.to_datetime("today")
+    primer_dia_mes_actual = pd.to_datetime(hoy.strftime("%Y-%m-01"))
+    fecha_limite = primer_dia_mes_actual - pd.DateOffset(months=11)
+
+    df_union = pd.DataFrame()
+    for df in tablas:
+        if not df.empty:
+            df = df.copy()
+            meses_dict = {mes: i for i, mes in enumerate(meses_largos, start=1)}
+            df["Mes_num"] = df["Mes"].map(meses_dict)
+            df["Mes_num"] = pd.to_numeric(df["Mes_num"], errors="coerce")
+            df = df.dropna(subset=["Mes_num"])
+            df["Mes_num"] = df["Mes_num"].astype(int)
+
+            año_actual = pd.to_datetime("today").year
+            columnas_anio = ["Año en curso", "Año 1", "Año 2", "Año 3"]
+
+            version_expandida = pd.DataFrame()
+            for i, columna in enumerate(columnas_anio):
+                parcial = df.copy()
+                parcial["Año destino"] = año_actual - i
+                parcial["Monto"] = pd.to_numeric(parcial[columna], errors="coerce").fillna(0)
+                version_expandida = pd.concat([version_expandida, parcial], ignore_index=True)
+
+            version_expandida["Fecha"] = pd.to_datetime(
+                version_expandida["Año destino"].astype(str) + "-" + version_expandida["Mes_num"].astype(str).str.zfill(2) + "-01",
+                errors="coerce"
+            )
+            df_union = pd.concat([df_union, version_expandida], ignore_index=True)
+
+    df_12m = df_union[df_union["Fecha"] >= fecha_limite].copy()
+    if df_12m.empty:
+        return None
+
+    df_12m["Subtipo"] = df_12m["Subtipo"].astype(str).str.upper().str.strip()
+    df_12m = df_12m[df_12m["Subtipo"] != "COMPLETAR"]
+    df_12m["Mes-Año"] = df_12m["Fecha"].dt.strftime("%m-%Y")
+
+    rango_fechas = pd.date_range(end=hoy, periods=12, freq="MS")
+    mes_anio_str = rango_fechas.strftime("%m-%Y")
+    subtipos_validos = [s for s in subcategorias_agro if s != "COMPLETAR"]
+    index_completo = pd.MultiIndex.from_product(
+        [mes_anio_str, [s.upper() for s in subtipos_validos]],
+        names=["Mes-Año", "Subtipo"]
+    )
+
+    df_agrupado = (
+        df_12m.groupby(["Mes-Año", "Subtipo"])["Monto"]
+        .sum()
+        .reindex(index_completo, fill_value=0)
+        .reset_index()
+    )
+
+    df_por_subtipo = df_agrupado.pivot(index="Mes-Año", columns="Subtipo", values="Monto").fillna(0).reset_index()
+    df_por_subtipo["Orden"] = pd.to_datetime(df_por_subtipo["Mes-Año"], format="%m-%Y")
+    return df_por_subtipo.sort_values("Orden", ascending=False).drop(columns="Orden")
+
+
+def resumen_mensual_anterior(tablas, meses_largos):
+    """La versión anterior de resumenes.resumen_mensual, sin Streamlit"""
+    df_final = pd.DataFrame()
+    columnas_anio = ["Año en curso", "Año 1", "Año 2", "Año 3"]
+    meses_dict = {mes: i for i, mes in enumerate(meses_largos, start=1)}
+
+    for df in tablas:
+        df = df.copy()
+        df = df.dropna(subset=["Mes"])
+        df["Mes"] = df["Mes"].astype(str)
+        df["Mes_num"] = df["Mes"].map(meses_dict)
+        df = df.dropna(subset=["Mes_num"])
+
+        for col in columnas_anio:
+            parcial = df.copy()
+            parcial["Monto"] = pd.to_numeric(parcial[col], errors="coerce").fillna(0)
+            parcial["Columna_año"] = col
+            parcial = parcial[["Mes", "Monto", "Columna_año"]]
+            df_final = pd.concat([df_final, parcial], ignore_index=True)
+
+    if df_final.empty:
+        return pd.DataFrame(0, index=pd.Index(meses_largos, name="Mes"),
+                            columns=pd.Index(columnas_anio, name="Columna_año")).reset_index()
+    resumen = df_final.groupby(["Mes", "Columna_año"])["Monto"].sum().unstack("Columna_año").fillna(0)
+    return resumen.reindex(meses_largos).fillna(0).reset_index()
+
+
+def bancos_de_ejemplo(escala, semilla=0):
+    """Deuda bancaria con ``escala`` * 10 filas, algunas repetidas por entidad y moneda"""
+    rng = np.random.default_rng(semilla)
+    n = escala * 10
+    bancos = pd.DataFrame({
+        "Entidad": rng.choice(["Banco Nación", "Galicia ", "Santander", "", None], n),
+        "Tipo de Moneda": rng.choice([*opciones.MONEDAS, None], n),
+        "Garantía (*)": rng.choice([*opciones.GARANTIAS, ""], n),
+        "Fecha desembolso (dd/mm/yyyy)": rng.choice(["01/02/2024", "", "nan"], n),
+        "Fecha último vencimiento (dd/mm/yyyy)": rng.choice(["01/02/2027", ""], n),
+        "Tasa Promedio $": rng.uniform(30, 90, n).round(2),
+        "Tasa Promedio USD": rng.uniform(3, 12, n).round(2),
+    })
+    for columna in resumenes.COLUMNAS_MONTOS_BANCOS:
+        bancos[columna] = rng.integers(0, 1_000_000, n)
+    return opciones.categorizar(bancos, "bancos")
+
+
+def resumen_deuda_bancaria_anterior(bancos, acuerdo_descubierto, cpd_descontados):
+    """La versión anterior de resumenes.resumen_deuda_bancaria, sin Streamlit"""
+    bancos_df1 = bancos.copy()
+    bancos_df1["Monto"] = bancos_df1[resumenes.COLUMNAS_MONTOS_BANCOS].sum(axis=1)
+    bancos_df1["Tasa"] = bancos_df1.apply(
+        lambda row: row["Tasa Promedio $"] if row["Tipo de Moneda"] == "ARS" else row["Tasa Promedio USD"],
+        axis=1
+    )
+    cols_clave = resumenes.CLAVES_DEUDA_BANCARIA
+    for col in cols_clave:
+        bancos_df1[col] = bancos_df1[col].astype(object).fillna("").astype(str).str.strip().replace("nan", "")
+    resumen = bancos_df1.groupby(cols_clave).agg({"Monto": "sum", "Tasa": "mean"}).reset_index()
+    resumen = resumen.sort_values(by="Entidad")
+    fila_total = pd.DataFrame({columna: [""] for columna in cols_clave + ["Monto", "Tasa"]})
+    resumen_final = pd.concat([resumen, fila_total], ignore_index=True)
+    resumen_final["Acuerdo Descubierto"] = ""
+    resumen_final["CPD Descontados"] = ""
+    if len(resumen_final) > 1:
+        resumen_final.loc[1, "Acuerdo Descubierto"] = acuerdo_descubierto
+        resumen_final.loc[1, "CPD Descontados"] = cpd_descontados
+    return resumen_final
+
+
+def _mediana(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=int, nargs="+", default=[1, 10, 100],
+                        help="cuántas veces se repite la grilla completa en cada tabla")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'resumen':<10} {'escala':>6} {'filas':>7} {'anterior (ms)':>14} {'nuevo (ms)':>11} {'mejora':>7}")
+    for escala in args.escala:
+        interno, externo = ventas_de_ejemplo(escala, 0), ventas_de_ejemplo(escala, 1, con_region=True)
+        compras = ventas_de_ejemplo(escala, 2)
+        largo = ventas.desde_anchas({"ventas_interno": interno, "ventas_externo": externo, "compras": compras})
+        flujos_ventas = ["ventas_interno", "ventas_externo"]
+        filas_ventas = len(interno) + len(externo) + len(compras)
+        bancos = bancos_de_ejemplo(escala)
+
+        casos = [
+            ("12 meses", filas_ventas,
+             lambda: resumen_12_meses_anterior([interno, externo], MESES, SUBCATEGORIAS_AGRO),
+             lambda: resumenes.resumen_12_meses(largo, flujos_ventas, MESES, SUBCATEGORIAS_AGRO)),
+            ("ventas", filas_ventas,
+             lambda: resumen_mensual_anterior([interno, externo], MESES),
+             lambda: resumenes.resumen_mensual(largo, flujos_ventas, MESES)),
+            ("compras", filas_ventas,
+             lambda: resumen_mensual_anterior([compras], MESES),
+             lambda: resumenes.resumen_mensual(largo, ["compras"], MESES)),
+            ("deuda", len(bancos),
+             lambda: resumen_deuda_bancaria_anterior(bancos, 1000.0, 2000.0),
+             lambda: resumenes.resumen_deuda_bancaria(bancos, 1000.0, 2000.0)),
+        ]
+        for nombre, filas, anterior, nuevo in casos:
+            pd.testing.assert_frame_equal(nuevo(), anterior(), check_exact=True)
+            t_anterior = _mediana(anterior, args.repeticiones)
+            t_nuevo = _mediana(nuevo, args.repeticiones)
+            print(f"{nombre:<10} {escala:>6} {filas:>7} {t_anterior * 1000:>14.1f} {t_nuevo * 1000:>11.1f} "
+                  f"{t_anterior / t_nuevo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
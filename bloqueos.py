@@ -0,0 +1,61 @@
+"""Bloqueos exclusivos entre procesos con un archivo de bloqueo por recurso.
+
+Sirven para que varias réplicas del formulario (en la misma máquina o sobre un
+volumen compartido) no escriban a la vez el mismo borrador ni descarguen a la
+vez el snapshot de georef. Usa flock, que también excluye a otros hilos del
+mismo proceso; en Windows, msvcrt.locking.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ESPERA_REINTENTO = 0.01  # segundos entre intentos cuando no hay flock
+
+
+def _tomar(fd, esperar):
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not esperar:
+                return False
+            time.sleep(ESPERA_REINTENTO)
+
+
+def _soltar(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def bloqueo(ruta, esperar=True):
+    """Toma el bloqueo de ``ruta`` (se crea vacío si no existe) mientras dura el bloque.
+
+    Con ``esperar=False`` no se queda esperando: el bloque recibe False si otro
+    proceso o hilo lo tiene tomado, y True si lo obtuvo.
+    """
+    fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        obtenido = _tomar(fd, esperar)
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                _soltar(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,117 @@
+"""Compresión de las secciones guardadas: zstd, lz4 o zlib.
+
+FORMULARIO_COMPRESION elige con qué se comprime lo que se guarda ("zstd",
+"lz4" o "zlib"; por defecto zstd) y FORMULARIO_COMPRESION_NIVEL el nivel (si no
+se indica, el de cada biblioteca). ``zstandard`` y ``lz4`` están en
+requirements.txt; si el elegido no está instalado o el nombre no es uno de
+esos, se usa zlib con su nivel por defecto y un aviso en el log. Un nivel que
+no es un número o que el compresor no acepta (ver NIVELES) también queda en
+el nivel por defecto, con un aviso.
+
+Para descomprimir no hace falta saber con qué se guardó: cada formato empieza
+con su número mágico (zstd 28 B5 2F FD, lz4 04 22 4D 18) y lo demás es zlib,
+así siguen abriendo los borradores anteriores.
+"""
+import logging
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+log = logging.getLogger(__name__)
+
+MAGIA_ZSTD = b"\x28\xb5\x2f\xfd"
+MAGIA_LZ4 = b"\x04\x22\x4d\x18"
+
+
+def _comprimir_zstd(datos, nivel):
+    # Un compresor por llamada: no se pueden compartir entre hilos
+    return zstandard.ZstdCompressor(level=3 if nivel is None else nivel).compress(datos)
+
+
+def _comprimir_lz4(datos, nivel):
+    return lz4.frame.compress(datos, compression_level=0 if nivel is None else nivel)
+
+
+def _comprimir_zlib(datos, nivel):
+    return zlib.compress(datos, -1 if nivel is None else nivel)
+
+
+COMPRESORES = {"zstd": _comprimir_zstd, "lz4": _comprimir_lz4, "zlib": _comprimir_zlib}
+# Niveles que acepta cada compresor
+NIVELES = {"zstd": range(1, 23), "lz4": range(0, 17), "zlib": range(-1, 10)}
+DISPONIBLES = {"zstd": zstandard is not None, "lz4": lz4 is not None, "zlib": True}
+
+
+def _elegir(nombre):
+    if nombre is None:
+        return "zstd" if DISPONIBLES["zstd"] else "zlib"
+    if nombre not in COMPRESORES:
+        # Un error de tipeo en la configuración no tiene que tirar abajo el formulario
+        log.warning("FORMULARIO_COMPRESION desconocida: %r (zstd, lz4 o zlib); se usa zlib", nombre)
+        return "zlib"
+    if not DISPONIBLES[nombre]:
+        paquete = "zstandard" if nombre == "zstd" else nombre
+        log.warning("Compresión %s no disponible (pip install %s); se usa zlib", nombre, paquete)
+        return "zlib"
+    return nombre
+
+
+def _leer_nivel(texto, codec):
+    """El nivel de FORMULARIO_COMPRESION_NIVEL para ``codec``, o None (el de la biblioteca) si no sirve"""
+    if not texto or not texto.strip():
+        return None
+    try:
+        nivel = int(texto)
+    except ValueError:
+        log.warning("FORMULARIO_COMPRESION_NIVEL no es un número: %r; se usa el nivel por defecto", texto)
+        return None
+    niveles = NIVELES[codec]
+    if nivel not in niveles:
+        log.warning("Nivel %d fuera de rango para %s (%d a %d); se usa el nivel por defecto",
+                    nivel, codec, niveles[0], niveles[-1])
+        return None
+    return nivel
+
+
+_pedido = (os.environ.get("FORMULARIO_COMPRESION") or "").strip().lower() or None
+CODEC = _elegir(_pedido)
+_nivel = os.environ.get("FORMULARIO_COMPRESION_NIVEL")
+# El nivel es del compresor pedido: no se le pasa a zlib si hubo que volver a él
+NIVEL = _leer_nivel(_nivel, CODEC) if CODEC == (_pedido or "zstd") else None
+
+
+def comprimir(datos, codec=None, nivel=None):
+    """Bytes comprimidos con ``codec`` (por defecto CODEC y NIVEL)"""
+    if codec is None:
+        codec, nivel = CODEC, NIVEL
+    return COMPRESORES[codec](datos, nivel)
+
+
+def codec_de(datos):
+    """Con qué se comprimieron ``datos``, según el número mágico"""
+    if datos[:4] == MAGIA_ZSTD:
+        return "zstd"
+    if datos[:4] == MAGIA_LZ4:
+        return "lz4"
+    return "zlib"
+
+
+def descomprimir(datos):
+    codec = codec_de(datos)
+    if not DISPONIBLES[codec]:
+        paquete = "zstandard" if codec == "zstd" else codec
+        raise RuntimeError(f"El progreso se guardó con {codec}: hace falta el paquete {paquete}")
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(datos)
+    if codec == "lz4":
+        return lz4.frame.decompress(datos)
+    return zlib.decompress(datos)
@@ -0,0 +1,247 @@
+"""Esquema de la parte persistente del formulario y su serialización sin pickle.
+
+El estado se guarda por secciones. Cada sección es un JSON comprimido (ver compresion.py);
+los DataFrames van en forma columnar (una lista por columna más sus dtypes; las
+categóricas como códigos más sus categorías) y las fechas con una etiqueta
+explícita. Al cargar sólo se decodifican las secciones pedidas y nunca se
+ejecuta código a partir del archivo.
+
+Formato del payload:
+    b"SGR2" | largo del encabezado (4 bytes, big endian) | encabezado JSON | secciones
+El encabezado es ``[[sección, offset, largo], ...]`` relativo al fin del encabezado.
+"""
+import datetime
+import json
+import math
+import struct
+
+import numpy as np
+import pandas as pd
+
+import compresion
+
+MAGIA = b"SGR2"
+
+# Sección -> claves de session_state que la forman
+SECCIONES = {
+    "respuestas": ("respuestas",),
+    "avales": ("avales",),
+    "filiatorios": ("filiatorios",),
+    "empresas": ("empresas_controlantes", "empresas_vinculadas"),
+    "terceros": ("clientes_descontar", "proveedores", "clientes", "competidores", "referencias_bancarias"),
+    "deudas": ("bancos", "mercado", "deudas_comerciales", "acuerdo_descubierto", "cpd_descontados"),
+    # Tabla larga de ventas.py; los progresos viejos traen ventas_interno, ventas_externo y compras
+    "ventas": ("ventas_compras",),
+    "planes": ("planes_guardados_por_actividad", "actividades_seleccionadas"),
+    "agricultura": ("agricultura_por_campania", "nombres_visibles_campanias"),
+    "campos": ("df_campos", "df_campos_arrendados"),
+    "ganaderia": (
+        "df_cria", "indices_cria", "df_invernada", "indices_invernada",
+        "df_feedlot", "indices_feedlot", "df_tambo", "indices_tambo",
+        "df_base_forrajera", "df_hacienda", "df_otros",
+    ),
+}
+# Valores de widgets sueltos (text_input, selectbox, date_input...) que no están en otra sección
+SECCION_WIDGETS = "widgets"
+
+# Claves de control de la sesión que nunca se guardan
+CLAVES_DE_SESION = ("autenticado", "formulario_identificado", "codigo_usuario", "descarga_confirmada")
+# Prefijos de claves internas o de widgets (data_editor, botones, formularios) que no se guardan
+PREFIJOS_NO_PERSISTENTES = (
+    "_", "editor_", "FormSubmitter:", "delete_", "eliminar_cultivo_", "guardar_", "btn_guardar_",
+    "Agregar", "ventas_interno_", "ventas_externo_", "compras_", "resumen_",
+)
+
+# Claves que el formulario ya no usa pero que traen los progresos viejos; se guardan en su
+# sección para que el formulario las convierta al cargarlas
+CLAVES_ANTERIORES = {"ventas_interno": "ventas", "ventas_externo": "ventas", "compras": "ventas"}
+
+SECCION_DE_CLAVE = {clave: seccion for seccion, claves in SECCIONES.items() for clave in claves}
+SECCION_DE_CLAVE.update(CLAVES_ANTERIORES)
+
+
+def _es_valor_widget(valor):
+    if isinstance(valor, (list, tuple)):
+        return all(_es_valor_widget(v) for v in valor)
+    return valor is None or isinstance(valor, (str, bool, int, float, datetime.date))
+
+
+def es_clave_persistente(clave):
+    """True si la clave es parte del progreso que se guarda y se restaura"""
+    if clave in SECCION_DE_CLAVE:
+        return True
+    return clave not in CLAVES_DE_SESION and not clave.startswith(PREFIJOS_NO_PERSISTENTES)
+
+
+def extraer(session_state):
+    """{sección: {clave: valor}} con lo que el esquema define como persistente.
+
+    Las claves que no figuran en SECCIONES van a la sección de widgets sólo si
+    su valor es de un tipo simple (texto, número, fecha o listas de eso).
+    """
+    secciones = {}
+    for clave, valor in session_state.items():
+        if not es_clave_persistente(clave):
+            continue
+        seccion = SECCION_DE_CLAVE.get(clave)
+        if seccion is None:
+            if not _es_valor_widget(valor):
+                continue
+            seccion = SECCION_WIDGETS
+        secciones.setdefault(seccion, {})[clave] = valor
+    return secciones
+
+
+# --- Codificación de valores ---
+
+def _codificar(valor):
+    if valor is None or type(valor) in (str, int, float, bool):
+        return _escalar(valor)
+    if isinstance(valor, pd.DataFrame):
+        return {"__df__": _df_a_dict(valor)}
+    if isinstance(valor, dict):
+        return {"__dict__": [[_codificar(k), _codificar(v)] for k, v in valor.items()]}
+    if isinstance(valor, (list, tuple)):
+        return [_codificar(v) for v in valor]
+    return _escalar(valor)
+
+
+def _escalar(valor):
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        valor = float(valor)
+        return None if math.isnan(valor) else valor
+    if valor is pd.NaT or valor is pd.NA:
+        return None
+    if isinstance(valor, datetime.datetime):
+        return {"__fechahora__": valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {"__fecha__": valor.isoformat()}
+    raise TypeError(f"Tipo no soportado en el esquema del formulario: {type(valor).__name__}")
+
+
+def _decodificar(valor):
+    if isinstance(valor, list):
+        return [_decodificar(v) for v in valor]
+    if isinstance(valor, dict):
+        if "__df__" in valor:
+            return _dict_a_df(valor["__df__"])
+        if "__dict__" in valor:
+            return {_decodificar(k): _decodificar(v) for k, v in valor["__dict__"]}
+        if "__fechahora__" in valor:
+            return datetime.datetime.fromisoformat(valor["__fechahora__"])
+        if "__fecha__" in valor:
+            return datetime.date.fromisoformat(valor["__fecha__"])
+    return valor
+
+
+def _df_a_dict(df):
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        indice = len(df.index)
+    else:
+        indice = [_escalar(v) for v in df.index]
+    datos = []
+    categorias = {}
+    for i, (_, serie) in enumerate(df.items()):
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Las categóricas van como códigos enteros más sus categorías, así se conservan las no usadas
+            categorias[str(i)] = [[_codificar(c) for c in serie.cat.categories], bool(serie.cat.ordered)]
+            datos.append(serie.cat.codes.tolist())
+            continue
+        valores = serie.tolist()
+        # Las columnas numéricas ya salen de tolist() como int/float/bool de Python (NaN lo acepta json)
+        if not (isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "biuf"):
+            valores = [_codificar(v) for v in valores]
+        datos.append(valores)
+    codificado = {
+        "columnas": [_escalar(c) for c in df.columns],
+        "tipos": [str(t) for t in df.dtypes],
+        "indice": indice,
+        "nombre_indice": _escalar(df.index.name),
+        "datos": datos,
+    }
+    if categorias:
+        codificado["categorias"] = categorias
+    return codificado
+
+
+def _columna(valores, tipo):
+    if tipo != "object":
+        try:
+            return np.array(valores, dtype=tipo)
+        except (TypeError, ValueError):
+            pass
+    # Celda por celda para que numpy no convierta listas en dimensiones
+    columna = np.empty(len(valores), dtype=object)
+    for i, v in enumerate(valores):
+        columna[i] = _decodificar(v)
+    if tipo == "object":
+        return columna
+    # dtypes de pandas (string, Int64, datetime...) o columnas que no entran en el dtype original
+    try:
+        return pd.array(columna).astype(tipo)
+    except (TypeError, ValueError):
+        return columna
+
+
+def _dict_a_df(datos):
+    if isinstance(datos["indice"], int):
+        indice = pd.RangeIndex(datos["indice"])
+    else:
+        indice = pd.Index([_decodificar(v) for v in datos["indice"]], name=datos["nombre_indice"])
+
+    categorias = datos.get("categorias", {})
+    columnas = {}
+    for i, (valores, tipo) in enumerate(zip(datos["datos"], datos["tipos"])):
+        if str(i) in categorias:
+            nombres, ordenada = categorias[str(i)]
+            columnas[i] = pd.Categorical.from_codes(valores, categories=[_decodificar(c) for c in nombres],
+                                                    ordered=ordenada)
+        else:
+            columnas[i] = _columna(valores, tipo)
+    df = pd.DataFrame(columnas, index=indice)
+    df.columns = [_decodificar(c) for c in datos["columnas"]]
+    return df
+
+
+# --- Payload ---
+
+def serializar_seccion(valores):
+    """{clave: valor} -> bytes comprimidos de una sección"""
+    texto = json.dumps({clave: _codificar(v) for clave, v in valores.items()},
+                       ensure_ascii=False, separators=(",", ":"))
+    return compresion.comprimir(texto.encode("utf-8"))
+
+
+def deserializar_seccion(datos):
+    return {clave: _decodificar(v) for clave, v in json.loads(compresion.descomprimir(datos)).items()}
+
+
+def serializar(secciones):
+    """{sección: {clave: valor}} -> payload con todas las secciones"""
+    bloques = [(nombre, serializar_seccion(valores)) for nombre, valores in secciones.items()]
+    encabezado = []
+    offset = 0
+    for nombre, bloque in bloques:
+        encabezado.append([nombre, offset, len(bloque)])
+        offset += len(bloque)
+    cabecera = json.dumps(encabezado).encode("utf-8")
+    return b"".join([MAGIA, struct.pack(">I", len(cabecera)), cabecera] + [b for _, b in bloques])
+
+
+def deserializar(payload, secciones=None):
+    """Payload -> {clave: valor} plano; con ``secciones`` sólo decodifica esas"""
+    if payload[:4] != MAGIA:
+        raise ValueError("El payload no es un progreso del formulario")
+    (largo,) = struct.unpack(">I", payload[4:8])
+    inicio = 8 + largo
+    estado = {}
+    for nombre, offset, tamanio in json.loads(payload[8:inicio]):
+        if secciones is None or nombre in secciones:
+            estado.update(deserializar_seccion(payload[inicio + offset:inicio + offset + tamanio]))
+    return estado
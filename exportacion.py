@@ -0,0 +1,140 @@
+"""Armado del libro Excel de exportación a partir de hojas serializadas.
+
+Cada hoja se convierte una sola vez a filas de valores planos (lo que openpyxl
+escribe en las celdas) y se guarda en un CacheHojas junto con la huella de los
+datos de los que salió. Al volver a exportar, sólo se reconstruyen las hojas
+cuya huella cambió; el resto se toma de la caché.
+
+Por defecto el libro se escribe en modo streaming (openpyxl write_only): las
+filas van directo al XML de cada hoja sin armar un objeto por celda, así la
+memoria no crece con el tamaño de las tablas. Comparativa en
+benchmarks/bench_exportacion.py.
+"""
+import datetime
+import io
+import math
+import numbers
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# filas: tuplas de valores de celda, la primera es el encabezado
+# columnas_indice: cuántas columnas iniciales son el índice del DataFrame
+HojaSerializada = namedtuple("HojaSerializada", ["filas", "columnas_indice"])
+
+# Mismo formato que aplica pandas.to_excel a encabezados e índice
+_BORDE_FINO = Side(style="thin")
+ESTILO_ENCABEZADO = {
+    "font": Font(bold=True),
+    "border": Border(left=_BORDE_FINO, right=_BORDE_FINO, top=_BORDE_FINO, bottom=_BORDE_FINO),
+    "alignment": Alignment(horizontal="center", vertical="top"),
+}
+
+
+def valor_celda(valor):
+    """Convierte un valor de pandas/numpy a uno que openpyxl pueda escribir (como to_excel)"""
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, numbers.Integral):
+        return int(valor)
+    if isinstance(valor, numbers.Real):
+        valor = float(valor)
+        if math.isinf(valor):
+            return "inf" if valor > 0 else "-inf"
+        return valor
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, (str, datetime.datetime, datetime.date, datetime.time)):
+        return valor
+    return str(valor)
+
+
+def serializar_hoja(df, con_indice=False):
+    """DataFrame -> HojaSerializada con encabezado y (opcionalmente) el índice como primera columna"""
+    encabezado = list(df.columns)
+    if con_indice:
+        encabezado = [df.index.name] + encabezado
+    filas = [tuple(valor_celda(v) for v in encabezado)]
+    for fila in df.itertuples(index=con_indice, name=None):
+        filas.append(tuple(valor_celda(v) for v in fila))
+    return HojaSerializada(tuple(filas), 1 if con_indice else 0)
+
+
+class CacheHojas:
+    """Hojas ya serializadas, por nombre de hoja, junto con la huella de su fuente"""
+
+    def __init__(self):
+        self._hojas = {}
+
+    def obtener(self, nombre_hoja, huella_fuente, construir, con_indice=False):
+        """Devuelve la hoja cacheada o la reconstruye si la huella cambió.
+
+        ``construir`` arma el DataFrame de la hoja; si devuelve None la hoja no se exporta.
+        """
+        cacheada = self._hojas.get(nombre_hoja)
+        if cacheada is None or cacheada[0] != huella_fuente:
+            df = construir()
+            hoja = serializar_hoja(df, con_indice) if df is not None else None
+            cacheada = (huella_fuente, hoja)
+            self._hojas[nombre_hoja] = cacheada
+        return cacheada[1]
+
+
+def _aplicar_estilo(celda):
+    for atributo, valor in ESTILO_ENCABEZADO.items():
+        setattr(celda, atributo, valor)
+
+
+def _escribir_en_memoria(ws, hoja):
+    for fila in hoja.filas:
+        ws.append(fila)
+
+    for celda in ws[1]:
+        if celda.value is not None:
+            _aplicar_estilo(celda)
+    if hoja.columnas_indice:
+        for fila in ws.iter_rows(min_row=2, max_col=hoja.columnas_indice):
+            for celda in fila:
+                _aplicar_estilo(celda)
+
+
+def _celda_encabezado(ws, valor):
+    celda = WriteOnlyCell(ws, value=valor)
+    _aplicar_estilo(celda)
+    return celda
+
+
+def _escribir_streaming(ws, hoja):
+    # En write_only no se puede volver atrás a dar formato: el estilo va en la celda al escribirla
+    encabezado, *filas = hoja.filas
+    ws.append([_celda_encabezado(ws, v) if v is not None else None for v in encabezado])
+
+    n = hoja.columnas_indice
+    for fila in filas:
+        if n:
+            fila = [_celda_encabezado(ws, v) for v in fila[:n]] + list(fila[n:])
+        ws.append(fila)
+
+
+def escribir_libro(hojas, streaming=True):
+    """Arma el .xlsx a partir de [(nombre_hoja, HojaSerializada)] y devuelve los bytes"""
+    libro = Workbook(write_only=streaming)
+    if not streaming:
+        libro.remove(libro.active)
+
+    for nombre_hoja, hoja in hojas:
+        ws = libro.create_sheet(title=nombre_hoja)
+        if streaming:
+            _escribir_streaming(ws, hoja)
+        else:
+            _escribir_en_memoria(ws, hoja)
+
+    output = io.BytesIO()
+    libro.save(output)
+    return output.getvalue()
@@ -0,0 +1,122 @@
+"""Regenera los Excel de exportación a partir de los progresos guardados, sin Streamlit.
+
+Arma, para cada borrador, el mismo libro que descarga el formulario (libro.py)
+y lo escribe como ``formulario_{cuit}.xlsx``. Los borradores se leen del almacén
+de progreso.py (todos, o los CUIT pedidos) y de archivos ``progreso_*.pkl`` de
+versiones anteriores, que se leen tal cual sin migrarlos. Cada libro se arma en
+un proceso aparte del pool; al final se informa cuántos libros por segundo se
+generaron.
+
+    python exportar_lote.py [--db progreso.sqlite3 | archivos:///... | redis://...] [--cuit 20123456789 ...]
+                            [--pkl progreso_*.pkl] [--salida exportados] [--procesos 4]
+
+Los .pkl son archivos que escribió el propio servidor; no usar con pickles que
+vengan de afuera.
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import libro
+import progreso
+
+# Un almacén por proceso del pool (cada uno abre su propia conexión)
+_almacenes = {}
+
+
+def _almacen(ruta):
+    if ruta not in _almacenes:
+        _almacenes[ruta] = progreso.crear_almacen(ruta)
+    return _almacenes[ruta]
+
+
+def cuit_de(origen):
+    """CUIT de un borrador: ("db", ruta, cuit) o ("pkl", ruta de progreso_{cuit}.pkl)"""
+    if origen[0] == "db":
+        return origen[2]
+    return Path(origen[1]).stem.removeprefix("progreso_")
+
+
+def cargar(origen):
+    """{clave: valor} guardado de un borrador, o None si no hay"""
+    if origen[0] == "db":
+        return _almacen(origen[1]).cargar(origen[2])
+    with open(origen[1], "rb") as f:
+        return pickle.load(f)
+
+
+def exportar(origen, salida):
+    """Escribe el libro de un borrador; devuelve (cuit, bytes escritos, segundos, error)"""
+    inicio = time.perf_counter()
+    cuit = cuit_de(origen)
+    try:
+        estado = cargar(origen)
+        if estado is None:
+            raise ValueError("no hay progreso guardado")
+        contenido = libro.exportar(estado)
+        (Path(salida) / f"formulario_{cuit}.xlsx").write_bytes(contenido)
+        return cuit, len(contenido), time.perf_counter() - inicio, None
+    except Exception as e:
+        return cuit, 0, time.perf_counter() - inicio, f"{type(e).__name__}: {e}"
+
+
+def origenes(args):
+    lista = []
+    if args.db is not None:
+        cuits = args.cuit or [cuit for cuit, *_ in progreso.crear_almacen(args.db).listar()]
+        lista += [("db", args.db, cuit) for cuit in cuits]
+    lista += [("pkl", ruta) for ruta in args.pkl]
+    return lista
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=progreso.DESTINO,
+                        help="almacén de progresos: SQLite o URL archivos:// o redis:// (vacío para no leerlo)")
+    parser.add_argument("--cuit", nargs="+", default=[], help="sólo estos CUIT de la base")
+    parser.add_argument("--pkl", nargs="+", default=[], help="archivos progreso_*.pkl de versiones anteriores")
+    parser.add_argument("--salida", default="exportados", help="carpeta donde se escriben los .xlsx")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(),
+                        help="procesos del pool (1 = en este proceso, sin pool)")
+    args = parser.parse_args()
+    if args.db and "://" not in args.db and not Path(args.db).exists():
+        if args.cuit:
+            parser.error(f"no existe la base {args.db}")
+        args.db = None
+    args.db = args.db or None
+
+    lista = origenes(args)
+    if not lista:
+        parser.error("no hay progresos para exportar")
+    Path(args.salida).mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    if args.procesos == 1:
+        resultados = [exportar(origen, args.salida) for origen in lista]
+    else:
+        with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+            resultados = list(pool.map(exportar, lista, [args.salida] * len(lista)))
+    total = time.perf_counter() - inicio
+
+    errores = [(cuit, error) for cuit, _, _, error in resultados if error]
+    for cuit, error in errores:
+        print(f"❌ {cuit}: {error}", file=sys.stderr)
+    generados = len(resultados) - len(errores)
+    escritos = sum(tamanio for _, tamanio, _, _ in resultados)
+    por_libro = sorted(segundos for _, _, segundos, error in resultados if not error)
+    print(f"{generados} libros en {total:.2f} s con {args.procesos} procesos: "
+          f"{generados / total:.1f} libros/s, {escritos / total / 1e6:.2f} MB/s")
+    if por_libro:
+        print(f"por libro: mediana {por_libro[len(por_libro) // 2] * 1000:.0f} ms, "
+              f"máximo {por_libro[-1] * 1000:.0f} ms")
+    if errores:
+        print(f"{len(errores)} con error", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,37 @@
-import requests
 import streamlit as st
 import pandas as pd
-import io
-from io import BytesIO
 import re
 import os
-import pickle
 import copy
 import datetime
+import functools
+import time
 from datetime import date
 from PIL import Image
 from pathlib import Path
 from pandas import json_normalize
 
+import compresion
+import estado
+import exportacion
+import georef
+import libro
+import metricas
+import opciones
+import progreso
+import resumenes
+import ventas
+from huellas import huella
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Tiempo de toda la corrida del script, se registra al final (ver metricas.py)
+inicio_corrida = time.perf_counter()
+
 # --- Login simple (sin base de datos)
 USUARIO = "QTM"
 CLAVE = "capital"
+# Panel de tiempos del sidebar: se ve sólo abriendo la app con ?admin=<clave>
+ADMIN_CLAVE = os.environ.get("FORMULARIO_ADMIN_CLAVE")
 
 if "autenticado" not in st.session_state:
     st.session_state.autenticado = False
@@ -36,6 +52,42 @@ if not st.session_state.autenticado:
                 st.error("Usuario o contraseña incorrectos.")
     st.stop()  # Detiene la ejecución si no está logueado
 
+@st.cache_resource(show_spinner=False)
+def obtener_almacen_progreso():
+    # Un único almacén compartido por todas las sesiones del proceso; con varias réplicas,
+    # FORMULARIO_PROGRESO_URL apunta todas al mismo (ver progreso.crear_almacen)
+    return progreso.crear_almacen()
+
+@st.cache_resource(show_spinner=False)
+def obtener_autoguardado():
+    # Las escrituras diferidas de todas las sesiones pasan por el mismo programador
+    return progreso.Autoguardado(obtener_almacen_progreso())
+
+def huellas_por_seccion(secciones):
+    return {nombre: huella(valores) for nombre, valores in secciones.items()}
+
+def describir_guardado(tamanio, segundos):
+    # Tamaño comprimido y tiempo de un guardado, para el sidebar
+    return f"{tamanio / 1024:.1f} KB ({compresion.CODEC}) en {segundos * 1000:.0f} ms"
+
+@metricas.medir("autoguardado")
+def autoguardar():
+    # Compara las huellas por sección con las de la pasada anterior y encola sólo las que cambiaron
+    if not st.session_state.get("_autoguardado_activo", True) or st.session_state.get("_legado_sin_migrar"):
+        return
+    secciones_actuales = estado.extraer(st.session_state.to_dict())
+    huellas_actuales = huellas_por_seccion(secciones_actuales)
+    huellas_guardadas = st.session_state.get("_huellas_guardadas")
+    if huellas_guardadas is not None:
+        cambiadas = {
+            nombre: valores for nombre, valores in secciones_actuales.items()
+            if huellas_guardadas.get(nombre) != huellas_actuales[nombre]
+        }
+        if cambiadas:
+            obtener_autoguardado().programar(st.session_state.codigo_usuario, cambiadas)
+    # La primera vez sólo se toma la referencia: es lo que se acaba de cargar
+    st.session_state["_huellas_guardadas"] = huellas_actuales
+
 # === BLOQUE DE IDENTIFICACIÓN DE FORMULARIO ===
 if "formulario_identificado" not in st.session_state:
     st.session_state.formulario_identificado = False
@@ -54,27 +106,23 @@ if not st.session_state.formulario_identificado:
         st.stop()
 
     st.session_state.codigo_usuario = codigo_usuario
-    PROGRESO_FILE = f"progreso_{codigo_usuario}.pkl"
-
-    if os.path.exists(PROGRESO_FILE):
-        try:
-            with open(PROGRESO_FILE, "rb") as f:
-                progreso_guardado = pickle.load(f)
-            # Claves que NO deben restaurarse porque son usadas por widgets como data_editor o botones
-            def es_clave_permitida(k):
-                claves_widget_conflictivas = [
-                    "editor_", "FormSubmitter:", "delete_", "guardar_",
-                    "Agregar", "_", "ventas_interno_", "ventas_externo_", "compras_"
-                ]
-                return not any(k.startswith(prefijo) or k == prefijo for prefijo in claves_widget_conflictivas)
 
+    try:
+        # Si quedó un autoguardado en espera, se escribe antes de leer
+        obtener_autoguardado().escribir(codigo_usuario)
+        progreso_guardado = obtener_almacen_progreso().cargar(codigo_usuario)
+        if progreso_guardado is not None:
+            # El borrador sólo trae claves del esquema (estado.py), nunca las de widgets como data_editor o botones
             for k, v in progreso_guardado.items():
-                if es_clave_permitida(k):
-                    if k not in st.session_state:
-                        st.session_state[k] = v
-            st.success(f"✅ Progreso cargado para el CUIT/CUIL'{PROGRESO_FILE}'.")
-        except Exception as e:
-            st.warning(f"⚠️ No se pudo cargar el progreso anterior: {e}")
+                if k not in st.session_state:
+                    st.session_state[k] = v
+            st.success(f"✅ Progreso cargado para el CUIT/CUIL '{codigo_usuario}'.")
+        elif progreso.archivo_legado(codigo_usuario).exists():
+            # Un .pkl sin migrar: un borrador nuevo lo taparía para siempre (migrar_legado no pisa
+            # borradores), así que en esta sesión no se guarda nada de ese CUIT
+            st.session_state["_legado_sin_migrar"] = True
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo cargar el progreso anterior: {e}")
 
     # ⚠️ Clave para ocultar el bloque y refrescar
     st.session_state.formulario_identificado = True
@@ -82,7 +130,13 @@ if not st.session_state.formulario_identificado:
 
 else:
     codigo_usuario = st.session_state.get("codigo_usuario", "default")
-    PROGRESO_FILE = f"progreso_{codigo_usuario}.pkl"
+
+if st.session_state.get("_legado_sin_migrar"):
+    st.warning(
+        "⚠️ Hay un progreso guardado con una versión anterior del formulario que todavía no se migró. "
+        "Para no perderlo, el guardado está desactivado: avisá al administrador para que lo migre "
+        "(python progreso.py --migrar) y volvé a ingresar."
+    )
 
 # Mostrar cartel post-descarga antes del resto del formulario
 if st.session_state.get("descarga_confirmada", False):
@@ -93,8 +147,8 @@ if st.session_state.get("descarga_confirmada", False):
     with col1:
         if st.button("**❌ Borrar progreso para cerrar la sesión**"):
             try:
-                if os.path.exists(PROGRESO_FILE):
-                    os.remove(PROGRESO_FILE)
+                obtener_autoguardado().cancelar(codigo_usuario)
+                if obtener_almacen_progreso().borrar(codigo_usuario):
                     st.success("✅ Archivo de progreso eliminado.")
                 else:
                     st.warning("⚠️ No se encontró el archivo de progreso. Se limpiará igualmente la sesión.")
@@ -113,38 +167,34 @@ if st.session_state.get("descarga_confirmada", False):
 
     st.stop()
 
-# Crear Tabs principales 
-@st.cache_data(ttl=86400, show_spinner=False )
-def obtener_provincias_y_localidades():
-    url = "https://apis.datos.gob.ar/georef/api/provincias"
-    response = requests.get(url)
-    provincias = response.json()["provincias"]
-    provincias.sort(key=lambda x: x["nombre"])
-
-    prov_localidades = {}
-    for prov in provincias:
-        prov_name = prov["nombre"]
-        loc_url = f"https://apis.datos.gob.ar/georef/api/localidades?provincia={prov_name}&max=5000"
-        loc_resp = requests.get(loc_url)
-        if loc_resp.status_code == 200:
-            localidades = loc_resp.json()["localidades"]
-            nombres_localidades = [loc["nombre"] for loc in localidades]
-            nombres_localidades.sort()
-            prov_localidades[prov_name] = nombres_localidades
-        else:
-            prov_localidades[prov_name] = []
-
-    return provincias, prov_localidades
-
-def seleccionar_provincia_y_localidad(key_prov, key_loc):
-    _, prov_localidades = obtener_provincias_y_localidades()
-    lista_provincias = list(prov_localidades.keys())
-
-    provincia_seleccionada = st.selectbox("Provincia", lista_provincias, key=key_prov)
-    localidades = prov_localidades.get(provincia_seleccionada, [])
-    localidad_seleccionada = st.selectbox("Localidad", localidades, key=key_loc)
-
-    return provincia_seleccionada, localidad_seleccionada
+# Crear Tabs principales
+@st.cache_resource(show_spinner=False)
+def obtener_servicio_geografico():
+    # cache_resource: todas las sesiones comparten el mismo índice inmutable, sin copias
+    return georef.ServicioGeografico()
+
+def obtener_indice_geografico():
+    # Sale del snapshot local; el refresco desde la API corre en segundo plano
+    return obtener_servicio_geografico().indice
+
+def buscar_localidad(geo, provincia, key_loc):
+    """Caja de búsqueda de localidades; devuelve las opciones para el selectbox ``key_loc``.
+
+    Al navegador sólo viajan las mejores coincidencias (ver georef.buscar_localidades)
+    y no las miles de localidades de la provincia.
+    """
+    texto = st.text_input("Buscar localidad", key=f"_buscar_{key_loc}", placeholder="Escribí parte del nombre")
+    opciones_loc = geo.buscar_localidades(provincia, texto)
+    if not opciones_loc and texto.strip() and not geo.localidades(provincia):
+        # El índice todavía no tiene las localidades de la provincia (sin red): se acepta lo escrito
+        opciones_loc = (texto.strip(),)
+    # La localidad ya elegida (o cargada del progreso) siempre sigue disponible, aunque no coincida
+    # con la búsqueda o el índice no la tenga: si el selectbox la perdiera, el autoguardado pisaría
+    # el valor guardado con None
+    actual = st.session_state.get(key_loc)
+    if actual and actual not in opciones_loc:
+        opciones_loc = (actual,) + opciones_loc
+    return opciones_loc
 
 # Ruta base: carpeta del script
 base_path = Path(__file__).parent
@@ -159,6 +209,36 @@ if img_path.exists():
 else:
     st.error("No se encuentra la imagen en la ruta esperada.")
 
+def corrida_de_fragmentos():
+    """True si esta corrida ejecuta sólo fragmentos (se tocó un widget de una sección), no todo el script.
+
+    Se decide con la corrida en curso y no con una marca en session_state: una corrida completa
+    que termina antes de tiempo (una excepción, st.stop()) no deja nada prendido para las siguientes.
+    """
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+def seccion(funcion):
+    """Fragmento de una sección: al tocar uno de sus widgets se vuelve a ejecutar sólo esa sección"""
+    @st.fragment
+    @functools.wraps(funcion)
+    def fragmento(*args, **kwargs):
+        # Las secciones que se repiten por flujo (ventas, compras...) se miden por separado
+        nombre = funcion.__name__ + (f" ({args[-1]})" if args and isinstance(args[-1], str) else "")
+        with metricas.medir(f"sección: {nombre}"):
+            funcion(*args, **kwargs)
+        if not corrida_de_fragmentos():
+            # En la corrida completa el autoguardado y la exportación se resuelven al final, en el sidebar
+            return
+        autoguardar()
+        excel_cacheado = st.session_state.get("_excel_cache")
+        if excel_cacheado is not None and excel_cacheado[0] != huella_exportacion():
+            # El botón de descarga del sidebar quedó con datos viejos: se descarta el libro y se
+            # redibuja toda la app una vez; las siguientes ediciones ya no tienen libro que invalidar
+            st.session_state.pop("_excel_cache", None)
+            st.rerun()
+    return fragmento
+
 tabs = st.tabs([
     "**Información General**",
     "**Deudas Bancarias y Financieras**",
@@ -171,10 +251,11 @@ if "respuestas" not in st.session_state:
     st.session_state.respuestas = {}
 
 # ---- TAB 0: Información General ----
-with tabs[0]:
+with tabs[0], metricas.medir("pestaña: Información General"):
     
     # --- BLOQUE COMPLETO para IDENTIFICACION SOCIO/TERCERO PARTICIPE ---
-    with st.expander("**Datos de Socio / Tercero Participe**"):
+    @seccion
+    def seccion_datos_socio():
 
         st.session_state.respuestas["Razón Social / Nombre y apellido"] = st.text_input(
             "Razón Social / Nombre y apellido", key="Razón Social / Nombre y apellido")
@@ -218,8 +299,7 @@ with tabs[0]:
 
         st.markdown("### Declaración de Domicilios")
 
-        provincias_dicts, localidades_por_provincia = obtener_provincias_y_localidades()
-        nombres_provincias = [prov["nombre"] for prov in provincias_dicts]
+        geo = obtener_indice_geografico()
 
         st.markdown("**Domicilio real y legal**")
 
@@ -233,11 +313,13 @@ with tabs[0]:
         with col4:
             st.session_state.respuestas["CP (real y legal)"] = st.text_input("CP", key="real y legal3")
 
-        col5, col6 = st.columns(2)
+        col5, col6, col7 = st.columns(3)
         with col5:
-            prov_real = st.selectbox("Provincia", nombres_provincias, key="prov_real")
+            prov_real = st.selectbox("Provincia", geo.provincias, key="prov_real")
         with col6:
-            loc_real = st.selectbox("Localidad", localidades_por_provincia.get(prov_real, []), key="loc_real")
+            opciones_loc = buscar_localidad(geo, prov_real, "loc_real")
+        with col7:
+            loc_real = st.selectbox("Localidad", opciones_loc, key="loc_real")
 
         st.session_state.respuestas["Provincia (real y legal)"] = prov_real
         st.session_state.respuestas["Localidad (real y legal)"] = loc_real
@@ -257,11 +339,13 @@ with tabs[0]:
         with col4:
             st.session_state.respuestas["CP (comercial)"] = st.text_input("CP", key="comercial3")
 
-        col5, col6 = st.columns(2)
+        col5, col6, col7 = st.columns(3)
         with col5:
-            provincia_comercial = st.selectbox("Provincia", [prov["nombre"] for prov in provincias_dicts], key="comercial_prov")
+            provincia_comercial = st.selectbox("Provincia", geo.provincias, key="comercial_prov")
         with col6:
-            localidad_comercial = st.selectbox("Localidad", localidades_por_provincia.get(provincia_comercial, []), key="comercial_loc")
+            opciones_loc = buscar_localidad(geo, provincia_comercial, "comercial_loc")
+        with col7:
+            localidad_comercial = st.selectbox("Localidad", opciones_loc, key="comercial_loc")
 
         st.session_state.respuestas["Provincia (comercial)"] = provincia_comercial
         st.session_state.respuestas["Localidad (comercial)"] = localidad_comercial
@@ -282,11 +366,13 @@ with tabs[0]:
         with col4:
             st.session_state.respuestas["CP (constituido)"] = st.text_input("CP", key="constituido3")
 
-        col5, col6 = st.columns(2)
+        col5, col6, col7 = st.columns(3)
         with col5:
-            provincia_constituido = st.selectbox("Provincia", [prov["nombre"] for prov in provincias_dicts], key="constituido_prov")
+            provincia_constituido = st.selectbox("Provincia", geo.provincias, key="constituido_prov")
         with col6:
-            localidad_constituido = st.selectbox("Localidad", localidades_por_provincia.get(provincia_constituido, []), key="constituido_loc")
+            opciones_loc = buscar_localidad(geo, provincia_constituido, "constituido_loc")
+        with col7:
+            localidad_constituido = st.selectbox("Localidad", opciones_loc, key="constituido_loc")
 
         st.session_state.respuestas["Provincia (constituido)"] = provincia_constituido
         st.session_state.respuestas["Localidad (constituido)"] = localidad_constituido
@@ -353,15 +439,23 @@ with tabs[0]:
             email_contacto = st.session_state.respuestas["Mail "]
             if email_contacto.strip() and not re.match(r"[^@]+@[^@]+\.[^@]+", email_contacto.strip()):
                 st.warning("El mail de contacto no parece válido.")
+
+    with st.expander("**Datos de Socio / Tercero Participe**"):
+        seccion_datos_socio()
                 
     # ------------------ RESEÑA EMPRESA ------------------
-    with st.expander("**Breve Reseña de la Empresa**"):
+    @seccion
+    def seccion_resenia():
         st.session_state.respuestas["Reseña Empresa"] = st.text_area("Describa la actividad de la empresa",
                                                     placeholder="Por favor explayarse un poco y completar en este recuadro, explicar el desarrollo de la actividad de la empresa, los productos que comercializa, sector y mercado en el que se desenvuelve, zona de influencia, ¡Ya que es muy importante para que la SGR tenga conocimiento sobre la empresa!",
                                                     key= "Describa la actividad de la empresa")
+
+    with st.expander("**Breve Reseña de la Empresa**"):
+        seccion_resenia()
     
     # ------------------ TIPO DE AVAL Y CONTRAGARANTIA ------------------
-    with st.expander("**Tipo de Aval y Contragarantía**"):
+    @seccion
+    def seccion_avales():
         st.write("Solicito la incorporación como socio/tercero partícipe y un aval para el/los siguientes productos y las contragarantías ofrecidas:")
 
         opciones_tipo_aval = [
@@ -434,7 +528,7 @@ with tabs[0]:
             for i, fila in enumerate(st.session_state.avales):
                 col = cols_aval[i % 4]
                 with col:
-                    if st.button(f"❌ {fila["Tipo Aval"]} - {fila["Tipo Contragarantía"]}", key=f"delete_aval_{i}"):
+                    if st.button(f"❌ {fila['Tipo Aval']} - {fila['Tipo Contragarantía']}", key=f"delete_aval_{i}"):
                         st.session_state.avales.pop(i)
                         st.rerun()
 
@@ -453,15 +547,19 @@ with tabs[0]:
 
         st.session_state.respuestas["Avales y Contragarantías"] = st.session_state.avales
         st.session_state.respuestas["Destino de los fondos"] = destino
+
+    with st.expander("**Tipo de Aval y Contragarantía**"):
+        seccion_avales()
  
     # ------------------ DATOS FILIATORIOS ------------------
-    with st.expander("**Datos Filiatorios**"):
+    @seccion
+    def seccion_filiatorios():
         st.caption("*Información de los miembros del Accionistas/ Directorio/ Titulares/ Socios Gerentes*")
 
         # Listas de opciones basadas en tu imagen
-        opciones_cargo = ["COMPLETAR", "SOCIO GERENTE", "DIRECTOR", "SOCIO", "ACCIONISTA","PRESIDENTE","VICEPRESIDENTE","APODERADO"]
-        opciones_estado_civil = ["COMPLETAR", "SOLTERO", "CASADO", "DIVORCIADO"]
-        opciones_fiador = ["SI", "NO"]
+        opciones_cargo = opciones.CARGOS
+        opciones_estado_civil = opciones.ESTADOS_CIVILES
+        opciones_fiador = opciones.SI_NO
 
         if "filiatorios" not in st.session_state:
             st.session_state.filiatorios = []
@@ -535,7 +633,7 @@ with tabs[0]:
                 if col not in df_filiarorio.columns:
                     df_filiarorio[col] = ""
 
-            df_filiarorio = df_filiarorio[columnas_fijas]
+            df_filiarorio = opciones.categorizar(df_filiarorio[columnas_fijas], "filiatorios")
             st.dataframe(df_filiarorio)
 
             cols_filiatorios = st.columns(4)
@@ -565,8 +663,12 @@ with tabs[0]:
                 "Fiador": ""                
             }])
 
+    with st.expander("**Datos Filiatorios**"):
+        seccion_filiatorios()
+
     # ------------------ DECLARACION DE EMPRESAS VINCULADAS ------------------
-    with st.expander("**Declaración de Empresas Vinculadas**"):
+    @seccion
+    def seccion_empresas_vinculadas():
         st.markdown("**Empresas Controlantes (50% Participación accionaria Ascendente)**")
         if "empresas_controlantes" not in st.session_state:
             st.session_state.empresas_controlantes = []
@@ -697,13 +799,17 @@ with tabs[0]:
                 "Tipo Empresa": "Vinculada"
             }])
 
+    with st.expander("**Declaración de Empresas Vinculadas**"):
+        seccion_empresas_vinculadas()
+
     # ------------------ PRINCIPALES LIBRADORES A DESCONTAR ------------------
-    with st.expander("**Principales Libradores a Descontar**"):
+    @seccion
+    def seccion_libradores():
         st.caption("Aplicable para línea de descuento de Cheque de Pago Diferido (CPD) de Terceros")
 
-        opciones_tipo = ["COMPLETAR", "PRINCIPAL CLIENTE", "LIBRADOR A DESCONTAR"]
-        opciones_modalidad = ["COMPLETAR", "CONTADO", "30 DIAS", "45 DIAS", "60 DIAS", "90 DIAS", "120 DIAS", "180 DIAS", "MAS DE 180 DIAS", "365 DIAS"]
-        opciones_descuenta = ["COMPLETAR", "SI", "NO"]
+        opciones_tipo = opciones.TIPOS_LIBRADOR
+        opciones_modalidad = opciones.MODALIDADES_COBRO
+        opciones_descuenta = opciones.DESCUENTA_CHEQUES
 
         if "clientes_descontar" not in st.session_state:
             st.session_state.clientes_descontar = []
@@ -752,7 +858,7 @@ with tabs[0]:
             for col in columnas_fijas:
                 if col not in df_clientes_descontar.columns:
                     df_clientes_descontar[col] = ""
-            df_clientes_descontar = df_clientes_descontar[columnas_fijas]
+            df_clientes_descontar = opciones.categorizar(df_clientes_descontar[columnas_fijas], "clientes_descontar")
             st.dataframe(df_clientes_descontar)
 
             filas_por_fila = 4
@@ -776,17 +882,21 @@ with tabs[0]:
                 "Descuenta de Cheques": ""
             }])
 
+    with st.expander("**Principales Libradores a Descontar**"):
+        seccion_libradores()
+
     # ------------------ PRINCIPALES PROVEEDORES, CLIENTES Y COMPETIDORES ------------------
-    with st.expander("**Principales Proveedores, Clientes y Competidores**"):
+    @seccion
+    def seccion_proveedores_clientes():
         
         st.session_state.respuestas["camara_empresarial"] = st.radio("*¿Pertenece a alguna cámara empresaria?*", ["NO","SI"], key="camara_empre", horizontal=True)
         st.session_state.respuestas["detalle_camara_empresarial"] = st.text_input("Nombre", key="detalle_camara_empre")
          
          
         # OPCIONES
-        opciones_local_exterior = ["COMPLETAR", "LOCAL", "EXTERIOR"]
-        opciones_modalidad_pago = ["COMPLETAR", "CONTADO", "A PLAZO"]
-        opciones_modalidad_proveedor = ["COMPLETAR", "CONTADO", "30 DIAS", "45 DIAS", "60 DIAS", "90 DIAS", "120 DIAS", "180 DIAS", "MAS DE 180 DIAS", "365 DIAS"]
+        opciones_local_exterior = opciones.LOCAL_EXTERIOR
+        opciones_modalidad_pago = opciones.MODALIDADES_PAGO
+        opciones_modalidad_proveedor = opciones.MODALIDADES_COBRO
 
         # ------------------ PROVEEDORES ------------------
         st.markdown("**Principales Proveedores**")
@@ -968,8 +1078,12 @@ with tabs[0]:
                 "Segmento": "", "Participacion del Mercado %": 0, "Condiciones de ventas": ""
             }])
 
+    with st.expander("**Principales Proveedores, Clientes y Competidores**"):
+        seccion_proveedores_clientes()
+
     # ------------------ REFERENCIAS BANCARIAS ------------------
-    with st.expander("**Referencias Bancarias**"):
+    @seccion
+    def seccion_referencias_bancarias():
         if "referencias_bancarias" not in st.session_state:
             st.session_state.referencias_bancarias = []
 
@@ -1028,8 +1142,12 @@ with tabs[0]:
                 "Mail": ""
             }])
 
+    with st.expander("**Referencias Bancarias**"):
+        seccion_referencias_bancarias()
+
     # ------------------ PREVENCIÓN DE LAVADO DE ACTIVOS Y FINANCIAMIENTO DEL TERRORISMO ------------------
-    with st.expander("**Prevención de Lavado de Activos y Financiamiento del Terrorismo**"):
+    @seccion
+    def seccion_prevencion_lavado():
         
 
         # ✅ LINKS A LOS ANEXOS (Google Drive o lo que uses)
@@ -1071,11 +1189,14 @@ with tabs[0]:
             }
         }   
 
+    with st.expander("**Prevención de Lavado de Activos y Financiamiento del Terrorismo**"):
+        seccion_prevencion_lavado()
+
 # ---- TAB 1: Deudas----
-with tabs[1]:
-    opciones_garantia = ["Completar", "Fianza / Sola Firma (F)", "Prenda (P)", "Hipoteca (H)", "Warrant (W)", "Forward (FW)", "Cesión (C)", "Plazo Fijo (PF)"]
-    opciones_regimen = ["Completar", "Mensual", "Bimestral", "Trimestral", "Semestral", "Anual"]
-    monedas = ["ARS", "USD"]
+with tabs[1], metricas.medir("pestaña: Deudas Bancarias y Financieras"):
+    opciones_garantia = opciones.GARANTIAS
+    opciones_regimen = opciones.REGIMENES_AMORTIZACION
+    monedas = opciones.MONEDAS
 
     # Inicialización de dataframes en session_state si no existen
     if "bancos" not in st.session_state:
@@ -1125,8 +1246,13 @@ with tabs[1]:
             "Plazo (días)": 0
         }] * 2)
 
+    # Columnas de opciones como categóricas (también las de progresos guardados antes de este cambio)
+    for nombre in ["bancos", "mercado", "deudas_comerciales"]:
+        st.session_state[nombre] = opciones.categorizar(st.session_state[nombre], nombre)
+
     # ============ BLOQUE DEUDA BANCARIA ============
-    with st.expander(" **Deuda Bancaria y Financieras**"):
+    @seccion
+    def seccion_deuda_bancaria():
 
         # Inicializar si no existen
         if "acuerdo_descubierto" not in st.session_state:
@@ -1166,80 +1292,37 @@ with tabs[1]:
             use_container_width=True
         )
         if st.button("Guardar Deuda Bancaria", key="guardar_bancos_btn"):
-            st.session_state.bancos = bancos_editado
+            st.session_state.bancos = opciones.categorizar(bancos_editado, "bancos")
+            st.session_state.pop("_resumen_deuda_cache", None)
             st.success("✅ Deuda bancaria actualizada.")
         
-        # Tomar el DataFrame guardado en session_state
-        bancos_df1 = st.session_state.bancos.copy()
-
-        # Columnas que representan montos a sumar
-        columnas_montos = [
-            "Sola Firma Utilizado",
-            "Saldo Préstamos Amortizables Utilizado",
-            "Descuento de Cheques Utilizado",
-            "Adelanto en Cta Cte Utilizado",
-            "Otros",
-            "Avales SGR",
-            "Tarjeta de Crédito Utilizado",
-            "Leasing Utilizado",
-            "Impo/Expo Utilizado"
-        ]
-
-        # Crear columna "Monto"
-        bancos_df1["Monto"] = bancos_df1[columnas_montos].sum(axis=1)
-
-        # Crear nueva columna Tasa combinada
-        bancos_df1["Tasa"] = bancos_df1.apply(
-            lambda row: row["Tasa Promedio $"] if row["Tipo de Moneda"] == "ARS" else row["Tasa Promedio USD"],
-            axis=1
-        )
-
-        # Columnas clave para agrupar
-        cols_clave = ["Entidad", "Tipo de Moneda", "Garantía (*)", 
-                    "Fecha desembolso (dd/mm/yyyy)", "Fecha último vencimiento (dd/mm/yyyy)"]
-
-        # Limpieza
-        for col in cols_clave:
-            bancos_df1[col] = bancos_df1[col].fillna("").astype(str).str.strip().replace("nan", "")
-
-        # Agrupar y calcular suma de Monto y promedio de Tasa
-        resumen = bancos_df1.groupby(cols_clave).agg({
-            "Monto": "sum",
-            "Tasa": "mean"
-        }).reset_index()
-
-        # Ordenar
-        resumen = resumen.sort_values(by="Entidad")
-
-        # Agregar fila total
-        fila_total = pd.DataFrame({
-            "Entidad": [""],
-            "Tipo de Moneda": [""],
-            "Garantía (*)": [""],
-            "Fecha desembolso (dd/mm/yyyy)": [""],
-            "Fecha último vencimiento (dd/mm/yyyy)": [""],
-            "Monto": [""],
-            "Tasa": [""]
-        })
-
-        resumen_final = pd.concat([resumen, fila_total], ignore_index=True)
-        
-        # Crear columnas nuevas con valores vacíos
-        resumen_final["Acuerdo Descubierto"] = ""
-        resumen_final["CPD Descontados"] = ""
-
-        # Si hay al menos 2 filas, asignar en la fila 2 (índice 1)
-        if len(resumen_final) > 1:
-            resumen_final.loc[1, "Acuerdo Descubierto"] = st.session_state.acuerdo_descubierto
-            resumen_final.loc[1, "CPD Descontados"] = st.session_state.cpd_descontados
+        tasa_ponderada = st.checkbox("Tasa del resumen ponderada por monto", key="tasa_ponderada_deuda",
+                                     help="Si no se marca, es el promedio simple de las tasas de cada grupo.")
+
+        # El resumen sólo se recalcula si cambiaron la deuda guardada, el acuerdo, los CPD o el
+        # tipo de tasa ("Guardar Deuda Bancaria" además descarta el cache)
+        huella_deuda = huella([st.session_state.bancos, st.session_state.acuerdo_descubierto,
+                               st.session_state.cpd_descontados, tasa_ponderada])
+        cacheado = st.session_state.get("_resumen_deuda_cache")
+        if cacheado is None or cacheado[0] != huella_deuda:
+            with metricas.medir("resumen: deuda bancaria"):
+                resumen_final = resumenes.resumen_deuda_bancaria(
+                    st.session_state.bancos, st.session_state.acuerdo_descubierto, st.session_state.cpd_descontados,
+                    tasa_ponderada=tasa_ponderada)
+            cacheado = (huella_deuda, resumen_final)
+            st.session_state["_resumen_deuda_cache"] = cacheado
 
         # Guardar en session_state para exportación
-        st.session_state["resumen_deuda_bancaria"] = resumen_final
+        st.session_state["resumen_deuda_bancaria"] = cacheado[1]
+
+    with st.expander(" **Deuda Bancaria y Financieras**"):
+        seccion_deuda_bancaria()
 
         
 
     # ============ BLOQUE DEUDA MERCADO ============
-    with st.expander(" **Deuda Mercado de Capitales**"):
+    @seccion
+    def seccion_deuda_mercado():
         mercado_df = st.session_state.mercado.copy()
         mercado_editado = st.data_editor(
             mercado_df,
@@ -1251,11 +1334,15 @@ with tabs[1]:
             use_container_width=True
         )
         if st.button("Guardar Deuda Mercado", key="guardar_mercado_btn"):
-            st.session_state.mercado = mercado_editado
+            st.session_state.mercado = opciones.categorizar(mercado_editado, "mercado")
             st.success("✅ Deuda del mercado actualizada.")
 
+    with st.expander(" **Deuda Mercado de Capitales**"):
+        seccion_deuda_mercado()
+
     # ============ BLOQUE DEUDA COMERCIAL ============
-    with st.expander(" **Deuda Comercial**"):
+    @seccion
+    def seccion_deuda_comercial():
         comercial_df = st.session_state.deudas_comerciales.copy()
         comercial_editado = st.data_editor(
             comercial_df,
@@ -1267,17 +1354,21 @@ with tabs[1]:
             use_container_width=True
         )
         if st.button("Guardar Deuda Comercial", key="guardar_comercial_btn"):
-            st.session_state.deudas_comerciales = comercial_editado
+            st.session_state.deudas_comerciales = opciones.categorizar(comercial_editado, "deudas_comerciales")
             st.success("✅ Deuda comercial actualizada.")
 
+    with st.expander(" **Deuda Comercial**"):
+        seccion_deuda_comercial()
+
 # ---- TAB 2: Vetas ----
-with tabs[2]:
+with tabs[2], metricas.medir("pestaña: Ventas y Compras"):
     
     # === CONFIGURACIONES INICIALES ===
-    opciones_tipo = ["COMPLETAR", "AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
-    subcategorias_agro = ["COMPLETAR", "AGRICULTURA", "GANADERIA", "TAMBO", "OTROS"]
-    meses_largos = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+    opciones_tipo = opciones.TIPOS_ACTIVIDAD
+    subcategorias_agro = opciones.SUBCATEGORIAS_AGRO
+    meses_largos = opciones.MESES
+    # Resúmenes que se calculan a partir de la tabla de ventas y compras
+    CLAVES_RESUMENES_VENTAS = ["resumen_12_meses_ventas", "resumen_ventas_simple", "resumen_compras_simple"]
 
     # === INICIALIZAR LOS DATAFRAMES CON ESTRUCTURA ADECUADA ===
     def inicializar_dataframe(tipo, incluir_region=False):
@@ -1312,27 +1403,31 @@ with tabs[2]:
                 filas.append(fila)
         return pd.DataFrame(filas)
 
-    # Cargar los dataframes iniciales si no existen
-    for nombre in ["ventas_interno", "ventas_externo", "compras"]:
-        if nombre not in st.session_state:
-            incluir_region = nombre == "ventas_externo"
-            df = pd.concat([
-                inicializar_dataframe(tipo, incluir_region=incluir_region)
-                for tipo in opciones_tipo if tipo != "COMPLETAR"
-            ], ignore_index=True)
-            st.session_state[nombre] = df
+    # Ventas y compras viven en una sola tabla larga (ventas.py); los progresos viejos
+    # traen una tabla ancha por flujo, que se convierte una sola vez
+    anchas = {nombre: st.session_state.pop(nombre) for nombre in ventas.FLUJOS if nombre in st.session_state}
+    if "ventas_compras" not in st.session_state:
+        # Cargar los dataframes iniciales si no existen
+        for nombre in ventas.FLUJOS:
+            if nombre not in anchas:
+                incluir_region = nombre == "ventas_externo"
+                anchas[nombre] = pd.concat([
+                    inicializar_dataframe(tipo, incluir_region=incluir_region)
+                    for tipo in opciones_tipo if tipo != "COMPLETAR"
+                ], ignore_index=True)
+        st.session_state["ventas_compras"] = ventas.desde_anchas(anchas)
 
     # === FUNCIÓN PARA MOSTRAR BLOQUE CON DATA_EDITORS POR TIPO ===
+    @seccion
     def mostrar_bloque_por_tipo(titulo_bloque, nombre_variable_session, incluir_region=False):
         st.markdown(f"#### {titulo_bloque}")
 
-        orden_fijo = ["AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
-        opciones_tipo = ["COMPLETAR"] + orden_fijo
+        orden_fijo = opciones_tipo[1:]  # sin "COMPLETAR"
 
-        if nombre_variable_session not in st.session_state:
+        if "ventas_compras" not in st.session_state:
             return
 
-        df_total = st.session_state[nombre_variable_session].copy()
+        df_total = ventas.a_ancha(st.session_state["ventas_compras"], nombre_variable_session)
 
         for tipo in orden_fijo:
             df_tipo = df_total[df_total["Tipo"] == tipo].copy()
@@ -1375,9 +1470,12 @@ with tabs[2]:
                 if "Subtipo" not in df_editado.columns:
                     df_editado["Subtipo"] = "COMPLETAR"
 
-                df_otros = df_total[df_total["Tipo"] != tipo].copy()
+                df_otros = df_total[df_total["Tipo"] != tipo]
                 nuevo_df = pd.concat([df_otros, df_editado], ignore_index=True)
-                st.session_state[nombre_variable_session] = nuevo_df
+                st.session_state["ventas_compras"] = ventas.reemplazar_flujo(
+                    st.session_state["ventas_compras"], nombre_variable_session, nuevo_df)
+                # Los resúmenes de ventas y compras se vuelven a calcular con la tabla nueva
+                st.session_state.pop("_resumenes_ventas_cache", None)
 
                 if key_editor in st.session_state:
                     del st.session_state[key_editor]
@@ -1393,65 +1491,13 @@ with tabs[2]:
     with st.expander("**Compras (Netas de IVA)**", expanded=False):
         mostrar_bloque_por_tipo("Compras Mensuales (Netas de IVA)", "compras")
         
-    def mostrar_resumen_12_meses(lista_df_names):
-        hoy = pd.to_datetime("today")
-        primer_dia_mes_actual = pd.to_datetime(hoy.strftime("%Y-%m-01"))
-        fecha_limite = primer_dia_mes_actual - pd.DateOffset(months=11)
-
-        df_union = pd.DataFrame()
-        for df_name in lista_df_names:
-            if df_name in st.session_state and not st.session_state[df_name].empty:
-                df = st.session_state[df_name].copy()
-                meses_dict = {mes: i for i, mes in enumerate(meses_largos, start=1)}
-                df["Mes_num"] = df["Mes"].map(meses_dict)
-                df["Mes_num"] = pd.to_numeric(df["Mes_num"], errors="coerce")
-                df = df.dropna(subset=["Mes_num"])
-                df["Mes_num"] = df["Mes_num"].astype(int)
-
-                año_actual = pd.to_datetime("today").year
-                columnas_anio = ["Año en curso", "Año 1", "Año 2", "Año 3"]
-
-                version_expandida = pd.DataFrame()
-                for i, columna in enumerate(columnas_anio):
-                    parcial = df.copy()
-                    parcial["Año destino"] = año_actual - i
-                    parcial["Monto"] = pd.to_numeric(parcial[columna], errors="coerce").fillna(0)
-                    version_expandida = pd.concat([version_expandida, parcial], ignore_index=True)
-
-                version_expandida["Fecha"] = pd.to_datetime(
-                    version_expandida["Año destino"].astype(str) + "-" + version_expandida["Mes_num"].astype(str).str.zfill(2) + "-01",
-                    errors="coerce"
-                )
-                df_union = pd.concat([df_union, version_expandida], ignore_index=True)
-
-        df_12m = df_union[df_union["Fecha"] >= fecha_limite].copy()
-        if df_12m.empty:
+    def mostrar_resumen_12_meses(flujos):
+        df_por_subtipo = resumenes.resumen_12_meses(st.session_state["ventas_compras"], flujos,
+                                                    meses_largos, subcategorias_agro)
+        if df_por_subtipo is None:
             st.info("No hay datos para los últimos 12 meses.")
             return
 
-        df_12m["Subtipo"] = df_12m["Subtipo"].astype(str).str.upper().str.strip()
-        df_12m = df_12m[df_12m["Subtipo"] != "COMPLETAR"]
-        df_12m["Mes-Año"] = df_12m["Fecha"].dt.strftime("%m-%Y")
-
-        rango_fechas = pd.date_range(end=hoy, periods=12, freq="MS")
-        mes_anio_str = rango_fechas.strftime("%m-%Y")
-        subtipos_validos = [s for s in subcategorias_agro if s != "COMPLETAR"]
-        index_completo = pd.MultiIndex.from_product(
-            [mes_anio_str, [s.upper() for s in subtipos_validos]],
-            names=["Mes-Año", "Subtipo"]
-        )
-
-        df_agrupado = (
-            df_12m.groupby(["Mes-Año", "Subtipo"])["Monto"]
-            .sum()
-            .reindex(index_completo, fill_value=0)
-            .reset_index()
-        )
-
-        df_por_subtipo = df_agrupado.pivot(index="Mes-Año", columns="Subtipo", values="Monto").fillna(0).reset_index()
-        df_por_subtipo["Orden"] = pd.to_datetime(df_por_subtipo["Mes-Año"], format="%m-%Y")
-        df_por_subtipo = df_por_subtipo.sort_values("Orden", ascending=False).drop(columns="Orden")
-
         #st.subheader("📊 Resumen últimos 12 meses por Subtipo (solo ventas)")
         columnas_numericas = df_por_subtipo.select_dtypes(include=["number"]).columns
         #st.dataframe(df_por_subtipo.style.format({col: "${:,.0f}" for col in columnas_numericas}), use_container_width=True)
@@ -1459,85 +1505,67 @@ with tabs[2]:
         st.session_state["resumen_12_meses_ventas"] = df_por_subtipo
 
     def mostrar_resumen_ventas_y_compras_simple():
-        df_final = pd.DataFrame()
-        columnas_anio = ["Año en curso", "Año 1", "Año 2", "Año 3"]
-        meses_dict = {mes: i for i, mes in enumerate(meses_largos, start=1)}
-        meses_ordenados = meses_largos
-
-        # Fuente: solo ventas_interno, ventas_externo, compras
-        fuentes = ["ventas_interno", "ventas_externo", "compras"]
-
-        for df_name in fuentes:
-            if df_name not in st.session_state or st.session_state[df_name].empty:
-                continue
-
-            df = st.session_state[df_name].copy()
-            df = df.dropna(subset=["Mes"])
-            df["Mes"] = df["Mes"].astype(str)
-            df["Mes_num"] = df["Mes"].map(meses_dict)
-            df = df.dropna(subset=["Mes_num"])
-
-            for col in columnas_anio:
-                if col not in df.columns:
-                    continue
-                parcial = df.copy()
-                parcial["Monto"] = pd.to_numeric(parcial[col], errors="coerce").fillna(0)
-                parcial["Columna_año"] = col
-                parcial["Origen"] = df_name  # ← MOVIDO ANTES
-                parcial = parcial[["Mes", "Monto", "Columna_año", "Origen"]]  # ← INCLUIR 'Origen'
-                df_final = pd.concat([df_final, parcial], ignore_index=True)
-
-        # Construcción de dataframes vacíos con ceros si no hay datos
-        def construir_df_con_ceros():
-            index = pd.Index(meses_ordenados, name="Mes")
-            columnas = pd.Index(columnas_anio, name="Columna_año")
-            return pd.DataFrame(0, index=index, columns=columnas)
+        ventas_compras = st.session_state["ventas_compras"]
 
         # RESUMEN VENTAS
-        df_ventas = df_final[df_final["Origen"].isin(["ventas_interno", "ventas_externo"])]
-        if not df_ventas.empty:
-            resumen_ventas = df_ventas.groupby(["Mes", "Columna_año"])["Monto"].sum().unstack("Columna_año").fillna(0)
-            resumen_ventas = resumen_ventas.reindex(meses_ordenados).fillna(0)
-        else:
-            resumen_ventas = construir_df_con_ceros()
+        resumen_ventas = resumenes.resumen_mensual(ventas_compras, ["ventas_interno", "ventas_externo"], meses_largos)
         #st.subheader("📊 Resumen Total de Ventas (Interno + Externo)")
         #st.dataframe(resumen_ventas.style.format("${:,.0f}"), use_container_width=True)
 
         # RESUMEN COMPRAS
-        df_compras = df_final[df_final["Origen"] == "compras"]
-        if not df_compras.empty:
-            resumen_compras = df_compras.groupby(["Mes", "Columna_año"])["Monto"].sum().unstack("Columna_año").fillna(0)
-            resumen_compras = resumen_compras.reindex(meses_ordenados).fillna(0)
-        else:
-            resumen_compras = construir_df_con_ceros()
+        resumen_compras = resumenes.resumen_mensual(ventas_compras, ["compras"], meses_largos)
         #st.subheader("📊 Resumen Total de Compras")
         #st.dataframe(resumen_compras.style.format("${:,.0f}"), use_container_width=True)
 
         # Guardar en session_state para exportación
-        st.session_state["resumen_ventas_simple"] = resumen_ventas.reset_index()
-        st.session_state["resumen_compras_simple"] = resumen_compras.reset_index()
+        st.session_state["resumen_ventas_simple"] = resumen_ventas
+        st.session_state["resumen_compras_simple"] = resumen_compras
 
-    # Mostrar resumen de ventas (últimos 12 meses)
-    mostrar_resumen_12_meses(["ventas_interno", "ventas_externo"])
+    def actualizar_resumenes_ventas():
+        """Recalcula los resúmenes de ventas y compras sólo si cambió la tabla de origen o el mes"""
+        hoy = date.today()
+        # El resumen de 12 meses cuenta desde el mes actual: una sesión que cruza de mes lo recalcula
+        huella_fuentes = (huella(st.session_state["ventas_compras"]), hoy.year, hoy.month)
+        cacheado = st.session_state.get("_resumenes_ventas_cache")
+        if cacheado is None or cacheado[0] != huella_fuentes:
+            for clave in CLAVES_RESUMENES_VENTAS:
+                st.session_state.pop(clave, None)
+
+            # Mostrar resumen de ventas (últimos 12 meses)
+            with metricas.medir("resumen: ventas 12 meses"):
+                mostrar_resumen_12_meses(["ventas_interno", "ventas_externo"])
+
+            # Línea divisoria
+            #st.divider()
+
+            # Mostrar resumen general con TODO
+            with metricas.medir("resumen: ventas y compras"):
+                mostrar_resumen_ventas_y_compras_simple()
+
+            cacheado = (huella_fuentes, {clave: st.session_state.get(clave) for clave in CLAVES_RESUMENES_VENTAS})
+            st.session_state["_resumenes_ventas_cache"] = cacheado
+            return
 
-    # Línea divisoria
-    #st.divider()
+        for clave, resumen in cacheado[1].items():
+            if resumen is not None:
+                st.session_state[clave] = resumen
+        if cacheado[1]["resumen_12_meses_ventas"] is None:
+            st.info("No hay datos para los últimos 12 meses.")
 
-    # Mostrar resumen general con TODO
-    mostrar_resumen_ventas_y_compras_simple()   
+    actualizar_resumenes_ventas()
     #st.write("VENTAS RESUMEN PARA EXPORTAR", st.session_state["resumen_ventas_simple"])
     #st.write("COMPRAS RESUMEN PARA EXPORTAR", st.session_state["resumen_compras_simple"])
 
     # === PLAN DE VENTAS POR ACTIVIDAD ===
-    PRODUCTOS_AGRICULTURA = ["Trigo", "Maíz", "Soja", "Girasol"]
-    CATEGORIAS_GANADERIA = ["Novillos", "Vaquillonas", "Terneros", "Vacas"]
-    TODAS_LAS_ACTIVIDADES = ["Agricultura", "Ganadería", "Tambo", "Otros"]
+    PRODUCTOS_AGRICULTURA = opciones.PRODUCTOS_AGRICULTURA
+    CATEGORIAS_GANADERIA = opciones.CATEGORIAS_GANADERIA
+    TODAS_LAS_ACTIVIDADES = opciones.ACTIVIDADES
 
     def crear_df_ventas(meses, columnas):
         data = {"Mes": meses}
         for col in columnas:
             data[col] = [0.0] * len(meses)
-        return pd.DataFrame(data)
+        return opciones.categorizar(pd.DataFrame(data), "planes_guardados_por_actividad")
 
     def crear_df_vacio(act):
         if act == "Agricultura":
@@ -1556,7 +1584,8 @@ with tabs[2]:
     if "planes_guardados_por_actividad" not in st.session_state:
         st.session_state.planes_guardados_por_actividad = {}
 
-    with st.expander("**Plan de Ventas por Actividad**", expanded=False):
+    @seccion
+    def seccion_plan_ventas():
         st.markdown("##### Seleccioná las actividades que realizás:")
         # Inicializar actividades seleccionadas desde session_state si existen
         if "actividades_seleccionadas" not in st.session_state:
@@ -1623,13 +1652,17 @@ with tabs[2]:
             btn_key = f"btn_guardar_{act}"
 
             if st.button(f"Guardar plan de ventas para {act}", key=btn_key):
-                st.session_state.planes_guardados_por_actividad[act] = edited_df
+                st.session_state.planes_guardados_por_actividad[act] = opciones.categorizar(
+                    edited_df, "planes_guardados_por_actividad")
                 st.success(f"✅ Plan de ventas para {act} guardado correctamente.")
 
                 # Limpieza segura después de usarlo
                 if btn_key in st.session_state:
                     del st.session_state[btn_key]
 
+    with st.expander("**Plan de Ventas por Actividad**", expanded=False):
+        seccion_plan_ventas()
+
 
     # === FUNCIÓN PARA NORMALIZAR TODAS LAS COLUMNAS EN TODOS LOS DF ===
     COLUMNAS_FINALES = ["Mes", "Trigo", "Maíz", "Soja", "Girasol", "Novillos", "Vaquillonas", "Terneros", "Vacas", "Litros", "Actividad Otros"]
@@ -1658,37 +1691,16 @@ with tabs[2]:
         ignore_index=True
     )
 
-@st.cache_data(show_spinner=False)
-def obtener_geodatos():
-    url_prov = "https://apis.datos.gob.ar/georef/api/provincias"
-    prov_resp = requests.get(url_prov).json()
-    provincias = sorted([p["nombre"] for p in prov_resp["provincias"]])
-
-    dict_departamentos = {}
-    dict_localidades = {}
-
-    for prov in provincias:
-        url_dpto = f"https://apis.datos.gob.ar/georef/api/departamentos?provincia={prov}&max=500"
-        dpto_resp = requests.get(url_dpto).json()
-        departamentos = sorted([d["nombre"] for d in dpto_resp.get("departamentos", [])])
-        dict_departamentos[prov] = departamentos
-
-        url_loc = f"https://apis.datos.gob.ar/georef/api/localidades?provincia={prov}&max=5000"
-        loc_resp = requests.get(url_loc).json()
-        localidades = sorted([l["nombre"] for l in loc_resp.get("localidades", [])])
-        dict_localidades[prov] = localidades
-
-    return provincias, dict_departamentos, dict_localidades
-provincias, departamentos_por_provincia, localidades_por_provincia = obtener_geodatos()
-
 # # ---- TAB 3: Adicional Agro ----
-with tabs[3]:
+with tabs[3], metricas.medir("pestaña: Adicional Empresas Agro."):
 
     # ================== CONFIGURACIÓN GENERAL ==================
-    cultivos = ["Maíz", "Soja", "Soja 2da", "Trigo", "Cebada", "Sorgo", "Girasol", "Poroto", "Otros Cultivos"]
-    metodologias_pago = ["Porcentaje de rinde", "Precio fijo", "Mixto"]
+    cultivos = opciones.CULTIVOS
+    metodologias_pago = opciones.METODOLOGIAS_PAGO_ARRIENDO
+    geo = obtener_indice_geografico()
 
-    with st.expander("**Campos**"):
+    @seccion
+    def seccion_campos():
         st.subheader("Campos Propios")
 
         # Inicialización
@@ -1708,6 +1720,9 @@ with tabs[3]:
         df_campos_tmp = st.data_editor(
             st.session_state.df_campos.copy(),
             key="editor_df_campos",
+            column_config={
+                "Provincia": st.column_config.SelectboxColumn("Provincia", options=geo.provincias)
+            },
             num_rows="dynamic",
             use_container_width=True
         )
@@ -1737,6 +1752,7 @@ with tabs[3]:
             st.session_state.df_campos_arrendados.copy(),
             key="editor_df_campos_arrendados",
             column_config={
+                "Provincia": st.column_config.SelectboxColumn("Provincia", options=geo.provincias),
                 "Metodología de Pago": st.column_config.SelectboxColumn("Metodología de Pago", options=metodologias_pago)
             },
             num_rows="dynamic",
@@ -1752,13 +1768,17 @@ with tabs[3]:
         st.session_state.respuestas["gasto_estruc_estimados_mes"] = st.number_input("*Gastos de Estructura (Estimado $/Mes)*", key="gasto_estruc_estimados_mes")
         st.session_state.respuestas["retiros_mes"] = st.number_input("*Retiros (Estimado $/Mes)*", key="retiros_mes")
 
+    with st.expander("**Campos**"):
+        seccion_campos()
+
     # ================== AGRICULTURA ==================
 
-    with st.expander("**Agricultura**"):
+    @seccion
+    def seccion_agricultura():
 
         st.session_state.respuestas["tns_forward_fijadas_y_sin_fijar"] = st.number_input("*Produccion con Contratos Forward (TN fijas o a fijar)*", key="tns_forward_fijadas_y_sin_fijar")
 
-        cultivos = ["Maíz", "Soja", "Soja 2da", "Trigo", "Cebada", "Sorgo", "Girasol", "Poroto", "Otros Cultivos"]
+        cultivos = opciones.CULTIVOS
         indicadores = [
             "Has p/adm", "Has a %", "% Propio", "Rendimiento (tn/ha)",
             "Gastos Comerc. y Cosecha (US$/ha)", "Gastos Directos (US$/ha)",
@@ -1813,7 +1833,11 @@ with tabs[3]:
                 st.session_state.agricultura_por_campania[clave_real] = df_agro_editado
                 st.success(f"✅ {nombre_visible} actualizada.")
 
-    with st.expander("**Ganadería**"):
+    with st.expander("**Agricultura**"):
+        seccion_agricultura()
+
+    @seccion
+    def seccion_ganaderia():
 
         def mostrar_seccion_doble_editor(titulo, nombre_df1, df1_default, key1, nombre_df2, df2_default, key2, key_guardar):
             st.subheader(titulo)
@@ -1970,384 +1994,96 @@ with tabs[3]:
             st.session_state.df_otros = df_otros_editado
             st.success("✅ Otras Actividades guardadas correctamente.")
 
-# === BLOQUE EXPORTACIÓN COMPLETA ===
-output = io.BytesIO()
-
-# Convertir Agricultura por campaña en único DataFrame usando los nombres personalizados
-campanias_fijas = {
-    "actual": "ej 24/25",
-    "hace_1": "ej 23/24",
-    "un_año_adelante": "ej 25/26"
-}
-nombres_visibles = st.session_state.get("nombres_visibles_campanias", {})
-
-df_agricultura_total = []
-
-for clave_logica, clave_real in campanias_fijas.items():
-    df = st.session_state.get("agricultura_por_campania", {}).get(clave_real)
-    if isinstance(df, pd.DataFrame) and not df.empty:
-        nombre_visible = nombres_visibles.get(clave_logica, clave_real)
-        df_temp = df.copy()
-        df_temp.insert(0, "Campaña", nombre_visible)
-        df_agricultura_total.append(df_temp)
-
-df_agricultura = pd.concat(df_agricultura_total, ignore_index=True) if df_agricultura_total else pd.DataFrame()
-
-# Convertir planes de ventas por actividad en Ganadería a un DataFrame
-df_ganaderia = pd.DataFrame()
-if "planes_guardados_por_actividad" in st.session_state and "Ganadería" in st.session_state.planes_guardados_por_actividad:
-    df_ganaderia = st.session_state.planes_guardados_por_actividad["Ganadería"]
-
-# Crear helper
-def crear_df(contenido, columnas):
-    if isinstance(contenido, pd.DataFrame):
-        return contenido if not contenido.empty else pd.DataFrame(columns=columnas)
-    elif contenido:
-        return pd.DataFrame(contenido)
-    else:
-        return pd.DataFrame(columns=columnas)
-
-# Respuestas
-respuestas = st.session_state.get("respuestas", {})
-df_respuestas = pd.json_normalize(respuestas, sep=".") if respuestas else pd.DataFrame()
-df_info_general = pd.DataFrame([respuestas]) if respuestas else pd.DataFrame()
-
-
-# Hojas reales
-df_avales = crear_df(st.session_state.get("avales", []), ["Tipo Aval", "Detalle Aval", "Monto", "Tipo Contragarantía", "Detalle Contragarantía"])
-if not df_avales.empty:
-    df_avales["Total solicitado"] = df_avales["Monto"].sum()
-
-df_filiatorios = crear_df(st.session_state.get("filiatorios", []), ["Nombre y Apellido", "CUIT / CUIL", "Cargo", "% Participación", "Estado Civil", "Nombre Cónyuge", "Fiador"])
-df_empresas_controlantes = crear_df(st.session_state.get("empresas_controlantes", []), ["Razón Social", "CUIT", "% de Participación", "Código de la actividad principal"])
-df_empresas_vinculadas = crear_df(st.session_state.get("empresas_vinculadas", []), ["Razón Social", "CUIT", "% de Participación", "Código de la actividad principal"])
-df_clientes_descontar = crear_df(st.session_state.get("clientes_descontar", []), ["Denominación", "CUIT", "Tipo", "Modalidad de Cobro", "Descuenta de Cheques"])
-df_proveedores = crear_df(st.session_state.get("proveedores", []), ["Denominación", "CUIT", "Teléfono", "Local o Exterior", "Modalidad de Pago", "Plazo en Días", "% Compras"])
-df_clientes = crear_df(st.session_state.get("clientes", []), ["Denominación", "CUIT", "Teléfono", "Local o Exterior", "Modalidad de Pago", "Plazo en Días", "% Ventas"])
-df_competidores = crear_df(st.session_state.get("competidores", []), ["Denominación", "CUIT", "Teléfono", "Segmento", "Participacion del Mercado %", "Condiciones de ventas"])
-df_referencias_bancarias = crear_df(st.session_state.get("referencias_bancarias", []), ["Entidad Financiera", "Contacto", "Sucursal", "Tel", "Mail"])
-df_bancos = crear_df(st.session_state.get("bancos", []), [
-    "Entidad", "Tipo de Moneda","Margen Total Asignado (Calificación)","Saldo Préstamos Amortizables", "Garantía (*)", "Valor de la Cuota",
-    "Régimen de Amortización (**)", "Cantidad Cuotas Faltantes", "Descuento de Cheques Utilizado",
-    "Adelanto en Cta Cte Utilizado", "Avales SGR", "Tarjeta de Crédito Utilizado", "Leasing Utilizado",
-    "Impo/Expo Utilizado", "Tasa Promedio $", "Tasa Promedio USD", "Fecha desembolso (dd/mm/yyyy)","Fecha último vencimiento (dd/mm/yyyy)"
-])
-
-df_mercado = crear_df(st.session_state.get("mercado", []), [
-    "Obligaciones Negociables", "Descuento de Cheques Propios", "Pagaré Bursátil",
-    "Organismos Multilaterales (CFI)", "Otros (1)", "Otros (2)", "Tasa Promedio $",
-    "Tasa Promedio USD", "Tipo de Moneda"
-])
-df_deudas_com = crear_df(st.session_state.get("deudas_comerciales", []), ["A favor de", "Tipo de Moneda", "Monto", "Garantía", "Tasa", "Plazo (días)"])
-
-
-
-df_ventas_interno = crear_df(st.session_state.get("ventas_interno", []), ["Mes", "Tipo", "Subtipo", "Año en curso", "Año 1", "Año 2", "Año 3"])
-df_ventas_externo = crear_df(st.session_state.get("ventas_externo", []), ["Mes", "Tipo", "Subtipo", "Año en curso", "Año 1", "Año 2", "Año 3", "Región"])
-df_compras = crear_df(st.session_state.get("compras", []), ["Mes", "Tipo", "Subtipo", "Año en curso", "Año 1", "Año 2", "Año 3"])
-df_campos_propios = crear_df(st.session_state.get("df_campos", []), ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Titularidad", "Has", "Valor U$/ha", "Has Hipotecadas", "Estado Actual"])
-df_campos_arrendados = crear_df(st.session_state.get("df_campos_arrendados", []), ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Arrendador", "Has Arrendadas", "Valor U$/ha", "Metodología de Pago", "Duración del Contrato"])
-
-df_base_forrajera = crear_df(st.session_state.get("df_base_forrajera", []), ["Categoria", "Has"])
-
-df_hacienda = crear_df(st.session_state.get("df_hacienda", []), ["Categoria", "Cantidad de Cabezas", "Pastoreo o capitalización"])
-df_otros = crear_df(st.session_state.get("df_otros", []), ["Descripción"])
-
-def dict_a_texto(tabla):
-    """Convierte una lista de dicts en texto concatenado por filas"""
-    if isinstance(tabla, list) and tabla:
-        return "\n".join([", ".join([f"{k}: {v}" for k, v in fila.items()]) for fila in tabla])
-    return ""
-
-# Clonar las respuestas y limpiar claves que tengan "/"
-respuestas_limpias = {
-    k.replace("/", "-").replace("  ", " ").strip(): v
-    for k, v in st.session_state.get("respuestas", {}).items()
-}
-
-# Agregar los resúmenes como texto en una sola celda
-respuestas_limpias["Resumen Avales"] = dict_a_texto(st.session_state.get("avales", []))
-respuestas_limpias["Resumen Filiatorios"] = dict_a_texto(st.session_state.get("filiatorios", []))
-respuestas_limpias["Resumen Empresas Controlantes"] = dict_a_texto(st.session_state.get("empresas_controlantes", []))
-respuestas_limpias["Resumen Empresas Vinculadas"] = dict_a_texto(st.session_state.get("empresas_vinculadas", []))
-respuestas_limpias["Resumen Clientes a Descontar"] = dict_a_texto(st.session_state.get("clientes_descontar", []))
-respuestas_limpias["Resumen Proveedores"] = dict_a_texto(st.session_state.get("proveedores", []))
-respuestas_limpias["Resumen Clientes"] = dict_a_texto(st.session_state.get("clientes", []))
-respuestas_limpias["Resumen Competidores"] = dict_a_texto(st.session_state.get("competidores", []))
-respuestas_limpias["Resumen Referencias Bancarias"] = dict_a_texto(st.session_state.get("referencias_bancarias", []))
-
-# Convertir en DataFrame
-df_info_general_unificado = pd.json_normalize(respuestas_limpias, sep=".")
-
-
-# --- Plan de Ventas por Actividad ---
-df_planes_ventas_actividad = []
-
-for actividad, df in st.session_state.get("planes_guardados_por_actividad", {}).items():
-    if isinstance(df, pd.DataFrame):
-        df_temp = df.copy()
-        df_temp.insert(0, "Actividad", actividad)
-        df_planes_ventas_actividad.append(df_temp)
-
-df_planes_ventas = pd.concat(df_planes_ventas_actividad, ignore_index=True) if df_planes_ventas_actividad else pd.DataFrame()
-
-
-
-# === Exportar Índices de Ganadería con chequeo robusto ===
-def exportar_indices(nombre_df, nombre_hoja, columnas=["Ítem", "Valor"]):
-    df = st.session_state.get(nombre_df)
-    if isinstance(df, pd.DataFrame) and not df.dropna(how="all").empty:
-        df = df.reset_index(drop=True)
-        df.to_excel(writer, sheet_name=nombre_hoja, index=False)
-    else:
-        pd.DataFrame(columns=columnas).to_excel(writer, sheet_name=nombre_hoja, index=False)
-
-# Nuevos bloques que faltan exportar
-df_cria = crear_df(st.session_state.get("df_cria", []), ["Vacas", "Vaquillonas", "Terneros/as", "Toros"])
-df_indices_cria = crear_df(st.session_state.get("df_indices_cria", []), ["Índice", "Valor"])
-df_invernada = crear_df(st.session_state.get("df_invernada", []), ["Novillos", "Novillitos", "Vacas Descarte", "Vaquillonas"])
-df_indices_invernada = crear_df(st.session_state.get("df_indices_invernada", []), ["Ítem", "Valor"])
-df_feedlot = crear_df(st.session_state.get("df_feedlot", []), ["Novillos", "Novillitos", "Vacas Descarte", "Vaquillonas"])
-df_indices_feedlot = crear_df(st.session_state.get("df_indices_feedlot", []), ["Ítem", "Valor"])
-df_tambo = crear_df(st.session_state.get("df_tambo", []), ["Vacas (VO+VS)", "Vaquillonas", "Terneras", "Terneros", "Toros"])
-df_indices_tambo = crear_df(st.session_state.get("df_indices_tambo", []), ["Ítem", "Valor"])
-
-df_resumen_deuda = resumen_final.copy()
-
-df_comb_interno = st.session_state.get("df_combinado_ventas_interno", pd.DataFrame())
-df_comb_externo = st.session_state.get("df_combinado_ventas_externo", pd.DataFrame())
-df_comb_compras = st.session_state.get("df_combinado_compras", pd.DataFrame())
-
-df_resumen12 = st.session_state.get("resumen_12_meses_ventas", pd.DataFrame())
-df_resumen_general_ventas = st.session_state.get("resumen_general_ventas", pd.DataFrame())
-df_resumen_general_compras = st.session_state.get("resumen_general_compras", pd.DataFrame())
-
-# === GENERACIÓN MANUAL DE LOS RESÚMENES ANUALES ===
-meses_ordenados = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                   "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
-columnas_anios = ["Año actual", "Año 1", "Año 2", "Año 3"]
-
-def crear_resumen(df):
-    if df.empty:
-        base = pd.DataFrame(columns=["Mes"] + columnas_anios)
-        base["Mes"] = meses_ordenados
-        for col in columnas_anios:
-            base[col] = 0
-        return base
-    else:
-        df = df.copy()
-        df["Mes"] = df["Mes"].astype(str)
-        df["Tipo"] = df.get("Tipo", "SIN TIPO")  # seguridad
-        columnas_a_sumar = [col for col in columnas_anios if col in df.columns]
-        resumen = df.groupby("Mes")[columnas_a_sumar].sum().reindex(meses_ordenados, fill_value=0).reset_index()
-        resumen.columns = ["Mes"] + columnas_a_sumar
-        return resumen
-
-# Crear los resúmenes desde los session_state
-ventas_df = pd.concat(st.session_state.get("ventas_por_tipo", {}).values(), ignore_index=True) if "ventas_por_tipo" in st.session_state else st.session_state.get("ventas_interno", pd.DataFrame())
-compras_df = st.session_state.get("compras", pd.DataFrame())
-
-resumen_ventas_total = crear_resumen(ventas_df)
-resumen_compras_total = crear_resumen(compras_df)
-resumen_ventas_simple = st.session_state.get("resumen_ventas_simple", pd.DataFrame())
-resumen_compras_simple = st.session_state.get("resumen_compras_simple", pd.DataFrame())
-
-# === ACTUALIZAR TAB 2: Consolidar los data_editor por tipo antes de exportar ===
-def reconstruir_df_completo(nombre_variable_session, tipos_validos):
-    dfs = []
-    for tipo in tipos_validos:
-        key_widget = f"{nombre_variable_session}_{tipo}"
-        df = st.session_state.get(key_widget)
-        if isinstance(df, pd.DataFrame) and not df.empty:
-            dfs.append(df)
-    if dfs:
-        st.session_state[nombre_variable_session] = pd.concat(dfs, ignore_index=True)
-
-tipos_fijos = ["AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION"]
-
-for nombre in ["ventas_interno", "ventas_externo", "compras"]:
-    reconstruir_df_completo(nombre, tipos_fijos)
-
-
-def ordenar_por_tipo(df):
-    orden = {"AGROPECUARIO": 0, "INDUSTRIA": 1, "COMERCIO": 2, "SERVICIOS": 3, "CONSTRUCCION": 4}
-    return df.sort_values(by="Tipo", key=lambda x: x.map(orden)).reset_index(drop=True)
-
-
-# Consolidar y ordenar por tipo
-df_ventas_interno = ordenar_por_tipo(st.session_state["ventas_interno"])
-df_ventas_externo = ordenar_por_tipo(st.session_state["ventas_externo"])
-df_compras = ordenar_por_tipo(st.session_state["compras"])
-
-# === GENERAR TABLA DE COMERCIALIZACIÓN Y PROVEEDORES ===
-actividades = TODAS_LAS_ACTIVIDADES  # Asegurate que TODAS estén, no solo las seleccionadas
-
-comercializa = st.session_state.respuestas.get("Comercializa", {})
-proveedores = st.session_state.respuestas.get("Proveedores", {})
-
-fila_resultado = {}
-
-for act in actividades:
-    fila_resultado[f"Comercializa.{act}"] = comercializa.get(act, "")
-    fila_resultado[f"Proveedores.{act}"] = proveedores.get(act, "")
-
-df_comercializacion = pd.DataFrame([fila_resultado])
-
-# Guardar a Excel
-with pd.ExcelWriter(output, engine="openpyxl") as writer:
-    #df_respuestas.to_excel(writer, sheet_name="Respuestas", index=False)
-    #df_info_general.to_excel(writer, sheet_name="Respuestas Simples", index=False)
-
-    df_info_general_unificado.to_excel(writer, sheet_name="Resumen Info General", index=False)
-    df_avales.to_excel(writer, sheet_name="Avales", index=False)
-    df_filiatorios.to_excel(writer, sheet_name="Filiatorios", index=False)
-    df_empresas_controlantes.to_excel(writer, sheet_name="Empresas Controlantes", index=False)
-    df_empresas_vinculadas.to_excel(writer, sheet_name="Empresas Vinculadas", index=False)
-    df_clientes_descontar.to_excel(writer, sheet_name="Clientes a Descontar", index=False)
-    df_proveedores.to_excel(writer, sheet_name="Proveedores", index=False)
-    df_clientes.to_excel(writer, sheet_name="Clientes", index=False)
-    df_competidores.to_excel(writer, sheet_name="Competidores", index=False)
-    df_referencias_bancarias.to_excel(writer, sheet_name="Referencias Bancarias", index=False)
-
-    df_bancos.to_excel(writer, sheet_name="Deuda Bancaria", index=False)
-    df_mercado.to_excel(writer, sheet_name="Deuda Mercado", index=False)
-    df_deudas_com.to_excel(writer, sheet_name="Deuda Comercial", index=False)
-
-    df_resumen_deuda.to_excel(writer, sheet_name="Resumen Deuda Bancaria", index=False)
-
-    df_ventas_interno.to_excel(writer, sheet_name="Ventas Interno", index=False)
-    df_ventas_externo.to_excel(writer, sheet_name="Ventas Externo", index=False)
-    df_compras.to_excel(writer, sheet_name="Compras", index=False)
-    df_planes_ventas.to_excel(writer, sheet_name="Plan Ventas Actividad", index=False)
-
-    
-
-    df_campos_propios.to_excel(writer, sheet_name="Campos Propios", index=False)
-    df_campos_arrendados.to_excel(writer, sheet_name="Campos Arrendados", index=False)
-    df_agricultura.to_excel(writer, sheet_name="Agricultura", index=False)
-    df_ganaderia.to_excel(writer, sheet_name="Ganadería", index=False)
-    df_base_forrajera.to_excel(writer, sheet_name="Base Forrajera", index=False)
-    df_hacienda.to_excel(writer, sheet_name="Hacienda de Terceros", index=False)
-    df_otros.to_excel(writer, sheet_name="Otras Actividades", index=False)
-
-    # === En bloque de exportación de Excel ===
-    df_cria.to_excel(writer, sheet_name="Cría", index=True)
-    df_invernada.to_excel(writer, sheet_name="Invernada", index=True)
-    df_feedlot.to_excel(writer, sheet_name="Feedlot", index=True)
-    df_tambo.to_excel(writer, sheet_name="Tambo", index=True)
-
-    exportar_indices("indices_cria", "Índices Cría")
-    exportar_indices("indices_invernada", "Índices Invernada")
-    exportar_indices("indices_feedlot", "Índices Feedlot")
-    exportar_indices("indices_tambo", "Índices Tambo")
-
-    # Exportar formularios base si están disponibles
-    for clave_df in ["ventas_interno", "ventas_externo", "compras"]:
-        df_base = st.session_state.get(clave_df)
-        if df_base is not None and not df_base.empty:
-            nombre_hoja = clave_df.replace("_", " ").title()
-            df_base.to_excel(writer, sheet_name=nombre_hoja, index=False)
-
-    # Exportar resúmenes por subtipo (últimos 12 meses) y comparativos anuales
-    for nombre in ["ventas_interno", "ventas_externo", "compras"]:
-        df_subtipo = st.session_state.get(f"df_por_subtipo_12m_{nombre}")
-        df_anual = st.session_state.get(f"df_comparativo_anual_{nombre}")
-
-        if df_subtipo is not None and not df_subtipo.empty:
-            hoja_subtipo = f"Resumen 12M - {nombre.replace('_', ' ').title()}"
-            df_subtipo.to_excel(writer, sheet_name=hoja_subtipo, index=False)
-
-        if df_anual is not None and not df_anual.empty:
-            hoja_anual = f"Comparativo - {nombre.replace('_', ' ').title()}"
-            df_anual.to_excel(writer, sheet_name=hoja_anual, index=False)
-
-
-    df_comb_total = pd.concat([
-        df_comb_interno.assign(Origen="Ventas Interno"),
-        df_comb_externo.assign(Origen="Ventas Externo"),
-        df_comb_compras.assign(Origen="Compras")
-    ], ignore_index=True)
-    df_comb_total.to_excel(writer, sheet_name="Datos Detallados", index=False)
-
-    # Guardar cada resumen en su hoja
-    df_resumen12.to_excel(writer, sheet_name="Resumen 12 Meses", index=False)
-
-    # === Exportar los resúmenes simples de ventas y compras al Excel ===
-    resumen_ventas_simple = st.session_state.get("resumen_ventas_simple", pd.DataFrame())
-    resumen_compras_simple = st.session_state.get("resumen_compras_simple", pd.DataFrame())
-
-    orden_cols = ["Mes", "Año en curso", "Año 1", "Año 2", "Año 3"]
-    meses_largos = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
-
-    def asegurar_formato_resumen(df):
-        if df is None or df.empty:
-            return pd.DataFrame({
-                "Mes": meses_largos,
-                "Año en curso": [0]*12,
-                "Año 1": [0]*12,
-                "Año 2": [0]*12,
-                "Año 3": [0]*12
-            })
-        else:
-            df = df.copy()
-            df = df.set_index("Mes").reindex(meses_largos, fill_value=0).reset_index()
-            df = df[orden_cols]
-            return df
-
-    df_resumen_ventas_final = asegurar_formato_resumen(resumen_ventas_simple)
-    df_resumen_compras_final = asegurar_formato_resumen(resumen_compras_simple)
+    with st.expander("**Ganadería**"):
+        seccion_ganaderia()
 
-    df_resumen_ventas_final.to_excel(writer, sheet_name="Resumen Ventas", index=False)
-    df_resumen_compras_final.to_excel(writer, sheet_name="Resumen Compras", index=False)
+# === BLOQUE EXPORTACIÓN COMPLETA ===
+# Las hojas del libro están en libro.py y se arman desde session_state
 
-    df_comercializacion.to_excel(writer, sheet_name="Comercialización", index=False)
+def huella_exportacion():
+    return huella({k: st.session_state.get(k) for k in libro.CLAVES_EXPORTACION})
 
+@metricas.medir("exportación: libro")
+def generar_excel():
+    """Arma el libro desde session_state; sólo se llama al pedir la descarga.
 
-output.seek(0)
+    Cada hoja se reconstruye únicamente si cambió la huella de sus claves de origen,
+    las demás salen de la caché de hojas de la sesión.
+    """
+    if "_hojas_cache" not in st.session_state:
+        st.session_state["_hojas_cache"] = exportacion.CacheHojas()
+    return libro.generar(st.session_state, st.session_state["_hojas_cache"])
 
 with st.sidebar:
-    if st.button("💾 Guardar progreso para continuar luego"):
+    legado_sin_migrar = st.session_state.get("_legado_sin_migrar", False)
+    if st.button("💾 Guardar progreso para continuar luego", disabled=legado_sin_migrar):
         try:
-            def clave_permitida(k):
-                claves_widget_conflictivas = [
-                    "delete_", "eliminar_cultivo_", "FormSubmitter:", "guardar_",
-                    "Agregar", "_", "ventas_interno_", "ventas_externo_", "compras_",
-                    "btn_guardar_", "editor_actividad_"
-                ]
-                if k == "planes_guardados_por_actividad":
-                    return True
-                return not any(k.startswith(prefijo) or k == prefijo for prefijo in claves_widget_conflictivas)
-
-            estado_a_guardar = {
-                k: v for k, v in st.session_state.items() if clave_permitida(k)
-            }
+            inicio_guardado = time.perf_counter()
+            # Sólo las partes persistentes del formulario, agrupadas por sección
+            estado_a_guardar = estado.extraer(st.session_state.to_dict())
 
-            with open(PROGRESO_FILE, "wb") as f:
-                pickle.dump(estado_a_guardar, f)
+            obtener_autoguardado().cancelar(codigo_usuario)
+            tamanio = obtener_almacen_progreso().guardar(codigo_usuario, estado_a_guardar)
+            st.session_state["_huellas_guardadas"] = huellas_por_seccion(estado_a_guardar)
+            st.session_state["_ultimo_guardado"] = (tamanio, time.perf_counter() - inicio_guardado)
 
             st.success("✅ Progreso guardado correctamente.")
 
         except Exception as e:
             st.error(f"❌ Error al guardar el progreso: {e}")
 
+    # Autoguardado: el programador escribe una vez pasada la ráfaga de cambios
+    if legado_sin_migrar:
+        st.caption("⏸️ Guardado desactivado: hay un progreso anterior sin migrar")
+    elif st.toggle("Autoguardado", value=True, key="_autoguardado_activo",
+                   help="Guarda solo los cambios unos segundos después de la última edición."):
+        autoguardar()
+        ultimo_autoguardado = obtener_autoguardado().ultimo(codigo_usuario)
+        if obtener_autoguardado().pendiente(codigo_usuario):
+            st.caption("⏳ Guardando cambios...")
+        elif ultimo_autoguardado is not None:
+            st.caption(f"✅ Cambios guardados: {describir_guardado(*ultimo_autoguardado)}")
+        else:
+            st.caption("✅ Cambios guardados")
+
+    if "_ultimo_guardado" in st.session_state:
+        st.caption(f"💾 Progreso completo: {describir_guardado(*st.session_state['_ultimo_guardado'])}")
+
     # ✅ BOTÓN PARA BORRAR ARCHIVO, SI EXISTE
-    if os.path.exists(PROGRESO_FILE):
-        if st.button(f"❌ Borrar {PROGRESO_FILE[:-4]}"):
+    if obtener_almacen_progreso().existe(codigo_usuario):
+        if st.button(f"❌ Borrar progreso_{codigo_usuario}"):
             try:
-                os.remove(PROGRESO_FILE)
+                obtener_autoguardado().cancelar(codigo_usuario)
+                obtener_almacen_progreso().borrar(codigo_usuario)
                 st.success("✅ Archivo de progreso eliminado correctamente.")
                 st.session_state.clear()
                 st.rerun()
             except Exception as e:
                 st.error(f"❌ Error inesperado al eliminar el archivo: {e}")
 
-    descargado = st.download_button(
-        label="📥 Descargar archivo para compartir a QTM",
-        data=output,
-        file_name=f"formulario_{codigo_usuario}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    # El Excel sólo se arma cuando se pide y se reutiliza mientras no cambien los datos
+    huella_actual = huella_exportacion()
+    excel_cacheado = st.session_state.get("_excel_cache")
+    if excel_cacheado is not None and excel_cacheado[0] != huella_actual:
+        # Cambiaron los datos: el libro viejo no se ofrece ni sigue ocupando memoria en la sesión
+        st.session_state.pop("_excel_cache")
+        excel_cacheado = None
+    if excel_cacheado is None:
+        boton_preparar = st.empty()
+        if boton_preparar.button("📄 Preparar archivo para descargar"):
+            with st.spinner("Generando archivo..."):
+                st.session_state["_excel_cache"] = (huella_actual, generar_excel())
+            excel_cacheado = st.session_state["_excel_cache"]
+            boton_preparar.empty()
+
+    descargado = False
+    if excel_cacheado is not None:
+        descargado = st.download_button(
+            label="📥 Descargar archivo para compartir a QTM",
+            data=excel_cacheado[1],
+            file_name=f"formulario_{codigo_usuario}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
     if descargado:
         st.session_state["descarga_confirmada"] = True
@@ -2364,8 +2100,8 @@ with st.sidebar:
             if st.button("❌ Borrar progreso para cerrar la sesión"):
                 try:
                     # Intentamos borrar el archivo solo si existe
-                    if os.path.exists(PROGRESO_FILE):
-                        os.remove(PROGRESO_FILE)
+                    obtener_autoguardado().cancelar(codigo_usuario)
+                    if obtener_almacen_progreso().borrar(codigo_usuario):
                         st.success("✅ Archivo de progreso eliminado correctamente.")
                     else:
                         st.warning("⚠️ No se encontró el archivo de progreso, pero se limpiará la sesión igualmente.")
@@ -2381,3 +2117,20 @@ with st.sidebar:
 
         with col2:
             st.button("🔄 Seguir cargando el formulario")
+
+    # Tiempos por sección de todas las sesiones de este proceso (ver metricas.py)
+    if ADMIN_CLAVE and st.query_params.get("admin") == ADMIN_CLAVE:
+        with st.expander("⏱️ Rendimiento"):
+            filas = metricas.REGISTRO.resumen()
+            if filas:
+                df_tiempos = pd.DataFrame(filas, columns=["Sección", "Mediciones", "p50", "p95", "Máximo"])
+                df_tiempos[["p50", "p95", "Máximo"]] = (df_tiempos[["p50", "p95", "Máximo"]] * 1000).round(1)
+                st.caption(f"En milisegundos, últimas {metricas.MUESTRAS} mediciones por sección")
+                st.dataframe(df_tiempos, hide_index=True, use_container_width=True)
+            else:
+                st.caption("Todavía no hay mediciones.")
+            if st.button("Reiniciar métricas"):
+                metricas.REGISTRO.limpiar()
+                st.rerun()
+
+metricas.registrar("corrida completa", time.perf_counter() - inicio_corrida)
@@ -0,0 +1,381 @@
+"""Índice geográfico (provincias, departamentos y localidades) de la API georef.
+
+No depende de Streamlit: el formulario lo envuelve en su propia caché.
+El índice se lee de un snapshot comprimido que viaja junto al script, así el
+formulario arranca sin esperar a la red; la API sólo se usa para refrescarlo
+en segundo plano. Los refrescos no tocan el snapshot del script (es un archivo
+del repositorio): se escriben en FORMULARIO_GEOREF_SNAPSHOT o, si no se
+indica, en SNAPSHOT_CACHE, y al arrancar se usa el más nuevo de los dos.
+
+Con varias réplicas, FORMULARIO_GEOREF_SNAPSHOT indica un snapshot compartido
+(por ejemplo en un volumen común): la réplica que lo refresca lo reescribe ahí,
+bajo un bloqueo de archivo para que no descarguen todas a la vez, y las demás
+lo toman de ahí en vez de volver a llamar a la API.
+
+Para regenerar el snapshot del script (hace falta acceso a la API): ``python georef.py``
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+import requests
+from urllib3.util.retry import Retry
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import MappingProxyType
+
+import bloqueos
+import metricas
+
+log = logging.getLogger(__name__)
+
+GEOREF_URL = "https://apis.datos.gob.ar/georef/api"
+GEOREF_TIMEOUT = (3.05, 20)  # (conexión, lectura) en segundos
+GEOREF_MAX = 5000  # máximo de resultados por pedido que acepta la API
+GEOREF_REINTENTOS = 3  # por pedido, ante errores de conexión, 429 o 5xx
+GEOREF_BACKOFF = 0.5  # segundos antes del primer reintento; se duplica en cada uno
+
+# Recurso -> campos pedidos. Con los nombres de provincia y departamento de cada
+# localidad se arma todo el índice en un par de pedidos masivos.
+RECURSOS = {
+    "provincias": "nombre",
+    "departamentos": "nombre,provincia.nombre",
+    "localidades": "nombre,provincia.nombre,departamento.nombre",
+}
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = Path(__file__).with_name("georef_snapshot.json.gz")  # el que viaja con el script; sólo se lee
+SNAPSHOT_COMPARTIDO = os.environ.get("FORMULARIO_GEOREF_SNAPSHOT")
+# Donde escriben los refrescos si no hay snapshot compartido
+SNAPSHOT_CACHE = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "formulario-sgrs" / SNAPSHOT_PATH.name
+SNAPSHOT_VIGENCIA = 86400  # segundos antes de intentar refrescar desde la API
+REINTENTO_REFRESCO = 600  # segundos de espera tras un refresco fallido; se duplica con cada fallo seguido
+REINTENTO_MAXIMO = 6 * 3600  # tope de esa espera
+BUSQUEDA_LIMITE = 50  # localidades que devuelve una búsqueda
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos ("Río Cuarto (Sede)" -> "rio cuarto sede")"""
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", sin_tildes))
+
+
+def _indice_busqueda(localidades):
+    """(entradas, orden): lista ordenada de (texto normalizado, rango, localidad)
+    para buscar por prefijo y {localidad: nombre normalizado} para ordenar.
+
+    Cada localidad entra una vez por palabra de su nombre (rango 0 si es la
+    primera, 1 si no) y una vez por palabra de su departamento (rango 2), así
+    "paz" encuentra "Villa Carlos Paz" y "punilla" las localidades de Punilla.
+    """
+    entradas = []
+    orden = {}
+    for departamento, nombres in localidades.items():
+        palabras_dpto = normalizar(departamento).split()
+        for nombre in nombres:
+            orden[nombre] = normalizar(nombre)
+            palabras = orden[nombre].split()
+            for i in range(len(palabras)):
+                entradas.append((" ".join(palabras[i:]), 0 if i == 0 else 1, nombre))
+            for i in range(len(palabras_dpto)):
+                entradas.append((" ".join(palabras_dpto[i:]), 2, nombre))
+    entradas.sort()
+    return entradas, orden
+
+
+class IndiceGeografico:
+    """Provincias, departamentos y localidades en estructuras inmutables compartidas"""
+
+    def __init__(self, provincias, departamentos, localidades, generado=None):
+        # departamentos: {provincia: [departamentos]}
+        # localidades: {(provincia, departamento): [localidades]}
+        # generado: epoch de la descarga desde la API (None si nunca se descargó)
+        self.provincias = tuple(sorted(provincias))
+        self.generado = generado
+
+        self._departamentos = MappingProxyType({
+            prov: tuple(sorted(nombres)) for prov, nombres in departamentos.items()
+        })
+        self._localidades_por_departamento = MappingProxyType({
+            clave: tuple(sorted(nombres)) for clave, nombres in localidades.items()
+        })
+
+        por_provincia = {}
+        for (prov, _), nombres in localidades.items():
+            por_provincia.setdefault(prov, []).extend(nombres)
+        self._localidades = MappingProxyType({
+            prov: tuple(sorted(nombres)) for prov, nombres in por_provincia.items()
+        })
+
+        # Los índices de búsqueda se arman la primera vez que se busca en cada provincia
+        self._busqueda = {}
+
+    @classmethod
+    def desde_api(cls, provincias, departamentos, localidades):
+        """Agrupa las listas planas que devuelve georef"""
+        dict_departamentos = {}
+        for dpto in departamentos:
+            dict_departamentos.setdefault(dpto["provincia"]["nombre"], []).append(dpto["nombre"])
+
+        dict_localidades = {}
+        for loc in localidades:
+            departamento = (loc.get("departamento") or {}).get("nombre") or ""
+            clave = (loc["provincia"]["nombre"], departamento)
+            dict_localidades.setdefault(clave, []).append(loc["nombre"])
+
+        return cls([p["nombre"] for p in provincias], dict_departamentos, dict_localidades,
+                   generado=time.time())
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Inversa de a_dict()"""
+        localidades = {
+            (prov, dpto): nombres
+            for prov, por_dpto in datos["localidades"].items()
+            for dpto, nombres in por_dpto.items()
+        }
+        return cls(datos["provincias"], datos["departamentos"], localidades, generado=datos["generado"])
+
+    def a_dict(self):
+        localidades = {}
+        for (prov, dpto), nombres in self._localidades_por_departamento.items():
+            localidades.setdefault(prov, {})[dpto] = list(nombres)
+        return {
+            "version": SNAPSHOT_VERSION,
+            "generado": self.generado,
+            "provincias": list(self.provincias),
+            "departamentos": {prov: list(nombres) for prov, nombres in self._departamentos.items()},
+            "localidades": localidades,
+        }
+
+    def departamentos(self, provincia):
+        return self._departamentos.get(provincia, ())
+
+    def localidades(self, provincia, departamento=None):
+        if departamento is None:
+            return self._localidades.get(provincia, ())
+        return self._localidades_por_departamento.get((provincia, departamento), ())
+
+    def buscar_localidades(self, provincia, texto, limite=BUSQUEDA_LIMITE):
+        """Hasta ``limite`` localidades de la provincia con alguna palabra que empiece con ``texto``.
+
+        No distingue mayúsculas ni tildes. Primero van las que empiezan con el
+        texto, después las que lo tienen en otra palabra y al final las de un
+        departamento que coincide; sin texto, las primeras en orden alfabético.
+        """
+        consulta = normalizar(texto or "")
+        if not consulta:
+            return self.localidades(provincia)[:limite]
+
+        if provincia not in self._busqueda:
+            # Dos sesiones pueden armarlo a la vez: el resultado es el mismo y gana cualquiera
+            self._busqueda[provincia] = _indice_busqueda({
+                dpto: nombres for (prov, dpto), nombres in self._localidades_por_departamento.items()
+                if prov == provincia
+            })
+        entradas, orden = self._busqueda[provincia]
+
+        rangos = {}
+        for posicion in range(bisect_left(entradas, (consulta,)), len(entradas)):
+            clave, rango, nombre = entradas[posicion]
+            if not clave.startswith(consulta):
+                break
+            rangos[nombre] = min(rango, rangos.get(nombre, rango))
+        return tuple(sorted(rangos, key=lambda nombre: (rangos[nombre], orden[nombre])))[:limite]
+
+
+def _pedir_todo(sesion, recurso):
+    """Trae todas las páginas de un recurso de georef"""
+    items = []
+    inicio = 0
+    while True:
+        resp = sesion.get(
+            f"{GEOREF_URL}/{recurso}",
+            params={"campos": RECURSOS[recurso], "max": GEOREF_MAX, "inicio": inicio},
+            timeout=GEOREF_TIMEOUT
+        )
+        resp.raise_for_status()
+        datos = resp.json()
+        items.extend(datos[recurso])
+        inicio += datos["cantidad"]
+        if datos["cantidad"] == 0 or inicio >= datos["total"]:
+            return items
+
+
+def crear_sesion():
+    """Sesión con pool de conexiones que reintenta los GET con espera exponencial.
+
+    Sólo se reintentan errores de conexión y respuestas 429/5xx (respetando
+    Retry-After); agotados los reintentos, requests levanta una RequestException.
+    """
+    reintentos = Retry(
+        total=GEOREF_REINTENTOS,
+        backoff_factor=GEOREF_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    sesion = requests.Session()
+    adaptador = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=len(RECURSOS),
+                                              max_retries=reintentos)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+@metricas.medir("georef: descarga")
+def descargar_indice():
+    """Descarga los tres recursos en paralelo con una sesión compartida"""
+    with crear_sesion() as sesion:
+        with ThreadPoolExecutor(max_workers=len(RECURSOS)) as pool:
+            futuros = {recurso: pool.submit(_pedir_todo, sesion, recurso) for recurso in RECURSOS}
+            datos = {recurso: futuro.result() for recurso, futuro in futuros.items()}
+
+    return IndiceGeografico.desde_api(datos["provincias"], datos["departamentos"], datos["localidades"])
+
+
+def guardar_snapshot(indice, ruta=SNAPSHOT_PATH):
+    """Escribe el snapshot en un temporal y lo reemplaza de forma atómica"""
+    ruta = Path(ruta)
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+                gz.write(json.dumps(indice.a_dict(), ensure_ascii=False).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, ruta)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@metricas.medir("georef: snapshot")
+def cargar_snapshot(ruta=SNAPSHOT_PATH):
+    """Devuelve el índice del snapshot, o None si falta, está dañado o es de otra versión"""
+    try:
+        with gzip.open(ruta, "rb") as gz:
+            datos = json.loads(gz.read().decode("utf-8"))
+        if datos.get("version") != SNAPSHOT_VERSION:
+            log.warning("Snapshot georef %s con versión %s, se ignora", ruta, datos.get("version"))
+            return None
+        return IndiceGeografico.desde_dict(datos)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.warning("No se pudo leer el snapshot georef %s: %s", ruta, e)
+        return None
+
+
+class ServicioGeografico:
+    """Sirve el índice del snapshot local y lo refresca desde la API en segundo plano.
+
+    Funciona como un circuit breaker: después de un refresco fallido no se vuelve
+    a llamar a la API por REINTENTO_REFRESCO segundos, espera que se duplica con
+    cada fallo seguido (hasta REINTENTO_MAXIMO). Mientras tanto, y si la API
+    devuelve datos inválidos, se sigue sirviendo el último índice bueno.
+    """
+
+    def __init__(self, ruta=None, vigencia=SNAPSHOT_VIGENCIA):
+        # Se lee y se refresca ``ruta``; si todavía no existe o es más viejo, se arranca del snapshot del script
+        self._ruta = Path(ruta or SNAPSHOT_COMPARTIDO or SNAPSHOT_CACHE)
+        self._vigencia = vigencia
+        self._lock = threading.Lock()
+        self._indice = None
+        self._refrescando = False
+        self._ultimo_intento = 0.0
+        self._fallos = 0  # refrescos fallidos seguidos
+
+    @property
+    def indice(self):
+        """Índice actual; nunca bloquea por la red"""
+        if self._indice is None:
+            with self._lock:
+                if self._indice is None:
+                    candidatos = [cargar_snapshot(self._ruta)]
+                    if self._ruta != SNAPSHOT_PATH:
+                        # Tras un deploy con un snapshot regenerado, el del script puede ser el más nuevo
+                        candidatos.append(cargar_snapshot(SNAPSHOT_PATH))
+                    candidatos = [indice for indice in candidatos if indice is not None]
+                    self._indice = max(candidatos, key=lambda indice: indice.generado or 0,
+                                       default=IndiceGeografico([], {}, {}))
+        if self._vencido():
+            self.refrescar_en_segundo_plano()
+        return self._indice
+
+    def _vencido(self):
+        generado = self._indice.generado
+        return generado is None or time.time() - generado > self._vigencia
+
+    def espera(self):
+        """Segundos que el circuito queda abierto después del último intento"""
+        if self._fallos == 0:
+            return REINTENTO_REFRESCO
+        return min(REINTENTO_REFRESCO * 2 ** (self._fallos - 1), REINTENTO_MAXIMO)
+
+    def refrescar_en_segundo_plano(self):
+        with self._lock:
+            if self._refrescando or time.time() - self._ultimo_intento < self.espera():
+                return
+            self._refrescando = True
+            self._ultimo_intento = time.time()
+        threading.Thread(target=self._refrescar, name="georef-refresco", daemon=True).start()
+
+    def _refrescar(self):
+        try:
+            self._ruta.parent.mkdir(parents=True, exist_ok=True)
+            # Una sola réplica a la vez descarga; si otra lo está haciendo, se toma su snapshot en el próximo intento
+            with bloqueos.bloqueo(self._ruta.with_name(self._ruta.name + ".lock"), esperar=False) as obtenido:
+                if obtenido:
+                    self._actualizar()
+        except OSError as e:
+            # Sin permiso para crear la carpeta o el bloqueo: se refresca igual, sin coordinar con otras réplicas
+            log.warning("No se pudo tomar el bloqueo del snapshot georef %s: %s", self._ruta, e)
+            self._actualizar()
+        finally:
+            self._refrescando = False
+
+    def _actualizar(self):
+        # Otra réplica pudo haber reescrito el snapshot compartido desde que se leyó
+        compartido = cargar_snapshot(self._ruta)
+        if compartido is not None and (compartido.generado or 0) > (self._indice.generado or 0):
+            self._indice = compartido
+            self._fallos = 0
+            if not self._vencido():
+                log.info("Snapshot georef tomado de %s", self._ruta)
+                return
+        try:
+            nuevo = descargar_indice()
+            if not nuevo.provincias:
+                raise ValueError("la API devolvió un índice vacío")
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            self._fallos += 1
+            log.warning("No se pudo refrescar georef (%d fallos seguidos), se sigue con el snapshot "
+                        "y se reintenta en %d s: %s", self._fallos, self.espera(), e)
+            return
+        self._fallos = 0
+        # Reemplazo atómico: las sesiones que ya tenían el índice anterior lo siguen usando
+        self._indice = nuevo
+        try:
+            guardar_snapshot(nuevo, self._ruta)
+            log.info("Snapshot georef actualizado (%d provincias)", len(nuevo.provincias))
+        except OSError as e:
+            log.warning("No se pudo escribir el snapshot georef %s: %s", self._ruta, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga el índice de georef y regenera el snapshot del script")
+    parser.add_argument("--salida", type=Path, default=SNAPSHOT_PATH, help="dónde escribirlo")
+    args = parser.parse_args()
+    indice = descargar_indice()
+    guardar_snapshot(indice, args.salida)
+    total = sum(len(indice.localidades(provincia)) for provincia in indice.provincias)
+    print(f"Snapshot guardado en {args.salida} ({len(indice.provincias)} provincias, {total} localidades)")
@@ -0,0 +1,47 @@
+"""Huellas (hashes de contenido) de lo que el formulario guarda en session_state.
+
+Sirven para saber si algo cambió entre reruns sin comparar objeto por objeto.
+"""
+import hashlib
+import pandas as pd
+
+
+def huella(valor):
+    """Hash del contenido (no de la identidad) de un valor de session_state"""
+    h = hashlib.blake2b(digest_size=16)
+    _alimentar(h, valor)
+    return h.hexdigest()
+
+
+def _alimentar(h, valor):
+    if isinstance(valor, pd.DataFrame):
+        # Columna por columna: para las tablas chicas del formulario es bastante más rápido
+        # que hash_pandas_object, y se calcula en cada rerun de cada fragmento
+        h.update(b"D")
+        h.update(repr((list(valor.columns), [str(t) for t in valor.dtypes], valor.index.tolist())).encode("utf-8"))
+        for _, serie in valor.items():
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                h.update(repr(serie.cat.categories.tolist()).encode("utf-8"))
+                h.update(serie.cat.codes.to_numpy().tobytes())
+                h.update(b"\x00")
+                continue
+            datos = serie.to_numpy()
+            if datos.dtype.kind in "biuf":
+                h.update(datos.tobytes())
+            else:
+                h.update(repr(datos.tolist()).encode("utf-8"))
+            h.update(b"\x00")
+    elif isinstance(valor, dict):
+        h.update(b"{")
+        for k, v in valor.items():
+            _alimentar(h, k)
+            _alimentar(h, v)
+        h.update(b"}")
+    elif isinstance(valor, (list, tuple)):
+        h.update(b"[")
+        for v in valor:
+            _alimentar(h, v)
+        h.update(b"]")
+    else:
+        h.update(repr(valor).encode("utf-8"))
+        h.update(b"\x00")
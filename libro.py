@@ -0,0 +1,322 @@
+"""Hojas del libro de exportación a partir del estado del formulario.
+
+Todo lo que arma el Excel que se comparte con QTM, sin Streamlit: cada hoja se
+construye desde un ``estado`` que se comporta como un dict (st.session_state en
+el formulario, o el progreso guardado cargado con progreso.py en
+exportar_lote.py). ``exportar(estado)`` devuelve los bytes del .xlsx; la
+escritura del libro y la caché de hojas están en exportacion.py.
+
+Importar el módulo no carga pandas ni openpyxl: cada función los importa al
+usarlos, así un proceso que sólo define o lista las hojas arranca al instante.
+"""
+import opciones
+
+FUENTES_VENTAS_COMPRAS = ["ventas_interno", "ventas_externo", "compras"]
+
+
+# Crear helper
+def crear_df(contenido, columnas):
+    import pandas as pd
+    if isinstance(contenido, pd.DataFrame):
+        return contenido if not contenido.empty else pd.DataFrame(columns=columnas)
+    elif contenido:
+        return pd.DataFrame(contenido)
+    else:
+        return pd.DataFrame(columns=columnas)
+
+def dict_a_texto(tabla):
+    """Convierte una lista de dicts en texto concatenado por filas"""
+    if isinstance(tabla, list) and tabla:
+        return "\n".join([", ".join([f"{k}: {v}" for k, v in fila.items()]) for fila in tabla])
+    return ""
+
+# Resúmenes que van como texto en una sola celda de la hoja de info general
+RESUMENES_TEXTO = {
+    "Resumen Avales": "avales",
+    "Resumen Filiatorios": "filiatorios",
+    "Resumen Empresas Controlantes": "empresas_controlantes",
+    "Resumen Empresas Vinculadas": "empresas_vinculadas",
+    "Resumen Clientes a Descontar": "clientes_descontar",
+    "Resumen Proveedores": "proveedores",
+    "Resumen Clientes": "clientes",
+    "Resumen Competidores": "competidores",
+    "Resumen Referencias Bancarias": "referencias_bancarias",
+}
+
+def hoja_info_general(estado):
+    import pandas as pd
+    # Clonar las respuestas y limpiar claves que tengan "/"
+    respuestas_limpias = {
+        k.replace("/", "-").replace("  ", " ").strip(): v
+        for k, v in estado.get("respuestas", {}).items()
+    }
+    for titulo, clave in RESUMENES_TEXTO.items():
+        respuestas_limpias[titulo] = dict_a_texto(estado.get(clave, []))
+    return pd.json_normalize(respuestas_limpias, sep=".")
+
+def hoja_avales(estado):
+    df_avales = crear_df(estado.get("avales", []), ["Tipo Aval", "Detalle Aval", "Monto", "Tipo Contragarantía", "Detalle Contragarantía"])
+    if not df_avales.empty:
+        df_avales["Total solicitado"] = df_avales["Monto"].sum()
+    return df_avales
+
+def hoja_desde_session(clave, columnas):
+    """Constructor de hoja para una lista o DataFrame guardado tal cual en el estado"""
+    return lambda estado: opciones.categorizar(crear_df(estado.get(clave, []), columnas), clave)
+
+def hoja_clave(clave):
+    """Constructor de hoja para un DataFrame del estado (vacío si no está)"""
+    def construir(estado):
+        import pandas as pd
+        return estado[clave] if clave in estado else pd.DataFrame()
+    return construir
+
+# === Tabla ancha de cada flujo, proyectada desde la tabla larga ===
+def reconstruir_df_completo(estado, nombre_variable_session):
+    import ventas
+    largo = estado["ventas_compras"] if "ventas_compras" in estado else ventas.vacia()
+    return ventas.a_ancha(largo, nombre_variable_session)
+
+def ordenar_por_tipo(df):
+    orden = {"AGROPECUARIO": 0, "INDUSTRIA": 1, "COMERCIO": 2, "SERVICIOS": 3, "CONSTRUCCION": 4}
+    return df.sort_values(by="Tipo", key=lambda x: x.map(orden), kind="stable").reset_index(drop=True)
+
+def hoja_ventas_compras(nombre):
+    # Consolidar y ordenar por tipo
+    return lambda estado: ordenar_por_tipo(reconstruir_df_completo(estado, nombre))
+
+def hoja_planes_ventas(estado):
+    import pandas as pd
+    # --- Plan de Ventas por Actividad ---
+    df_planes_ventas_actividad = []
+    for actividad, df in estado.get("planes_guardados_por_actividad", {}).items():
+        if isinstance(df, pd.DataFrame):
+            df_temp = df.copy()
+            df_temp.insert(0, "Actividad", actividad)
+            df_planes_ventas_actividad.append(df_temp)
+    return pd.concat(df_planes_ventas_actividad, ignore_index=True) if df_planes_ventas_actividad else pd.DataFrame()
+
+def hoja_agricultura(estado):
+    import pandas as pd
+    # Convertir Agricultura por campaña en único DataFrame usando los nombres personalizados
+    campanias_fijas = {
+        "actual": "ej 24/25",
+        "hace_1": "ej 23/24",
+        "un_año_adelante": "ej 25/26"
+    }
+    nombres_visibles = estado.get("nombres_visibles_campanias", {})
+
+    df_agricultura_total = []
+    for clave_logica, clave_real in campanias_fijas.items():
+        df = estado.get("agricultura_por_campania", {}).get(clave_real)
+        if isinstance(df, pd.DataFrame) and not df.empty:
+            nombre_visible = nombres_visibles.get(clave_logica, clave_real)
+            df_temp = df.copy()
+            df_temp.insert(0, "Campaña", nombre_visible)
+            df_agricultura_total.append(df_temp)
+
+    return pd.concat(df_agricultura_total, ignore_index=True) if df_agricultura_total else pd.DataFrame()
+
+def hoja_ganaderia(estado):
+    # Convertir planes de ventas por actividad en Ganadería a un DataFrame
+    import pandas as pd
+    return estado.get("planes_guardados_por_actividad", {}).get("Ganadería", pd.DataFrame())
+
+# === Exportar Índices de Ganadería con chequeo robusto ===
+def exportar_indices(nombre_df, columnas=["Ítem", "Valor"]):
+    def construir(estado):
+        import pandas as pd
+        df = estado.get(nombre_df)
+        if isinstance(df, pd.DataFrame) and not df.dropna(how="all").empty:
+            return df.reset_index(drop=True)
+        return pd.DataFrame(columns=columnas)
+    return construir
+
+def hoja_opcional(clave):
+    """Hoja que sólo se exporta si el DataFrame existe y tiene datos"""
+    def construir(estado):
+        df = estado.get(clave)
+        return df if df is not None and not df.empty else None
+    return construir
+
+def hoja_datos_detallados(estado):
+    import pandas as pd
+    return pd.concat([
+        estado.get("df_combinado_ventas_interno", pd.DataFrame()).assign(Origen="Ventas Interno"),
+        estado.get("df_combinado_ventas_externo", pd.DataFrame()).assign(Origen="Ventas Externo"),
+        estado.get("df_combinado_compras", pd.DataFrame()).assign(Origen="Compras")
+    ], ignore_index=True)
+
+# === Exportar los resúmenes simples de ventas y compras al Excel ===
+orden_cols = ["Mes", "Año en curso", "Año 1", "Año 2", "Año 3"]
+meses_ordenados = opciones.MESES
+
+def asegurar_formato_resumen(df):
+    import pandas as pd
+    if df is None or df.empty:
+        return pd.DataFrame({
+            "Mes": meses_ordenados,
+            "Año en curso": [0]*12,
+            "Año 1": [0]*12,
+            "Año 2": [0]*12,
+            "Año 3": [0]*12
+        })
+    else:
+        df = df.copy()
+        df = df.set_index("Mes").reindex(meses_ordenados, fill_value=0).reset_index()
+        df = df[orden_cols]
+        return df
+
+def hoja_resumen_simple(clave):
+    return lambda estado: asegurar_formato_resumen(estado.get(clave))
+
+def hoja_comercializacion(estado):
+    # === GENERAR TABLA DE COMERCIALIZACIÓN Y PROVEEDORES ===
+    import pandas as pd
+    respuestas = estado.get("respuestas", {})
+    comercializa = respuestas.get("Comercializa", {})
+    proveedores = respuestas.get("Proveedores", {})
+
+    fila_resultado = {}
+    for act in opciones.ACTIVIDADES:  # Todas, no solo las seleccionadas
+        fila_resultado[f"Comercializa.{act}"] = comercializa.get(act, "")
+        fila_resultado[f"Proveedores.{act}"] = proveedores.get(act, "")
+
+    return pd.DataFrame([fila_resultado])
+
+# (nombre de hoja, claves del estado de las que sale, constructor(estado), exportar índice)
+# El orden de la lista es el orden de las hojas en el libro.
+HOJAS_EXPORTACION = [
+    ("Resumen Info General", ("respuestas",) + tuple(RESUMENES_TEXTO.values()), hoja_info_general, False),
+    ("Avales", ("avales",), hoja_avales, False),
+    ("Filiatorios", ("filiatorios",), hoja_desde_session("filiatorios", ["Nombre y Apellido", "CUIT / CUIL", "Cargo", "% Participación", "Estado Civil", "Nombre Cónyuge", "Fiador"]), False),
+    ("Empresas Controlantes", ("empresas_controlantes",), hoja_desde_session("empresas_controlantes", ["Razón Social", "CUIT", "% de Participación", "Código de la actividad principal"]), False),
+    ("Empresas Vinculadas", ("empresas_vinculadas",), hoja_desde_session("empresas_vinculadas", ["Razón Social", "CUIT", "% de Participación", "Código de la actividad principal"]), False),
+    ("Clientes a Descontar", ("clientes_descontar",), hoja_desde_session("clientes_descontar", ["Denominación", "CUIT", "Tipo", "Modalidad de Cobro", "Descuenta de Cheques"]), False),
+    ("Proveedores", ("proveedores",), hoja_desde_session("proveedores", ["Denominación", "CUIT", "Teléfono", "Local o Exterior", "Modalidad de Pago", "Plazo en Días", "% Compras"]), False),
+    ("Clientes", ("clientes",), hoja_desde_session("clientes", ["Denominación", "CUIT", "Teléfono", "Local o Exterior", "Modalidad de Pago", "Plazo en Días", "% Ventas"]), False),
+    ("Competidores", ("competidores",), hoja_desde_session("competidores", ["Denominación", "CUIT", "Teléfono", "Segmento", "Participacion del Mercado %", "Condiciones de ventas"]), False),
+    ("Referencias Bancarias", ("referencias_bancarias",), hoja_desde_session("referencias_bancarias", ["Entidad Financiera", "Contacto", "Sucursal", "Tel", "Mail"]), False),
+
+    ("Deuda Bancaria", ("bancos",), hoja_desde_session("bancos", [
+        "Entidad", "Tipo de Moneda","Margen Total Asignado (Calificación)","Saldo Préstamos Amortizables", "Garantía (*)", "Valor de la Cuota",
+        "Régimen de Amortización (**)", "Cantidad Cuotas Faltantes", "Descuento de Cheques Utilizado",
+        "Adelanto en Cta Cte Utilizado", "Avales SGR", "Tarjeta de Crédito Utilizado", "Leasing Utilizado",
+        "Impo/Expo Utilizado", "Tasa Promedio $", "Tasa Promedio USD", "Fecha desembolso (dd/mm/yyyy)","Fecha último vencimiento (dd/mm/yyyy)"
+    ]), False),
+    ("Deuda Mercado", ("mercado",), hoja_desde_session("mercado", [
+        "Obligaciones Negociables", "Descuento de Cheques Propios", "Pagaré Bursátil",
+        "Organismos Multilaterales (CFI)", "Otros (1)", "Otros (2)", "Tasa Promedio $",
+        "Tasa Promedio USD", "Tipo de Moneda"
+    ]), False),
+    ("Deuda Comercial", ("deudas_comerciales",), hoja_desde_session("deudas_comerciales", ["A favor de", "Tipo de Moneda", "Monto", "Garantía", "Tasa", "Plazo (días)"]), False),
+    ("Resumen Deuda Bancaria", ("resumen_deuda_bancaria",), hoja_clave("resumen_deuda_bancaria"), False),
+] + [
+    (nombre.replace("_", " ").title(), ("ventas_compras",), hoja_ventas_compras(nombre), False)
+    for nombre in FUENTES_VENTAS_COMPRAS
+] + [
+    ("Plan Ventas Actividad", ("planes_guardados_por_actividad",), hoja_planes_ventas, False),
+
+    ("Campos Propios", ("df_campos",), hoja_desde_session("df_campos", ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Titularidad", "Has", "Valor U$/ha", "Has Hipotecadas", "Estado Actual"]), False),
+    ("Campos Arrendados", ("df_campos_arrendados",), hoja_desde_session("df_campos_arrendados", ["Nombre del Campo", "Provincia", "Partido", "Localidad", "Arrendador", "Has Arrendadas", "Valor U$/ha", "Metodología de Pago", "Duración del Contrato"]), False),
+    ("Agricultura", ("agricultura_por_campania", "nombres_visibles_campanias"), hoja_agricultura, False),
+    ("Ganadería", ("planes_guardados_por_actividad",), hoja_ganaderia, False),
+    ("Base Forrajera", ("df_base_forrajera",), hoja_desde_session("df_base_forrajera", ["Categoria", "Has"]), False),
+    ("Hacienda de Terceros", ("df_hacienda",), hoja_desde_session("df_hacienda", ["Categoria", "Cantidad de Cabezas", "Pastoreo o capitalización"]), False),
+    ("Otras Actividades", ("df_otros",), hoja_desde_session("df_otros", ["Descripción"]), False),
+
+    ("Cría", ("df_cria",), hoja_desde_session("df_cria", ["Vacas", "Vaquillonas", "Terneros/as", "Toros"]), True),
+    ("Invernada", ("df_invernada",), hoja_desde_session("df_invernada", ["Novillos", "Novillitos", "Vacas Descarte", "Vaquillonas"]), True),
+    ("Feedlot", ("df_feedlot",), hoja_desde_session("df_feedlot", ["Novillos", "Novillitos", "Vacas Descarte", "Vaquillonas"]), True),
+    ("Tambo", ("df_tambo",), hoja_desde_session("df_tambo", ["Vacas (VO+VS)", "Vaquillonas", "Terneras", "Terneros", "Toros"]), True),
+
+    ("Índices Cría", ("indices_cria",), exportar_indices("indices_cria"), False),
+    ("Índices Invernada", ("indices_invernada",), exportar_indices("indices_invernada"), False),
+    ("Índices Feedlot", ("indices_feedlot",), exportar_indices("indices_feedlot"), False),
+    ("Índices Tambo", ("indices_tambo",), exportar_indices("indices_tambo"), False),
+] + [
+    # Resúmenes por subtipo (últimos 12 meses) y comparativos anuales, si están disponibles
+    (f"{prefijo_hoja} - {nombre.replace('_', ' ').title()}", (f"{prefijo_clave}_{nombre}",), hoja_opcional(f"{prefijo_clave}_{nombre}"), False)
+    for nombre in FUENTES_VENTAS_COMPRAS
+    for prefijo_hoja, prefijo_clave in [("Resumen 12M", "df_por_subtipo_12m"), ("Comparativo", "df_comparativo_anual")]
+] + [
+    ("Datos Detallados", ("df_combinado_ventas_interno", "df_combinado_ventas_externo", "df_combinado_compras"), hoja_datos_detallados, False),
+    ("Resumen 12 Meses", ("resumen_12_meses_ventas",), hoja_clave("resumen_12_meses_ventas"), False),
+    ("Resumen Ventas", ("resumen_ventas_simple",), hoja_resumen_simple("resumen_ventas_simple"), False),
+    ("Resumen Compras", ("resumen_compras_simple",), hoja_resumen_simple("resumen_compras_simple"), False),
+    ("Comercialización", ("respuestas",), hoja_comercializacion, False),
+]
+
+# Claves del estado que entran al Excel: si su huella no cambió, se reutiliza el último archivo
+CLAVES_EXPORTACION = tuple(dict.fromkeys(clave for _, claves, _, _ in HOJAS_EXPORTACION for clave in claves))
+
+
+def completar_resumenes(estado):
+    """El estado con los resúmenes que el formulario calcula al mostrarse.
+
+    Los resúmenes no se guardan con el progreso (ver estado.py); acá se
+    calculan igual que en el formulario a partir de las tablas guardadas.
+    Devuelve un dict nuevo y no modifica ``estado``.
+    """
+    import pandas as pd
+
+    import resumenes
+    import ventas
+
+    estado = dict(estado)
+    largo = estado.get("ventas_compras")
+    if largo is None:
+        # Los progresos viejos traen una tabla ancha por flujo
+        anchas = {nombre: estado.pop(nombre) for nombre in ventas.FLUJOS if nombre in estado}
+        if anchas:
+            largo = estado["ventas_compras"] = ventas.desde_anchas(anchas)
+    if largo is not None:
+        resumen_12_meses = resumenes.resumen_12_meses(
+            largo, ["ventas_interno", "ventas_externo"], opciones.MESES, opciones.SUBCATEGORIAS_AGRO)
+        if resumen_12_meses is not None:
+            estado["resumen_12_meses_ventas"] = resumen_12_meses
+        estado["resumen_ventas_simple"] = resumenes.resumen_mensual(
+            largo, ["ventas_interno", "ventas_externo"], opciones.MESES)
+        estado["resumen_compras_simple"] = resumenes.resumen_mensual(largo, ["compras"], opciones.MESES)
+
+    bancos = estado.get("bancos")
+    columnas_deuda = resumenes.CLAVES_DEUDA_BANCARIA + resumenes.COLUMNAS_MONTOS_BANCOS + ["Tasa Promedio $", "Tasa Promedio USD"]
+    if isinstance(bancos, pd.DataFrame) and set(columnas_deuda) <= set(bancos.columns):
+        estado["resumen_deuda_bancaria"] = resumenes.resumen_deuda_bancaria(
+            opciones.categorizar(bancos, "bancos"),
+            estado.get("acuerdo_descubierto", 0.0), estado.get("cpd_descontados", 0.0),
+            tasa_ponderada=estado.get("tasa_ponderada_deuda", False))
+    return estado
+
+
+def generar(estado, cache_hojas=None):
+    """Bytes del .xlsx con todas las hojas de HOJAS_EXPORTACION.
+
+    Con ``cache_hojas`` (un exportacion.CacheHojas) cada hoja se reconstruye
+    únicamente si cambió la huella de sus claves de origen.
+    """
+    import exportacion
+    from huellas import huella
+
+    hojas = []
+    for nombre_hoja, claves, construir, con_indice in HOJAS_EXPORTACION:
+        if cache_hojas is None:
+            df = construir(estado)
+            hoja = exportacion.serializar_hoja(df, con_indice) if df is not None else None
+        else:
+            huella_hoja = huella({k: estado.get(k) for k in claves})
+            hoja = cache_hojas.obtener(nombre_hoja, huella_hoja, lambda: construir(estado), con_indice)
+        if hoja is not None:
+            hojas.append((nombre_hoja, hoja))
+
+    return exportacion.escribir_libro(hojas)
+
+
+def exportar(estado):
+    """Bytes del .xlsx que descarga el formulario, a partir del estado guardado.
+
+    ``estado`` es un dict {clave: valor} como el que devuelve
+    progreso.AlmacenProgreso.cargar(); los resúmenes se recalculan con
+    completar_resumenes.
+    """
+    return generar(completar_resumenes(estado))
@@ -0,0 +1,96 @@
+"""Tiempos por sección del formulario, para saber dónde se va el tiempo cuando "se cuelga".
+
+``medir(seccion)`` se usa como context manager o como decorador: mide el bloque,
+lo suma al registro del proceso y emite un log estructurado (una línea JSON
+por medición en el logger "metricas": sección, ms, error si lo hubo y el
+contexto que se pase). Lo que tarda más de LENTO segundos sale como warning.
+
+El registro guarda las últimas MUESTRAS mediciones de cada sección y da p50 y
+p95; el formulario lo muestra en un panel del sidebar sólo para
+administradores. Es por proceso: todas las sesiones de un mismo servidor
+suman al mismo registro.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+MUESTRAS = 500  # por sección
+LENTO = 2.0  # segundos
+
+
+def _percentil(ordenados, q):
+    # Interpolación lineal entre los dos valores más cercanos (como numpy.percentile)
+    posicion = (len(ordenados) - 1) * q
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+class Registro:
+    """Últimas mediciones por sección, compartidas por todos los hilos del proceso"""
+
+    def __init__(self, muestras=MUESTRAS):
+        self._muestras = muestras
+        self._lock = threading.Lock()
+        self._tiempos = {}  # sección -> deque de segundos
+        self._totales = {}  # sección -> cantidad de mediciones desde el inicio
+
+    def agregar(self, seccion, segundos):
+        with self._lock:
+            if seccion not in self._tiempos:
+                self._tiempos[seccion] = deque(maxlen=self._muestras)
+                self._totales[seccion] = 0
+            self._tiempos[seccion].append(segundos)
+            self._totales[seccion] += 1
+
+    def resumen(self):
+        """[(sección, mediciones, p50, p95, máximo)] en segundos, de la más lenta (p95) a la más rápida"""
+        with self._lock:
+            copias = {seccion: sorted(tiempos) for seccion, tiempos in self._tiempos.items()}
+            totales = dict(self._totales)
+        filas = [
+            (seccion, totales[seccion], _percentil(tiempos, 0.5), _percentil(tiempos, 0.95), tiempos[-1])
+            for seccion, tiempos in copias.items()
+        ]
+        return sorted(filas, key=lambda fila: fila[3], reverse=True)
+
+    def limpiar(self):
+        with self._lock:
+            self._tiempos.clear()
+            self._totales.clear()
+
+
+REGISTRO = Registro()
+
+
+def registrar(seccion, segundos, error=None, registro=REGISTRO, **contexto):
+    """Suma una medición al registro y la emite en el log"""
+    registro.agregar(seccion, segundos)
+    nivel = logging.WARNING if segundos >= LENTO else logging.INFO
+    # El JSON sólo se arma si alguien escucha ese nivel
+    if log.isEnabledFor(nivel):
+        evento = {"evento": "tiempo", "seccion": seccion, "ms": round(segundos * 1000, 1)}
+        if error is not None:
+            evento["error"] = error
+        evento.update(contexto)
+        log.log(nivel, json.dumps(evento, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def medir(seccion, registro=REGISTRO, **contexto):
+    """Mide el bloque (o la función decorada) y lo registra como ``seccion``, aunque falle"""
+    inicio = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        # Los st.rerun()/st.stop() de Streamlit heredan de BaseException y no cuentan como error
+        error = type(e).__name__
+        raise
+    finally:
+        registrar(seccion, time.perf_counter() - inicio, error, registro, **contexto)
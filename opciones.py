@@ -0,0 +1,97 @@
+"""Listas de opciones del formulario y los dtypes categóricos que salen de ellas.
+
+Las columnas que sólo toman valores de una lista (Mes, Tipo, Garantía, Cargo...)
+se guardan como pandas Categorical: cada celda es un código entero y el texto
+de cada opción está una sola vez por columna. TABLAS dice qué columnas de qué
+tabla de session_state son categóricas; ``categorizar`` lo aplica al crear o
+guardar cada tabla. Los valores que no están en la lista (progresos viejos,
+celdas vacías) se conservan como categorías extra al final.
+
+Las listas no dependen de pandas; se importa recién al convertir una tabla.
+Son tuplas y mapeos de sólo lectura: un único objeto por proceso que comparten
+todas las sesiones (como el índice de georef.py) sin que ninguna pueda
+modificarlo.
+"""
+from types import MappingProxyType
+
+MESES = ("Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+         "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre")
+
+# Ventas y compras
+TIPOS_ACTIVIDAD = ("COMPLETAR", "AGROPECUARIO", "INDUSTRIA", "COMERCIO", "SERVICIOS", "CONSTRUCCION")
+SUBCATEGORIAS_AGRO = ("COMPLETAR", "AGRICULTURA", "GANADERIA", "TAMBO", "OTROS")
+
+# Actividades del plan de ventas y sus columnas
+ACTIVIDADES = ("Agricultura", "Ganadería", "Tambo", "Otros")
+PRODUCTOS_AGRICULTURA = ("Trigo", "Maíz", "Soja", "Girasol")
+CATEGORIAS_GANADERIA = ("Novillos", "Vaquillonas", "Terneros", "Vacas")
+
+# Deudas
+GARANTIAS = ("Completar", "Fianza / Sola Firma (F)", "Prenda (P)", "Hipoteca (H)", "Warrant (W)", "Forward (FW)", "Cesión (C)", "Plazo Fijo (PF)")
+REGIMENES_AMORTIZACION = ("Completar", "Mensual", "Bimestral", "Trimestral", "Semestral", "Anual")
+MONEDAS = ("ARS", "USD")
+
+# Datos filiatorios
+CARGOS = ("COMPLETAR", "SOCIO GERENTE", "DIRECTOR", "SOCIO", "ACCIONISTA", "PRESIDENTE", "VICEPRESIDENTE", "APODERADO")
+ESTADOS_CIVILES = ("COMPLETAR", "SOLTERO", "CASADO", "DIVORCIADO")
+SI_NO = ("SI", "NO")
+
+# Libradores a descontar
+TIPOS_LIBRADOR = ("COMPLETAR", "PRINCIPAL CLIENTE", "LIBRADOR A DESCONTAR")
+MODALIDADES_COBRO = ("COMPLETAR", "CONTADO", "30 DIAS", "45 DIAS", "60 DIAS", "90 DIAS", "120 DIAS", "180 DIAS", "MAS DE 180 DIAS", "365 DIAS")
+DESCUENTA_CHEQUES = ("COMPLETAR", "SI", "NO")
+
+# Proveedores y clientes (el plazo usa MODALIDADES_COBRO)
+LOCAL_EXTERIOR = ("COMPLETAR", "LOCAL", "EXTERIOR")
+MODALIDADES_PAGO = ("COMPLETAR", "CONTADO", "A PLAZO")
+
+# Campos y agricultura
+CULTIVOS = ("Maíz", "Soja", "Soja 2da", "Trigo", "Cebada", "Sorgo", "Girasol", "Poroto", "Otros Cultivos")
+METODOLOGIAS_PAGO_ARRIENDO = ("Porcentaje de rinde", "Precio fijo", "Mixto")
+
+# Tabla de session_state -> {columna: opciones}
+TABLAS = MappingProxyType({tabla: MappingProxyType(columnas) for tabla, columnas in {
+    "ventas_compras": {"Mes": MESES, "Tipo": TIPOS_ACTIVIDAD, "Subtipo": SUBCATEGORIAS_AGRO},
+    # Un DataFrame por actividad, todos con la misma columna Mes
+    "planes_guardados_por_actividad": {"Mes": MESES},
+    "bancos": {
+        "Tipo de Moneda": MONEDAS,
+        "Garantía (*)": GARANTIAS,
+        "Régimen de Amortización (**)": REGIMENES_AMORTIZACION,
+    },
+    "mercado": {"Tipo de Moneda": MONEDAS},
+    "deudas_comerciales": {"Tipo de Moneda": MONEDAS},
+    "filiatorios": {"Cargo": CARGOS, "Estado Civil": ESTADOS_CIVILES, "Fiador": SI_NO},
+    "clientes_descontar": {
+        "Tipo": TIPOS_LIBRADOR,
+        "Modalidad de Cobro": MODALIDADES_COBRO,
+        "Descuenta de Cheques": DESCUENTA_CHEQUES,
+    },
+}.items()})
+
+
+def categorica(valores, opciones):
+    """Categorical con las ``opciones`` como categorías más los valores que no estén en ellas"""
+    import pandas as pd
+    valores = pd.Series(valores, dtype=object)
+    extras = [v for v in pd.unique(valores.dropna()) if v not in opciones]
+    return pd.Categorical(valores, categories=list(opciones) + extras)
+
+
+def categorizar(df, tabla):
+    """El DataFrame con las columnas categóricas de ``tabla`` convertidas.
+
+    Si ya lo estaban (o la tabla no tiene columnas categóricas) devuelve el mismo
+    objeto, así se puede llamar en cada rerun sin copiar.
+    """
+    import pandas as pd
+    pendientes = [
+        columna for columna in TABLAS.get(tabla, {})
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype)
+    ]
+    if not pendientes:
+        return df
+    df = df.copy()
+    for columna in pendientes:
+        df[columna] = categorica(df[columna], TABLAS[tabla][columna])
+    return df
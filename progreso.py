@@ -0,0 +1,777 @@
+"""Almacenes de borradores del formulario, por CUIT y por sección.
+
+Todos guardan las secciones del esquema de estado.py ya codificadas, así un
+guardado parcial reescribe sólo las que cambiaron, y cualquier proceso que use
+el mismo almacén puede retomar el borrador de cualquier CUIT. ``crear_almacen``
+elige el almacén según FORMULARIO_PROGRESO_URL:
+
+- una ruta o ``sqlite:///ruta`` (por defecto FORMULARIO_PROGRESO_DB): un único
+  SQLite en modo WAL, para uno o varios procesos en la misma máquina. Cada CUIT
+  tiene una fila en ``progreso`` (formato, revisión, fecha) y una por sección
+  en ``progreso_seccion``; cada guardado es una transacción atómica. Cada
+  guardado completo pasa antes el borrador anterior a ``progreso_version``,
+  donde quedan las últimas FORMULARIO_PROGRESO_VERSIONES revisiones.
+- ``archivos:///carpeta``: un archivo por CUIT, reescrito bajo un bloqueo de
+  archivo por CUIT con fsync y reemplazo atómico, que conserva las últimas
+  FORMULARIO_PROGRESO_VERSIONES versiones; sirve sobre un volumen compartido
+  por varias réplicas.
+- ``redis://...``: un hash por CUIT en Redis o un servidor compatible, para
+  réplicas en distintas máquinas. Necesita el paquete ``redis``.
+
+Autoguardado junta los cambios de una ráfaga de reruns (por ejemplo, varias
+ediciones seguidas en un data_editor) y los escribe una sola vez cuando pasan
+unos segundos sin cambios.
+
+El formulario nunca lee pickle. Los borradores en pickle de versiones
+anteriores (filas con formato 1 y los archivos ``progreso_{cuit}.pkl``) se pasan
+al formato actual una sola vez, a mano, al actualizar:
+
+    python progreso.py --migrar [--db progreso.sqlite3 | archivos:///... | redis://...] [--carpeta .]
+
+Son archivos que escribió el propio servidor; no usar con pickles que vengan de
+afuera. Mientras un CUIT tenga un .pkl sin migrar, el formulario lo avisa y no
+guarda nada de ese CUIT: un borrador nuevo haría que la migración lo saltee.
+
+En el SQLite, una revisión anterior de un borrador se recupera con:
+
+    python progreso.py --versiones CUIT
+    python progreso.py --restaurar CUIT REVISION
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import bloqueos
+import estado
+import metricas
+
+log = logging.getLogger(__name__)
+
+RUTA_DB = os.environ.get("FORMULARIO_PROGRESO_DB", "progreso.sqlite3")
+# Almacén por defecto: URL (archivos:///..., redis://...) o, si no hay, el SQLite de RUTA_DB
+DESTINO = os.environ.get("FORMULARIO_PROGRESO_URL") or RUTA_DB
+FORMATO_PICKLE_ZLIB = 1  # sólo lo lee migrar_legado()
+FORMATO_ESQUEMA = 2  # sólo lectura: todas las secciones juntas en ``payload``
+FORMATO_POR_SECCION = 3  # una fila por sección en ``progreso_seccion``
+AUTOGUARDADO_ESPERA = 3.0  # segundos sin cambios antes de escribir
+# Versiones anteriores de cada borrador que conservan AlmacenProgreso y AlmacenArchivos
+VERSIONES = int(os.environ.get("FORMULARIO_PROGRESO_VERSIONES", "3"))
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS progreso (
+    cuit        TEXT PRIMARY KEY,
+    formato     INTEGER NOT NULL,   -- cómo está codificado el payload
+    revision    INTEGER NOT NULL,   -- cantidad de guardados
+    actualizado REAL NOT NULL,      -- epoch del último guardado
+    payload     BLOB NOT NULL       -- vacío desde el formato 3
+);
+CREATE INDEX IF NOT EXISTS idx_progreso_actualizado ON progreso (actualizado);
+CREATE TABLE IF NOT EXISTS progreso_seccion (
+    cuit        TEXT NOT NULL,
+    seccion     TEXT NOT NULL,
+    actualizado REAL NOT NULL,
+    datos       BLOB NOT NULL,      -- estado.serializar_seccion()
+    PRIMARY KEY (cuit, seccion)
+);
+CREATE TABLE IF NOT EXISTS progreso_version (
+    cuit        TEXT NOT NULL,
+    revision    INTEGER NOT NULL,   -- la revisión que tenía el borrador antes de un guardado
+    seccion     TEXT NOT NULL,
+    actualizado REAL NOT NULL,
+    datos       BLOB NOT NULL,
+    PRIMARY KEY (cuit, revision, seccion)
+);
+"""
+
+
+def archivo_legado(cuit):
+    """Ruta del .pkl que usaban las versiones anteriores del formulario"""
+    return Path(f"progreso_{cuit}.pkl")
+
+
+def crear_almacen(destino=None):
+    """Almacén para ``destino`` (por defecto DESTINO): ruta o URL sqlite://, archivos:// o redis://"""
+    destino = str(destino or DESTINO)
+    if destino.startswith(("redis://", "rediss://", "unix://")):
+        return AlmacenRedis(destino)
+    if destino.startswith("archivos://"):
+        return AlmacenArchivos(destino.removeprefix("archivos://"))
+    return AlmacenProgreso(destino.removeprefix("sqlite://"))
+
+
+class AlmacenBase:
+    """Lo común a todos los almacenes: codificar, decodificar y migrar borradores viejos.
+
+    Cada almacén implementa guardar_codificado, _leer_secciones, _existe,
+    _borrar, listar y expirar.
+    """
+
+    # Errores del almacén tras los que el autoguardado deja los cambios pendientes
+    errores = ()
+
+    def guardar(self, cuit, secciones, completo=True):
+        """Guarda {sección: {clave: valor}} (ver estado.extraer); devuelve el tamaño en bytes.
+
+        Con ``completo=False`` sólo se reescriben las secciones recibidas y el
+        resto queda como estaba.
+        """
+        bloques = {nombre: estado.serializar_seccion(valores) for nombre, valores in secciones.items()}
+        return self.guardar_codificado(cuit, bloques, completo)
+
+    @metricas.medir("progreso: cargar")
+    def cargar(self, cuit, secciones=None):
+        """Devuelve {clave: valor} guardado o None si ese CUIT no tiene borrador.
+
+        Con ``secciones`` sólo se decodifican esas secciones del esquema.
+        """
+        bloques = self._leer_secciones(cuit)
+        if bloques is None:
+            return None
+        return self._decodificar(bloques, secciones)
+
+    @staticmethod
+    def _decodificar(bloques, secciones):
+        resultado = {}
+        for nombre, datos in bloques.items():
+            if secciones is None or nombre in secciones:
+                resultado.update(estado.deserializar_seccion(datos))
+        return resultado
+
+    def _migrar(self, cuit, viejo, secciones):
+        """Reescribe un borrador de un formato anterior con el actual y lo devuelve como si se hubiera cargado"""
+        nuevo = estado.extraer(viejo)
+        self.guardar(cuit, nuevo)
+        return {
+            clave: valor
+            for seccion, valores in nuevo.items()
+            if secciones is None or seccion in secciones
+            for clave, valor in valores.items()
+        }
+
+    def existe(self, cuit):
+        return self._existe(cuit)
+
+    def borrar(self, cuit):
+        """Borra el borrador; devuelve True si había algo para borrar"""
+        borrado = self._borrar(cuit)
+        # Un .pkl sin migrar de ese CUIT también se borra (sin leerlo): no tiene que reaparecer al migrar
+        ruta = archivo_legado(cuit)
+        if ruta.exists():
+            ruta.unlink()
+            borrado = True
+        return borrado
+
+
+class AlmacenProgreso(AlmacenBase):
+    """Borradores en un SQLite compartido por los hilos y procesos de la máquina.
+
+    Cada guardado completo (el botón de guardar, restaurar, una migración)
+    copia antes las secciones vigentes a ``progreso_version``, en la misma
+    transacción, y deja ahí sólo las últimas ``versiones`` revisiones;
+    restaurar() vuelve a una de ellas. Los guardados parciales del
+    autoguardado no rotan versiones: con uno cada pocos segundos, la historia
+    se reduciría a lo último que se tipeó y cada uno reescribiría el borrador
+    entero. Con synchronous=FULL un
+    guardado confirmado sobrevive a un corte de luz.
+    """
+
+    errores = (sqlite3.Error,)
+
+    def __init__(self, ruta=RUTA_DB, versiones=VERSIONES):
+        self.ruta = str(ruta)
+        self.versiones = versiones
+        self._local = threading.local()
+        with self._conexion() as con:
+            con.executescript(ESQUEMA)
+
+    def _conexion(self):
+        # Streamlit atiende cada sesión en su propio hilo: una conexión por hilo
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10)
+            con.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL puede perder los últimos guardados confirmados en un corte de luz
+            con.execute("PRAGMA synchronous=FULL")
+            self._local.con = con
+        return con
+
+    @metricas.medir("progreso: guardar")
+    def guardar_codificado(self, cuit, bloques, completo=True):
+        """Como guardar(), con las secciones ya codificadas: {sección: bytes}"""
+        if not completo and self._formato(cuit) not in (None, FORMATO_POR_SECCION):
+            # Un borrador viejo se pasa entero al formato por sección antes de tocarle una parte
+            self.cargar(cuit)
+        ahora = time.time()
+        with self._conexion() as con:
+            if completo:
+                self._guardar_version(con, cuit)
+                con.execute("DELETE FROM progreso_seccion WHERE cuit = ?", (cuit,))
+            con.executemany(
+                """
+                INSERT INTO progreso_seccion (cuit, seccion, actualizado, datos)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (cuit, seccion) DO UPDATE SET
+                    actualizado = excluded.actualizado,
+                    datos = excluded.datos
+                """,
+                [(cuit, nombre, ahora, datos) for nombre, datos in bloques.items()]
+            )
+            con.execute(
+                """
+                INSERT INTO progreso (cuit, formato, revision, actualizado, payload)
+                VALUES (?, ?, 1, ?, x'')
+                ON CONFLICT (cuit) DO UPDATE SET
+                    formato = excluded.formato,
+                    revision = progreso.revision + 1,
+                    actualizado = excluded.actualizado,
+                    payload = excluded.payload
+                """,
+                (cuit, FORMATO_POR_SECCION, ahora)
+            )
+        return sum(len(datos) for datos in bloques.values())
+
+    def _guardar_version(self, con, cuit):
+        """Copia el borrador vigente a progreso_version y descarta las revisiones de más"""
+        if self.versiones:
+            con.execute(
+                """
+                INSERT OR REPLACE INTO progreso_version (cuit, revision, seccion, actualizado, datos)
+                SELECT s.cuit, p.revision, s.seccion, p.actualizado, s.datos
+                FROM progreso_seccion s JOIN progreso p ON p.cuit = s.cuit
+                WHERE s.cuit = ? AND p.formato = ?
+                """,
+                (cuit, FORMATO_POR_SECCION)
+            )
+        # Las revisiones guardadas no son consecutivas (los parciales no rotan): se cuentan las versiones
+        con.execute(
+            """
+            DELETE FROM progreso_version
+            WHERE cuit = ? AND revision NOT IN (
+                SELECT DISTINCT revision FROM progreso_version WHERE cuit = ? ORDER BY revision DESC LIMIT ?
+            )
+            """,
+            (cuit, cuit, self.versiones)
+        )
+
+    def versiones_guardadas(self, cuit):
+        """[(revision, actualizado)] de las versiones anteriores de ese CUIT, de la más nueva a la más vieja"""
+        return self._conexion().execute(
+            """
+            SELECT revision, max(actualizado) FROM progreso_version
+            WHERE cuit = ? GROUP BY revision ORDER BY revision DESC
+            """,
+            (cuit,)
+        ).fetchall()
+
+    def restaurar(self, cuit, revision):
+        """Vuelve el borrador a una versión anterior, guardándola como una revisión nueva.
+
+        El borrador que se reemplaza queda a su vez entre las versiones.
+        KeyError si esa revisión no está guardada.
+        """
+        bloques = dict(self._conexion().execute(
+            "SELECT seccion, datos FROM progreso_version WHERE cuit = ? AND revision = ?", (cuit, revision)
+        ).fetchall())
+        if not bloques:
+            raise KeyError(f"No hay una versión {revision} del borrador de {cuit}")
+        return self.guardar_codificado(cuit, bloques)
+
+    def _formato(self, cuit):
+        fila = self._conexion().execute(
+            "SELECT formato FROM progreso WHERE cuit = ?", (cuit,)
+        ).fetchone()
+        return fila[0] if fila else None
+
+    @metricas.medir("progreso: cargar")
+    def cargar(self, cuit, secciones=None):
+        fila = self._conexion().execute(
+            "SELECT formato, payload FROM progreso WHERE cuit = ?", (cuit,)
+        ).fetchone()
+        if fila is None:
+            return None
+        formato, payload = fila
+        if formato == FORMATO_POR_SECCION:
+            return self._decodificar(self._leer_secciones(cuit), secciones)
+        if formato == FORMATO_ESQUEMA:
+            return self._migrar(cuit, estado.deserializar(payload), secciones)
+        if formato == FORMATO_PICKLE_ZLIB:
+            raise ValueError("El borrador está en el formato anterior (pickle): "
+                             "hay que migrarlo con 'python progreso.py --migrar'")
+        raise ValueError(f"Formato de progreso desconocido: {formato}")
+
+    def _migrar_filas_pickle(self):
+        """Pasa al formato actual las filas con formato 1; devuelve cuántas"""
+        filas = self._conexion().execute(
+            "SELECT cuit, payload FROM progreso WHERE formato = ?", (FORMATO_PICKLE_ZLIB,)
+        ).fetchall()
+        for cuit, payload in filas:
+            self._migrar(cuit, pickle.loads(zlib.decompress(payload)), None)
+        return len(filas)
+
+    def _leer_secciones(self, cuit):
+        return dict(self._conexion().execute(
+            "SELECT seccion, datos FROM progreso_seccion WHERE cuit = ?", (cuit,)
+        ).fetchall())
+
+    def _existe(self, cuit):
+        fila = self._conexion().execute(
+            "SELECT 1 FROM progreso WHERE cuit = ?", (cuit,)
+        ).fetchone()
+        return fila is not None
+
+    def _borrar(self, cuit):
+        with self._conexion() as con:
+            con.execute("DELETE FROM progreso_version WHERE cuit = ?", (cuit,))
+            con.execute("DELETE FROM progreso_seccion WHERE cuit = ?", (cuit,))
+            return con.execute("DELETE FROM progreso WHERE cuit = ?", (cuit,)).rowcount > 0
+
+    def listar(self):
+        """[(cuit, revision, actualizado, bytes)] del más reciente al más viejo"""
+        return self._conexion().execute(
+            """
+            SELECT p.cuit, p.revision, p.actualizado,
+                   length(p.payload) + coalesce(sum(length(s.datos)), 0)
+            FROM progreso p LEFT JOIN progreso_seccion s ON s.cuit = p.cuit
+            GROUP BY p.cuit
+            ORDER BY p.actualizado DESC
+            """
+        ).fetchall()
+
+    def expirar(self, antiguedad):
+        """Borra los borradores sin cambios hace más de ``antiguedad`` segundos"""
+        limite = time.time() - antiguedad
+        with self._conexion() as con:
+            for tabla in ("progreso_version", "progreso_seccion"):
+                con.execute(
+                    f"DELETE FROM {tabla} WHERE cuit IN (SELECT cuit FROM progreso WHERE actualizado < ?)",
+                    (limite,)
+                )
+            return con.execute("DELETE FROM progreso WHERE actualizado < ?", (limite,)).rowcount
+
+
+# Archivo de un borrador: b"SGRA" | largo del encabezado (4 bytes, big endian) | encabezado JSON | secciones
+# El encabezado es {"revision", "actualizado", "crc", "secciones": [[sección, offset, largo], ...]};
+# crc es el CRC32 de todas las secciones juntas (los archivos anteriores no lo tienen)
+MAGIA_ARCHIVO = b"SGRA"
+
+
+def _empaquetar(bloques, revision, actualizado):
+    secciones = []
+    offset = 0
+    crc = 0
+    for nombre, datos in bloques.items():
+        secciones.append([nombre, offset, len(datos)])
+        offset += len(datos)
+        crc = zlib.crc32(datos, crc)
+    cabecera = json.dumps({"revision": revision, "actualizado": actualizado, "crc": crc,
+                           "secciones": secciones}).encode("utf-8")
+    return b"".join([MAGIA_ARCHIVO, struct.pack(">I", len(cabecera)), cabecera, *bloques.values()])
+
+
+def _leer_encabezado(f):
+    """(encabezado, bytes hasta el fin del encabezado) de un archivo de borrador abierto"""
+    inicio = f.read(8)
+    if len(inicio) < 8 or inicio[:4] != MAGIA_ARCHIVO:
+        raise ValueError("El archivo no es un borrador del formulario")
+    (largo,) = struct.unpack(">I", inicio[4:])
+    return json.loads(f.read(largo)), 8 + largo
+
+
+class AlmacenArchivos(AlmacenBase):
+    """Un archivo por CUIT en ``carpeta``, que pueden compartir varios procesos o máquinas.
+
+    Las escrituras de un mismo CUIT se ordenan con un bloqueo de archivo
+    (bloqueos.py): un guardado parcial lee el borrador, le cambia las
+    secciones y lo escribe sin pisar a otro proceso. El archivo nuevo se escribe
+    aparte, se baja a disco (fsync) y reemplaza al anterior de una vez, así quien
+    lee sin bloqueo ve la versión anterior o la nueva, nunca una a medio
+    escribir, y un corte de luz no deja un borrador vacío.
+
+    El reemplazado pasa a ser ``<cuit>.borrador.1`` (y así hasta ``versiones``).
+    Si el último no se puede leer o no coincide su CRC, cargar() usa la versión
+    anterior más nueva que esté sana.
+    """
+
+    errores = (OSError,)
+
+    def __init__(self, carpeta, versiones=VERSIONES):
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.versiones = versiones
+
+    def _ruta(self, cuit, sufijo=".borrador"):
+        # El CUIT viene de la pantalla de ingreso: que no se pueda salir de la carpeta
+        if not re.fullmatch(r"[\w-]+", cuit):
+            raise ValueError(f"CUIT inválido para nombre de archivo: {cuit!r}")
+        return self.carpeta / f"{cuit}{sufijo}"
+
+    def _version(self, cuit, numero):
+        """Ruta de la versión ``numero`` (0 es la actual)"""
+        return self._ruta(cuit, f".borrador.{numero}" if numero else ".borrador")
+
+    def _leer(self, ruta):
+        """(encabezado, {sección: bytes}) del archivo, o None si no existe.
+
+        ValueError si está truncado o dañado.
+        """
+        try:
+            with open(ruta, "rb") as f:
+                encabezado, _ = _leer_encabezado(f)
+                datos = f.read()
+        except FileNotFoundError:
+            return None
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Encabezado dañado: {e}") from e
+        secciones = encabezado["secciones"]
+        if sum(largo for _, _, largo in secciones) != len(datos):
+            raise ValueError("Archivo truncado")
+        if "crc" in encabezado and zlib.crc32(datos) != encabezado["crc"]:
+            raise ValueError("El CRC no coincide")
+        bloques = {nombre: datos[offset:offset + largo] for nombre, offset, largo in secciones}
+        return encabezado, bloques
+
+    def _leer_ultimo(self, cuit):
+        """Como _leer() con la versión más nueva que esté sana, o None si no hay ninguna"""
+        for numero in range(self.versiones + 1):
+            ruta = self._version(cuit, numero)
+            try:
+                leido = self._leer(ruta)
+            except ValueError as e:
+                log.warning("Borrador dañado %s (%s), se prueba la versión anterior", ruta, e)
+                continue
+            if leido is not None:
+                return leido
+            if numero == 0:
+                return None  # sin borrador actual no se recuperan versiones (se borró a propósito)
+        return None
+
+    def _rotar(self, cuit):
+        """Corre las versiones un lugar; la actual queda también como .borrador.1"""
+        for numero in range(self.versiones - 1, 0, -1):
+            try:
+                os.replace(self._version(cuit, numero), self._version(cuit, numero + 1))
+            except FileNotFoundError:
+                pass
+        actual, primera = self._version(cuit, 0), self._version(cuit, 1)
+        try:
+            # Un segundo nombre para el mismo archivo: la actual no deja de existir en ningún momento
+            os.link(actual, primera)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Volúmenes sin enlaces duros (SMB, algunos FUSE)
+            shutil.copyfile(actual, primera)
+
+    def _sincronizar_carpeta(self):
+        # Que los renombres también sobrevivan a un corte; en Windows no se puede abrir una carpeta
+        if os.name != "posix":
+            return
+        fd = os.open(self.carpeta, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @metricas.medir("progreso: guardar")
+    def guardar_codificado(self, cuit, bloques, completo=True):
+        """Como guardar(), con las secciones ya codificadas: {sección: bytes}"""
+        ruta = self._ruta(cuit)
+        with bloqueos.bloqueo(self._ruta(cuit, ".lock")):
+            anterior = self._leer_ultimo(cuit)
+            revision = 1
+            if anterior is not None:
+                revision = anterior[0]["revision"] + 1
+                if not completo:
+                    bloques = {**anterior[1], **bloques}
+            contenido = _empaquetar(bloques, revision, time.time())
+            fd, tmp = tempfile.mkstemp(dir=self.carpeta, prefix=ruta.name, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(contenido)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self.versiones:
+                    self._rotar(cuit)
+                os.replace(tmp, ruta)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            self._sincronizar_carpeta()
+        return sum(len(datos) for datos in bloques.values())
+
+    def _leer_secciones(self, cuit):
+        leido = self._leer_ultimo(cuit)
+        return None if leido is None else leido[1]
+
+    def _existe(self, cuit):
+        return self._ruta(cuit).exists()
+
+    def _borrar(self, cuit):
+        with bloqueos.bloqueo(self._ruta(cuit, ".lock")):
+            borrado = False
+            # La actual primero: sin ella _leer_ultimo ya no recupera las versiones
+            for numero in range(self.versiones + 1):
+                try:
+                    self._version(cuit, numero).unlink()
+                    borrado = borrado or numero == 0
+                except FileNotFoundError:
+                    pass
+            return borrado
+
+    def listar(self):
+        """[(cuit, revision, actualizado, bytes)] del más reciente al más viejo"""
+        borradores = []
+        for ruta in self.carpeta.glob("*.borrador"):
+            try:
+                with open(ruta, "rb") as f:
+                    encabezado, _ = _leer_encabezado(f)
+                tamanio = ruta.stat().st_size
+            except (FileNotFoundError, ValueError):
+                continue  # se borró mientras tanto, o no es un borrador
+            borradores.append((ruta.stem, encabezado["revision"], encabezado["actualizado"], tamanio))
+        return sorted(borradores, key=lambda borrador: borrador[2], reverse=True)
+
+    def expirar(self, antiguedad):
+        """Borra los borradores sin cambios hace más de ``antiguedad`` segundos"""
+        limite = time.time() - antiguedad
+        # Temporales de guardados que no terminaron (el proceso murió antes del reemplazo)
+        for ruta in self.carpeta.glob("*.tmp"):
+            try:
+                if ruta.stat().st_mtime < limite:
+                    ruta.unlink()
+            except FileNotFoundError:
+                pass
+        return sum(self._borrar(cuit) for cuit, _, actualizado, _ in self.listar() if actualizado < limite)
+
+
+class AlmacenRedis(AlmacenBase):
+    """Un hash por CUIT en Redis (o Valkey, KeyDB...) con las secciones y la revisión.
+
+    Cada guardado es una transacción MULTI/EXEC, así no hace falta bloqueo:
+    varias réplicas pueden guardar y cargar el mismo CUIT a la vez.
+    """
+
+    PREFIJO = "formulario:progreso:"
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("El almacén redis:// necesita el paquete redis (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+        self.errores = (redis.RedisError,)
+
+    def _clave(self, cuit):
+        return self.PREFIJO + cuit
+
+    @metricas.medir("progreso: guardar")
+    def guardar_codificado(self, cuit, bloques, completo=True):
+        """Como guardar(), con las secciones ya codificadas: {sección: bytes}"""
+        clave = self._clave(cuit)
+        with self._redis.pipeline(transaction=True) as pipe:
+            if completo:
+                # Se quitan las secciones del esquema que no vienen, sin borrar la clave: la revisión sigue contando
+                sobrantes = [f"s:{nombre}" for nombre in (*estado.SECCIONES, estado.SECCION_WIDGETS)
+                             if nombre not in bloques]
+                if sobrantes:
+                    pipe.hdel(clave, *sobrantes)
+            pipe.hset(clave, mapping={"_actualizado": time.time(),
+                                      **{f"s:{nombre}": datos for nombre, datos in bloques.items()}})
+            pipe.hincrby(clave, "_revision", 1)
+            pipe.execute()
+        return sum(len(datos) for datos in bloques.values())
+
+    def _leer_secciones(self, cuit):
+        campos = self._redis.hgetall(self._clave(cuit))
+        if not campos:
+            return None
+        return {campo[2:].decode("utf-8"): datos for campo, datos in campos.items() if campo.startswith(b"s:")}
+
+    def _existe(self, cuit):
+        return self._redis.exists(self._clave(cuit)) > 0
+
+    def _borrar(self, cuit):
+        return self._redis.delete(self._clave(cuit)) > 0
+
+    def listar(self):
+        """[(cuit, revision, actualizado, bytes)] del más reciente al más viejo"""
+        borradores = []
+        for clave in self._redis.scan_iter(match=self.PREFIJO + "*"):
+            campos = self._redis.hgetall(clave)
+            if not campos:
+                continue
+            tamanio = sum(len(datos) for campo, datos in campos.items() if campo.startswith(b"s:"))
+            borradores.append((clave.decode("utf-8").removeprefix(self.PREFIJO), int(campos[b"_revision"]),
+                               float(campos[b"_actualizado"]), tamanio))
+        return sorted(borradores, key=lambda borrador: borrador[2], reverse=True)
+
+    def expirar(self, antiguedad):
+        """Borra los borradores sin cambios hace más de ``antiguedad`` segundos"""
+        limite = time.time() - antiguedad
+        return sum(self._borrar(cuit) for cuit, _, actualizado, _ in self.listar() if actualizado < limite)
+
+
+def migrar_legado(almacen, carpeta="."):
+    """Pasa al formato actual los borradores en pickle; devuelve cuántos migró.
+
+    Es el único lugar que lee pickle. En el SQLite migra las filas con formato
+    1; de ``carpeta`` importa cada ``progreso_{cuit}.pkl`` cuyo CUIT todavía no
+    tenga borrador y lo renombra a ``.pkl.migrado``. Los de un CUIT que ya tiene
+    borrador (más nuevo) se dejan como están.
+    """
+    migrados = 0
+    if isinstance(almacen, AlmacenProgreso):
+        migrados += almacen._migrar_filas_pickle()
+    for ruta in sorted(Path(carpeta).glob("progreso_*.pkl")):
+        cuit = ruta.stem.removeprefix("progreso_")
+        try:
+            if almacen.existe(cuit):
+                log.info("%s: %s ya tiene un borrador más nuevo, se deja sin migrar", ruta, cuit)
+                continue
+            with open(ruta, "rb") as f:
+                almacen.guardar(cuit, estado.extraer(pickle.load(f)))
+        except Exception as e:
+            log.warning("No se pudo migrar %s: %s", ruta, e)
+            continue
+        ruta.rename(ruta.with_suffix(".pkl.migrado"))
+        migrados += 1
+    return migrados
+
+
+class Autoguardado:
+    """Escrituras diferidas por CUIT: una ráfaga de cambios se guarda una sola vez.
+
+    ``_lock`` sólo protege los pendientes y los timers, nunca se tiene durante
+    una escritura: una escritura lenta no frena a las demás sesiones. Las
+    escrituras de un mismo CUIT se ordenan con un lock propio de ese CUIT.
+    """
+
+    def __init__(self, almacen, espera=AUTOGUARDADO_ESPERA):
+        self._almacen = almacen
+        self._espera = espera
+        self._lock = threading.Lock()
+        self._pendientes = {}  # cuit -> {sección: bytes}
+        self._timers = {}  # cuit -> threading.Timer
+        self._ultimos = {}  # cuit -> (bytes, segundos) de la última escritura
+        self._escrituras = {}  # cuit -> threading.Lock de sus escrituras
+        self._escribiendo = set()  # cuits con una escritura en curso
+
+    def _lock_escritura(self, cuit):
+        with self._lock:
+            return self._escrituras.setdefault(cuit, threading.Lock())
+
+    def programar(self, cuit, secciones):
+        """Encola las secciones que cambiaron y reinicia la espera de ese CUIT.
+
+        Se codifican en el momento: la sesión puede seguir modificando esos
+        mismos objetos antes de que se escriban.
+        """
+        bloques = {nombre: estado.serializar_seccion(valores) for nombre, valores in secciones.items()}
+        with self._lock:
+            self._pendientes.setdefault(cuit, {}).update(bloques)
+            timer = self._timers.pop(cuit, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self._espera, self.escribir, args=(cuit,))
+            timer.daemon = True
+            self._timers[cuit] = timer
+            timer.start()
+
+    def escribir(self, cuit):
+        """Escribe ya lo pendiente de ese CUIT (lo llama el timer al vencer la espera)"""
+        # Lo que se encole mientras tanto lo escribe la próxima llamada, después de esta
+        with self._lock_escritura(cuit):
+            with self._lock:
+                timer = self._timers.pop(cuit, None)
+                if timer is not None:
+                    timer.cancel()
+                bloques = self._pendientes.pop(cuit, None)
+                if not bloques:
+                    return
+                self._escribiendo.add(cuit)
+            inicio = time.perf_counter()
+            try:
+                tamanio = self._almacen.guardar_codificado(cuit, bloques, completo=False)
+                self._ultimos[cuit] = (tamanio, time.perf_counter() - inicio)
+            except Exception as e:
+                # En el hilo del timer nadie más ve el error: se registra y los cambios
+                # quedan pendientes hasta el próximo cambio o guardado
+                if isinstance(e, self._almacen.errores):
+                    log.warning("No se pudo autoguardar el progreso de %s: %s", cuit, e)
+                else:
+                    log.exception("Error inesperado al autoguardar el progreso de %s", cuit)
+                with self._lock:
+                    # Lo encolado durante la escritura es más nuevo y gana
+                    self._pendientes[cuit] = {**bloques, **self._pendientes.get(cuit, {})}
+            finally:
+                with self._lock:
+                    self._escribiendo.discard(cuit)
+
+    def cancelar(self, cuit):
+        """Descarta lo pendiente de ese CUIT (tras un guardado completo o al borrar)"""
+        # Si hay una escritura de ese CUIT en curso se la espera: no tiene que terminar después
+        # del guardado completo que sigue a esta llamada
+        with self._lock_escritura(cuit):
+            with self._lock:
+                timer = self._timers.pop(cuit, None)
+                if timer is not None:
+                    timer.cancel()
+                self._pendientes.pop(cuit, None)
+
+    def pendiente(self, cuit):
+        return cuit in self._pendientes or cuit in self._escribiendo
+
+    def ultimo(self, cuit):
+        """(bytes, segundos) de la última escritura de ese CUIT, o None si todavía no hubo"""
+        return self._ultimos.get(cuit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DESTINO,
+                        help=f"almacén: ruta del SQLite o URL archivos:// o redis:// (por defecto {DESTINO})")
+    parser.add_argument("--migrar", action="store_true",
+                        help="pasa al formato actual los borradores en pickle de versiones anteriores")
+    parser.add_argument("--carpeta", default=".", help="dónde buscar los progreso_*.pkl (por defecto la actual)")
+    parser.add_argument("--versiones", metavar="CUIT", help="lista las versiones anteriores del borrador de un CUIT (SQLite)")
+    parser.add_argument("--restaurar", nargs=2, metavar=("CUIT", "REVISION"),
+                        help="vuelve el borrador de un CUIT a una versión anterior (SQLite)")
+    args = parser.parse_args()
+    if not (args.migrar or args.versiones or args.restaurar):
+        parser.error("falta indicar una tarea (--migrar, --versiones o --restaurar)")
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    almacen = crear_almacen(args.db)
+    if (args.versiones or args.restaurar) and not isinstance(almacen, AlmacenProgreso):
+        parser.error("--versiones y --restaurar son para el almacén SQLite; "
+                     "en archivos:// las versiones son los <cuit>.borrador.N de la carpeta")
+    if args.migrar:
+        migrados = migrar_legado(almacen, args.carpeta)
+        print(f"{migrados} borradores migrados")
+    if args.versiones:
+        for revision, actualizado in almacen.versiones_guardadas(args.versiones):
+            print(f"{revision}\t{datetime.datetime.fromtimestamp(actualizado):%Y-%m-%d %H:%M:%S}")
+    if args.restaurar:
+        cuit, revision = args.restaurar
+        try:
+            almacen.restaurar(cuit, int(revision))
+        except (KeyError, ValueError) as e:
+            parser.error(e.args[0])
+        print(f"Borrador de {cuit} restaurado a la versión {revision}")
+
+
+if __name__ == "__main__":
+    main()
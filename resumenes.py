@@ -0,0 +1,151 @@
+"""Resúmenes que el formulario calcula a partir de las tablas cargadas.
+
+Funciones puras sobre DataFrames (sin Streamlit), para poder medirlas y
+compararlas por separado; ver benchmarks/bench_resumenes.py. Los de ventas y
+compras leen la tabla larga de ventas.py.
+"""
+import numpy as np
+import pandas as pd
+
+from ventas import COLUMNAS_ANIO
+
+SUBTIPO_SIN_COMPLETAR = "COMPLETAR"
+
+
+def _posiciones(serie, valores, categorias=None):
+    """Posición de cada valor de una columna categórica en ``valores`` (-1 si no está).
+
+    Se busca cada categoría una sola vez; ``categorias`` permite pasarlas ya normalizadas.
+    """
+    categorias = serie.cat.categories if categorias is None else categorias
+    # El -1 agregado al final es el que toman los códigos -1 (valores faltantes)
+    return np.append(pd.Index(valores).get_indexer(categorias), -1)[serie.cat.codes.to_numpy()]
+
+
+def _movimientos(largo, flujos, meses):
+    # Filas de los flujos pedidos con mes válido: (mes 0-11, años hacia atrás, monto sin NaN, filas)
+    datos = largo[largo["Flujo"].isin(flujos)]
+    mes = _posiciones(datos["Mes"], meses)
+    validas = mes >= 0
+    datos = datos[validas]
+    anio = _posiciones(datos["Año"], COLUMNAS_ANIO)
+    return mes[validas], anio, np.nan_to_num(datos["Monto"].to_numpy(), nan=0.0), datos
+
+
+def resumen_12_meses(largo, flujos, meses, subtipos, hoy=None):
+    """Montos de los últimos 12 meses por subtipo, del mes actual hacia atrás.
+
+    Suma los ``flujos`` de la tabla larga; "Año en curso" es el año actual,
+    "Año 1" el anterior, etc. Devuelve None si no hay ningún monto en el período.
+    """
+    hoy = pd.Timestamp.today() if hoy is None else pd.Timestamp(hoy)
+    # Los meses se cuentan como enteros (año * 12 + mes - 1) en vez de armar fechas
+    mes_actual = hoy.year * 12 + hoy.month - 1
+    mes, anio, monto, datos = _movimientos(largo, flujos, meses)
+    atras = mes_actual - ((hoy.year - anio) * 12 + mes)
+
+    # Meses futuros del año en curso cuentan como "hay datos", pero no entran en el resumen
+    if not (atras <= 11).any():
+        return None
+
+    columnas = sorted(s.upper() for s in subtipos if s != SUBTIPO_SIN_COMPLETAR)
+    # El subtipo se normaliza sobre las categorías, no fila por fila
+    categorias = datos["Subtipo"].cat.categories.astype(str).str.upper().str.strip()
+    columna = _posiciones(datos["Subtipo"], columnas, categorias)
+
+    dentro = (atras >= 0) & (atras <= 11) & (columna >= 0)
+    tabla = (
+        pd.Series(monto[dentro]).groupby([atras[dentro], columna[dentro]]).sum()
+        .unstack(fill_value=0)
+        .reindex(index=range(12), columns=range(len(columnas)), fill_value=0)
+    )
+
+    etiquetas = [f"{(mes_actual - a) % 12 + 1:02d}-{(mes_actual - a) // 12}" for a in range(12)]
+    resumen = pd.DataFrame({"Mes-Año": etiquetas})
+    for i, nombre in enumerate(columnas):
+        resumen[nombre] = tabla[i].to_numpy(dtype="float64")
+    resumen.columns.name = "Subtipo"
+    # Mismo índice que dejaba la versión anterior (posición de cada "mm-aaaa" ordenado como texto)
+    resumen.index = np.argsort(np.argsort(etiquetas, kind="stable"), kind="stable")
+    return resumen
+
+
+def resumen_mensual(largo, flujos, meses):
+    """Total por mes (filas) y columna de año de los ``flujos``; ceros si no hay datos"""
+    mes, anio, monto, _ = _movimientos(largo, flujos, meses)
+    if len(mes) == 0:
+        return pd.DataFrame(0, index=pd.Index(meses, name="Mes"),
+                            columns=pd.Index(COLUMNAS_ANIO, name="Columna_año")).reset_index()
+
+    tabla = (
+        pd.Series(monto).groupby([mes, anio]).sum()
+        .unstack(fill_value=0.0)
+        .reindex(index=range(len(meses)), columns=range(len(COLUMNAS_ANIO)), fill_value=0.0)
+    )
+    tabla.index = pd.Index(meses, name="Mes")
+    tabla.columns = pd.Index(COLUMNAS_ANIO, name="Columna_año")
+    # La versión anterior ordenaba las columnas de año como texto ("Año 1" ... "Año en curso")
+    return tabla[sorted(COLUMNAS_ANIO)].reset_index()
+
+
+# --- Deuda bancaria ---
+
+COLUMNAS_MONTOS_BANCOS = [
+    "Sola Firma Utilizado",
+    "Saldo Préstamos Amortizables Utilizado",
+    "Descuento de Cheques Utilizado",
+    "Adelanto en Cta Cte Utilizado",
+    "Otros",
+    "Avales SGR",
+    "Tarjeta de Crédito Utilizado",
+    "Leasing Utilizado",
+    "Impo/Expo Utilizado",
+]
+CLAVES_DEUDA_BANCARIA = ["Entidad", "Tipo de Moneda", "Garantía (*)",
+                         "Fecha desembolso (dd/mm/yyyy)", "Fecha último vencimiento (dd/mm/yyyy)"]
+
+
+def _texto_clave(serie):
+    """Texto sin espacios a los costados, con "" para los vacíos ("nan" incluido).
+
+    Se normaliza cada valor distinto una sola vez (las categorías, si es
+    categórica) y se expande por código.
+    """
+    codigos, valores = pd.factorize(serie)
+    textos = pd.Index(valores).astype(str).str.strip()
+    # El "" agregado al final es el que toman los códigos -1 (vacíos)
+    return np.append(np.where(textos == "nan", "", textos).astype(object), "")[codigos]
+
+
+def resumen_deuda_bancaria(bancos, acuerdo_descubierto, cpd_descontados, tasa_ponderada=False):
+    """Monto total y tasa por entidad, moneda, garantía y fechas, con la fila de totales.
+
+    La tasa de cada fila es la en pesos o la en dólares según la moneda. Por
+    defecto se promedia por grupo; con ``tasa_ponderada`` se pondera por monto
+    (si el grupo suma 0 queda el promedio simple).
+    """
+    ars = (bancos["Tipo de Moneda"] == "ARS").to_numpy()
+    datos = pd.DataFrame({clave: _texto_clave(bancos[clave]) for clave in CLAVES_DEUDA_BANCARIA})
+    datos["Monto"] = bancos[COLUMNAS_MONTOS_BANCOS].to_numpy().sum(axis=1)
+    datos["Tasa"] = np.where(ars, bancos["Tasa Promedio $"], bancos["Tasa Promedio USD"])
+
+    grupos = datos.groupby(CLAVES_DEUDA_BANCARIA)
+    monto = grupos["Monto"].sum()
+    tasa = grupos["Tasa"].mean()
+    if tasa_ponderada:
+        datos["Tasa"] = datos["Tasa"] * datos["Monto"]
+        ponderada = datos.groupby(CLAVES_DEUDA_BANCARIA)["Tasa"].sum()
+        con_monto = monto != 0
+        tasa[con_monto] = ponderada[con_monto] / monto[con_monto]
+    resumen = monto.index.to_frame(index=False)
+    resumen["Monto"] = monto.to_numpy()
+    resumen["Tasa"] = tasa.to_numpy()
+    resumen = resumen.sort_values(by="Entidad")
+
+    # Fila de totales vacía, y el acuerdo en descubierto y los CPD en la segunda fila
+    columnas = {columna: np.append(resumen[columna].to_numpy(dtype=object), "") for columna in resumen.columns}
+    for columna, valor in (("Acuerdo Descubierto", acuerdo_descubierto), ("CPD Descontados", cpd_descontados)):
+        columnas[columna] = np.full(len(resumen) + 1, "", dtype=object)
+        if len(resumen):
+            columnas[columna][1] = valor
+    return pd.DataFrame(columnas)
@@ -0,0 +1,162 @@
+"""AlmacenRedis contra un cliente falso en memoria (el paquete redis no hace falta)."""
+import fnmatch
+import threading
+
+import pytest
+
+import progreso
+
+CUIT = "20111111111"
+
+
+class ErrorRedisFalso(Exception):
+    pass
+
+
+def _bytes(valor):
+    return valor if isinstance(valor, bytes) else str(valor).encode("utf-8")
+
+
+class RedisFalso:
+    """Lo que usa AlmacenRedis de redis.Redis: hashes, transacciones y scan_iter"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.lock = threading.Lock()
+        self.caido = False
+
+    def _revisar(self):
+        if self.caido:
+            raise ErrorRedisFalso("Connection refused")
+
+    def pipeline(self, transaction=True):
+        return PipelineFalso(self)
+
+    def hgetall(self, clave):
+        self._revisar()
+        with self.lock:
+            return dict(self.hashes.get(_bytes(clave), {}))
+
+    def exists(self, clave):
+        self._revisar()
+        return int(_bytes(clave) in self.hashes)
+
+    def delete(self, clave):
+        self._revisar()
+        with self.lock:
+            return int(self.hashes.pop(_bytes(clave), None) is not None)
+
+    def hset(self, clave, mapping):
+        campos = self.hashes.setdefault(_bytes(clave), {})
+        campos.update({_bytes(campo): _bytes(valor) for campo, valor in mapping.items()})
+        return len(mapping)
+
+    def hdel(self, clave, *campos):
+        actuales = self.hashes.get(_bytes(clave), {})
+        borrados = sum(actuales.pop(_bytes(campo), None) is not None for campo in campos)
+        if not actuales:
+            self.hashes.pop(_bytes(clave), None)
+        return borrados
+
+    def hincrby(self, clave, campo, cantidad):
+        campos = self.hashes.setdefault(_bytes(clave), {})
+        valor = int(campos.get(_bytes(campo), b"0")) + cantidad
+        campos[_bytes(campo)] = _bytes(valor)
+        return valor
+
+    def scan_iter(self, match):
+        return [clave for clave in list(self.hashes) if fnmatch.fnmatchcase(clave.decode("utf-8"), match)]
+
+
+class PipelineFalso:
+    """MULTI/EXEC: junta los comandos y los aplica todos juntos en execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.comandos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.comandos = []
+
+    def __getattr__(self, nombre):
+        return lambda *args, **kwargs: self.comandos.append((nombre, args, kwargs))
+
+    def execute(self):
+        self.redis._revisar()
+        with self.redis.lock:
+            metodos = {"hdel": self.redis.hdel, "hset": self.redis.hset, "hincrby": self.redis.hincrby}
+            return [metodos[nombre](*args, **kwargs) for nombre, args, kwargs in self.comandos]
+
+
+@pytest.fixture
+def almacen():
+    # Sin __init__, que importaría el paquete redis y se conectaría
+    almacen = progreso.AlmacenRedis.__new__(progreso.AlmacenRedis)
+    almacen._redis = RedisFalso()
+    almacen.errores = (ErrorRedisFalso,)
+    return almacen
+
+
+def test_guardar_y_cargar(almacen):
+    assert almacen.cargar(CUIT) is None
+    assert not almacen.existe(CUIT)
+    almacen.guardar(CUIT, {"respuestas": {"Razón social": "Agro SA"}, "avales": {"avales": [1]}})
+
+    assert almacen.existe(CUIT)
+    assert almacen.cargar(CUIT) == {"Razón social": "Agro SA", "avales": [1]}
+    assert almacen.cargar(CUIT, secciones=["avales"]) == {"avales": [1]}
+
+
+def test_guardado_parcial_y_completo(almacen):
+    almacen.guardar(CUIT, {"respuestas": {"Razón social": "Agro SA"}, "avales": {"avales": [1]}})
+    almacen.guardar(CUIT, {"avales": {"avales": [2]}}, completo=False)
+    assert almacen.cargar(CUIT) == {"Razón social": "Agro SA", "avales": [2]}
+
+    # Uno completo descarta las secciones que no trae
+    almacen.guardar(CUIT, {"avales": {"avales": [3]}})
+    assert almacen.cargar(CUIT) == {"avales": [3]}
+    [(cuit, revision, _, _)] = almacen.listar()
+    assert (cuit, revision) == (CUIT, 3)
+
+
+def test_guardados_parciales_concurrentes_no_se_pisan(almacen):
+    def guardar(seccion):
+        for ronda in range(50):
+            almacen.guardar(CUIT, {seccion: {f"marca_{seccion}": ronda}}, completo=False)
+
+    hilos = [threading.Thread(target=guardar, args=(seccion,)) for seccion in ("respuestas", "avales")]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert almacen.cargar(CUIT) == {"marca_respuestas": 49, "marca_avales": 49}
+    assert almacen.listar()[0][1] == 100
+
+
+def test_listar_borrar_y_expirar(almacen):
+    almacen.guardar(CUIT, {"respuestas": {"v": 1}})
+    almacen.guardar("20222222222", {"respuestas": {"v": 2}})
+    almacen._redis.hashes[b"otra:clave"] = {b"x": b"1"}
+
+    assert [cuit for cuit, *_ in almacen.listar()] == ["20222222222", CUIT]
+    assert almacen.borrar(CUIT)
+    assert not almacen.borrar(CUIT)
+    assert almacen.expirar(-1) == 1
+    assert almacen.listar() == []
+    assert b"otra:clave" in almacen._redis.hashes
+
+
+def test_autoguardado_reintenta_si_redis_no_responde(almacen):
+    autoguardado = progreso.Autoguardado(almacen, espera=60)
+    autoguardado.programar(CUIT, {"respuestas": {"respuestas": {"v": 1}}})
+    almacen._redis.caido = True
+    autoguardado.escribir(CUIT)
+    assert autoguardado.pendiente(CUIT)
+
+    almacen._redis.caido = False
+    autoguardado.escribir(CUIT)
+    assert not autoguardado.pendiente(CUIT)
+    assert almacen.cargar(CUIT) == {"respuestas": {"v": 1}}
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import progreso
+
+SECCION = {"respuestas": {"respuestas": {"Razón social": "Agro SA"}}}
+
+
+class AlmacenLento(progreso.AlmacenProgreso):
+    """SQLite cuyas escrituras esperan a que la prueba las suelte"""
+
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        self.empezo = threading.Event()
+        self.seguir = threading.Event()
+
+    def guardar_codificado(self, cuit, bloques, completo=True):
+        self.empezo.set()
+        self.seguir.wait(5)
+        return super().guardar_codificado(cuit, bloques, completo)
+
+
+def test_una_escritura_lenta_no_frena_a_otras_sesiones(tmp_path):
+    almacen = AlmacenLento(tmp_path / "progreso.sqlite3")
+    autoguardado = progreso.Autoguardado(almacen, espera=60)
+    autoguardado.programar("20111111111", SECCION)
+    hilo = threading.Thread(target=autoguardado.escribir, args=("20111111111",))
+    hilo.start()
+    assert almacen.empezo.wait(5)
+
+    # Con la escritura de otro CUIT a medias, programar y cancelar vuelven enseguida
+    inicio = time.perf_counter()
+    autoguardado.programar("20222222222", SECCION)
+    autoguardado.cancelar("20222222222")
+    assert time.perf_counter() - inicio < 0.5
+    assert autoguardado.pendiente("20111111111")
+
+    almacen.seguir.set()
+    hilo.join(5)
+    assert not autoguardado.pendiente("20111111111")
+    assert almacen.cargar("20111111111")["respuestas"] == {"Razón social": "Agro SA"}
+
+
+def test_cancelar_espera_la_escritura_en_curso_de_ese_cuit(tmp_path):
+    almacen = AlmacenLento(tmp_path / "progreso.sqlite3")
+    autoguardado = progreso.Autoguardado(almacen, espera=60)
+    autoguardado.programar("20111111111", SECCION)
+    hilo = threading.Thread(target=autoguardado.escribir, args=("20111111111",))
+    hilo.start()
+    assert almacen.empezo.wait(5)
+
+    cancelado = threading.Event()
+    threading.Thread(target=lambda: (autoguardado.cancelar("20111111111"), cancelado.set())).start()
+    assert not cancelado.wait(0.2)
+    almacen.seguir.set()
+    assert cancelado.wait(5)
+    hilo.join(5)
+
+
+def test_un_error_inesperado_deja_los_cambios_pendientes(tmp_path, caplog):
+    # AlmacenArchivos rechaza con ValueError un CUIT que no sirve de nombre de archivo
+    autoguardado = progreso.Autoguardado(progreso.AlmacenArchivos(tmp_path), espera=60)
+    autoguardado.programar("20/../x", SECCION)
+    autoguardado.escribir("20/../x")
+
+    assert autoguardado.pendiente("20/../x")
+    assert "Error inesperado al autoguardar" in caplog.text
+    autoguardado.cancelar("20/../x")
+
+
+def test_lo_encolado_durante_una_escritura_fallida_gana(tmp_path):
+    class AlmacenQueFalla(AlmacenLento):
+        def guardar_codificado(self, cuit, bloques, completo=True):
+            self.empezo.set()
+            self.seguir.wait(5)
+            raise progreso.sqlite3.OperationalError("database is locked")
+
+    almacen = AlmacenQueFalla(tmp_path / "progreso.sqlite3")
+    autoguardado = progreso.Autoguardado(almacen, espera=60)
+    autoguardado.programar("20111111111", {"respuestas": {"respuestas": {"v": 1}}, "avales": {"avales": []}})
+    hilo = threading.Thread(target=autoguardado.escribir, args=("20111111111",))
+    hilo.start()
+    assert almacen.empezo.wait(5)
+    autoguardado.programar("20111111111", {"respuestas": {"respuestas": {"v": 2}}})
+    almacen.seguir.set()
+    hilo.join(5)
+
+    pendientes = autoguardado._pendientes["20111111111"]
+    assert set(pendientes) == {"respuestas", "avales"}
+    assert progreso.estado.deserializar_seccion(pendientes["respuestas"]) == {"respuestas": {"v": 2}}
+    autoguardado.cancelar("20111111111")
@@ -0,0 +1,67 @@
+import importlib
+import logging
+import zlib
+
+import pytest
+
+import compresion
+
+
+@pytest.fixture
+def recargar(monkeypatch):
+    """Vuelve a importar compresion con FORMULARIO_COMPRESION (y el nivel) dados"""
+    def recargar(nombre, nivel=None):
+        monkeypatch.setenv("FORMULARIO_COMPRESION", nombre)
+        if nivel is None:
+            monkeypatch.delenv("FORMULARIO_COMPRESION_NIVEL", raising=False)
+        else:
+            monkeypatch.setenv("FORMULARIO_COMPRESION_NIVEL", str(nivel))
+        return importlib.reload(compresion)
+
+    yield recargar
+    monkeypatch.delenv("FORMULARIO_COMPRESION", raising=False)
+    monkeypatch.delenv("FORMULARIO_COMPRESION_NIVEL", raising=False)
+    importlib.reload(compresion)
+
+
+@pytest.mark.parametrize("nombre", ["ZSTD", " Lz4 ", "zlib"])
+def test_nombre_sin_importar_mayusculas(recargar, nombre):
+    modulo = recargar(nombre, nivel=3)
+    esperado = nombre.strip().lower()
+    if not modulo.DISPONIBLES[esperado]:
+        pytest.skip(f"{esperado} no está instalado")
+    assert (modulo.CODEC, modulo.NIVEL) == (esperado, 3)
+
+
+def test_nombre_desconocido_vuelve_a_zlib(recargar, caplog):
+    with caplog.at_level(logging.WARNING, logger="compresion"):
+        modulo = recargar("brotli", nivel=19)
+    assert (modulo.CODEC, modulo.NIVEL) == ("zlib", None)
+    assert "brotli" in caplog.text
+
+
+@pytest.mark.parametrize("nombre, nivel", [("zlib", "alto"), ("zlib", 15), ("zstd", 30), ("lz4", -3)])
+def test_nivel_invalido_usa_el_por_defecto(recargar, caplog, nombre, nivel):
+    with caplog.at_level(logging.WARNING, logger="compresion"):
+        modulo = recargar(nombre, nivel=nivel)
+    if modulo.CODEC != nombre:
+        pytest.skip(f"{nombre} no está instalado")
+    assert modulo.NIVEL is None
+    assert "FORMULARIO_COMPRESION_NIVEL" in caplog.text or "fuera de rango" in caplog.text
+    # Los guardados siguen funcionando
+    assert modulo.descomprimir(modulo.comprimir(b"Rosario" * 50)) == b"Rosario" * 50
+
+
+@pytest.mark.parametrize("codec", ["zstd", "lz4", "zlib"])
+def test_descomprime_sin_saber_el_codec(codec):
+    if not compresion.DISPONIBLES[codec]:
+        pytest.skip(f"{codec} no está instalado")
+    datos = "Córdoba, Santa Fe, Rosario ".encode("utf-8") * 200
+    comprimido = compresion.comprimir(datos, codec)
+    assert compresion.codec_de(comprimido) == codec
+    assert compresion.descomprimir(comprimido) == datos
+
+
+def test_lee_los_borradores_anteriores_en_zlib():
+    datos = b'{"respuestas": {}}'
+    assert compresion.descomprimir(zlib.compress(datos)) == datos
@@ -0,0 +1,124 @@
+"""El formulario entero con streamlit.testing (AppTest), sin navegador."""
+import functools
+import pickle
+import time
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+import estado
+import georef
+import metricas
+import progreso
+
+SCRIPT = str(Path(__file__).resolve().parent.parent / "formulario_streamlit_final.py")
+CUIT = "20123456789"
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """Almacén temporal para el formulario y un índice georef sin localidades, como el snapshot semilla"""
+    monkeypatch.setattr(progreso, "DESTINO", str(tmp_path / "progreso.sqlite3"))
+    semilla = tmp_path / "semilla.json.gz"
+    georef.guardar_snapshot(georef.IndiceGeografico(["Córdoba", "Santa Fe"], {}, {}), semilla)
+    monkeypatch.setattr(georef, "SNAPSHOT_PATH", semilla)
+    monkeypatch.setattr(georef, "SNAPSHOT_CACHE", tmp_path / "cache" / "georef.json.gz")
+    monkeypatch.setattr(georef, "SNAPSHOT_COMPARTIDO", None)
+    monkeypatch.setattr(georef, "GEOREF_URL", "http://127.0.0.1:9")  # la API no responde
+    monkeypatch.setattr(georef, "GEOREF_BACKOFF", 0)
+    # Almacén, autoguardado e índice son cache_resource: que no queden de otra prueba
+    st.cache_resource.clear()
+    yield progreso.crear_almacen()
+    st.cache_resource.clear()
+
+
+def ingresar(cuit):
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    at.run()
+    at.text_input[0].set_value("QTM")
+    at.text_input[1].set_value("capital")
+    at.button[0].click().run()
+    at.text_input[0].set_value(cuit).run()
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_localidad_guardada_que_el_indice_no_tiene(almacen):
+    almacen.guardar(CUIT, estado.extraer({"prov_real": "Santa Fe", "loc_real": "Rosario"}))
+
+    at = ingresar(CUIT)
+    assert at.selectbox(key="loc_real").value == "Rosario"
+
+    # Otra pasada y el autoguardado no tienen que pisar lo guardado con None
+    at.run()
+    time.sleep(progreso.AUTOGUARDADO_ESPERA + 0.5)
+    at.run()
+    assert at.selectbox(key="loc_real").value == "Rosario"
+    assert almacen.cargar(CUIT)["loc_real"] == "Rosario"
+
+
+def test_sin_localidades_en_el_indice_se_acepta_lo_escrito(almacen):
+    at = ingresar(CUIT)
+    at.selectbox(key="prov_real").set_value("Santa Fe").run()
+    at.text_input(key="_buscar_loc_real").set_value("Funes").run()
+
+    assert at.selectbox(key="loc_real").options == ["Funes"]
+    at.selectbox(key="loc_real").set_value("Funes").run()
+    at.text_input(key="_buscar_loc_real").set_value("").run()
+    assert at.selectbox(key="loc_real").value == "Funes"
+
+
+
+def correr_fragmento(at, monkeypatch):
+    """Corre sólo el primer fragmento de sección, como cuando se toca uno de sus widgets"""
+    fragmento = next(iter(at._fragment_storage._fragments))
+    with monkeypatch.context() as m:
+        m.setattr(local_script_runner, "RerunData", functools.partial(RerunData, fragment_id_queue=[fragmento]))
+        at.run()
+    assert not at.exception
+
+
+def test_un_libro_viejo_redibuja_la_app_una_sola_vez(almacen, monkeypatch):
+    corridas = []
+    registrar = metricas.registrar
+
+    def contar(seccion, *args, **kwargs):
+        corridas.append(seccion)
+        return registrar(seccion, *args, **kwargs)
+
+    monkeypatch.setattr(metricas, "registrar", contar)
+    at = ingresar(CUIT)
+    next(boton for boton in at.sidebar.button if boton.label.startswith("📄")).click().run()
+    assert "_excel_cache" in at.session_state
+
+    # Como si una edición hubiera cambiado los datos del libro: se descarta y la app se redibuja una vez
+    at.session_state["_excel_cache"] = ("huella de otros datos", at.session_state["_excel_cache"][1])
+    corridas.clear()
+    correr_fragmento(at, monkeypatch)
+    assert corridas.count("corrida completa") == 1
+    assert "_excel_cache" not in at.session_state
+
+    # Las ediciones siguientes ya corren sólo el fragmento
+    corridas.clear()
+    correr_fragmento(at, monkeypatch)
+    assert corridas.count("corrida completa") == 0
+
+
+def test_un_pkl_sin_migrar_no_se_tapa_con_un_borrador_nuevo(almacen, tmp_path, monkeypatch):
+    # archivo_legado() busca el .pkl en la carpeta actual
+    monkeypatch.chdir(tmp_path)
+    progreso.archivo_legado(CUIT).write_bytes(pickle.dumps({"prov_real": "Santa Fe"}))
+
+    at = ingresar(CUIT)
+    assert any("no se migró" in aviso.value for aviso in at.warning)
+    at.selectbox(key="prov_real").set_value("Córdoba").run()
+    time.sleep(progreso.AUTOGUARDADO_ESPERA + 0.5)
+    at.run()
+
+    assert not almacen.existe(CUIT)
+    assert progreso.migrar_legado(almacen, tmp_path) == 1
+    assert almacen.cargar(CUIT) == {"prov_real": "Santa Fe"}
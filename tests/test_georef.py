@@ -0,0 +1,176 @@
+"""georef contra un servidor HTTP local que imita la API: paginado, reintentos y circuit breaker."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import georef
+
+PROVINCIAS = [{"nombre": "Córdoba"}, {"nombre": "Santa Fe"}]
+DEPARTAMENTOS = [
+    {"nombre": "Capital", "provincia": {"nombre": "Córdoba"}},
+    {"nombre": "Rosario", "provincia": {"nombre": "Santa Fe"}},
+]
+LOCALIDADES = [
+    {"nombre": nombre, "provincia": {"nombre": provincia}, "departamento": {"nombre": departamento}}
+    for provincia, departamento, nombre in [
+        ("Córdoba", "Capital", "Córdoba"),
+        ("Córdoba", "Capital", "Villa Allende"),
+        ("Santa Fe", "Rosario", "Rosario"),
+        ("Santa Fe", "Rosario", "Funes"),
+        ("Santa Fe", "Rosario", "Granadero Baigorria"),
+    ]
+]
+DATOS = {"provincias": PROVINCIAS, "departamentos": DEPARTAMENTOS, "localidades": LOCALIDADES}
+
+
+class APIFalsa(ThreadingHTTPServer):
+    """Sirve DATOS paginados como georef; ``fallas`` respuestas seguidas salen con ``estado_falla``"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Manejador)
+        self.fallas = 0
+        self.estado_falla = 503
+        self.pedidos = []  # (recurso, inicio, max) de cada pedido, también los fallidos
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        recurso = url.path.rsplit("/", 1)[-1]
+        params = parse_qs(url.query)
+        inicio, maximo = int(params["inicio"][0]), int(params["max"][0])
+        servidor = self.server
+        with servidor._lock:
+            servidor.pedidos.append((recurso, inicio, maximo))
+            fallar = servidor.fallas > 0
+            if fallar:
+                servidor.fallas -= 1
+        if fallar:
+            self.send_response(servidor.estado_falla)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        pagina = DATOS[recurso][inicio:inicio + maximo]
+        cuerpo = json.dumps({recurso: pagina, "cantidad": len(pagina), "total": len(DATOS[recurso]),
+                             "inicio": inicio}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    servidor = APIFalsa()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    monkeypatch.setattr(georef, "GEOREF_URL", servidor.url)
+    monkeypatch.setattr(georef, "GEOREF_BACKOFF", 0)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_pagina_hasta_traer_todo(api, monkeypatch):
+    monkeypatch.setattr(georef, "GEOREF_MAX", 2)
+    indice = georef.descargar_indice()
+
+    assert indice.provincias == ("Córdoba", "Santa Fe")
+    assert indice.departamentos("Santa Fe") == ("Rosario",)
+    assert indice.localidades("Santa Fe") == ("Funes", "Granadero Baigorria", "Rosario")
+    assert indice.localidades("Córdoba", "Capital") == ("Córdoba", "Villa Allende")
+    pedidos_localidades = sorted(inicio for recurso, inicio, _ in api.pedidos if recurso == "localidades")
+    assert pedidos_localidades == [0, 2, 4]
+
+
+@pytest.mark.parametrize("estado", [429, 503])
+def test_reintenta_429_y_5xx(api, estado):
+    api.fallas = georef.GEOREF_REINTENTOS
+    api.estado_falla = estado
+    indice = georef.descargar_indice()
+
+    assert indice.provincias == ("Córdoba", "Santa Fe")
+    assert len(api.pedidos) == len(georef.RECURSOS) + georef.GEOREF_REINTENTOS
+
+
+def test_agotados_los_reintentos_falla(api):
+    api.fallas = 1000
+    with pytest.raises(georef.requests.RequestException):
+        georef.descargar_indice()
+
+
+def test_breaker_duplica_la_espera_y_conserva_el_indice(api, tmp_path):
+    api.fallas = 1000
+    servicio = georef.ServicioGeografico(ruta=tmp_path / "snapshot.json.gz")
+    viejo = georef.IndiceGeografico(["Vieja"], {}, {})
+    servicio._indice = viejo
+
+    esperas = []
+    for _ in range(3):
+        servicio._refrescar()
+        esperas.append(servicio.espera())
+    # Con el circuito abierto se sigue sirviendo el índice viejo sin volver a llamar a la API
+    pedidos = len(api.pedidos)
+    servicio._ultimo_intento = georef.time.time()
+    assert servicio.indice is viejo
+    assert len(api.pedidos) == pedidos
+    assert esperas == [georef.REINTENTO_REFRESCO * 2 ** n for n in range(3)]
+
+    # Cuando la API vuelve, se cierra el circuito y se guarda el snapshot
+    api.fallas = 0
+    servicio._refrescar()
+    assert servicio._fallos == 0
+    assert servicio.indice.provincias == ("Córdoba", "Santa Fe")
+    assert georef.cargar_snapshot(tmp_path / "snapshot.json.gz").provincias == ("Córdoba", "Santa Fe")
+
+
+def test_el_tope_de_espera():
+    servicio = georef.ServicioGeografico()
+    servicio._fallos = 50
+    assert servicio.espera() == georef.REINTENTO_MAXIMO
+
+
+def test_refresco_no_escribe_el_snapshot_del_script(api, tmp_path, monkeypatch):
+    semilla = tmp_path / "semilla.json.gz"
+    georef.guardar_snapshot(georef.IndiceGeografico(["Semilla"], {}, {}), semilla)
+    monkeypatch.setattr(georef, "SNAPSHOT_PATH", semilla)
+    cache = tmp_path / "cache" / "snapshot.json.gz"
+    monkeypatch.setattr(georef, "SNAPSHOT_CACHE", cache)
+
+    servicio = georef.ServicioGeografico()
+    servicio._ultimo_intento = georef.time.time()  # sin refresco en segundo plano: se refresca a mano
+    assert servicio.indice.provincias == ("Semilla",)
+    servicio._refrescar()
+
+    assert georef.cargar_snapshot(semilla).provincias == ("Semilla",)
+    assert georef.cargar_snapshot(cache).provincias == ("Córdoba", "Santa Fe")
+    # Un proceso nuevo arranca del refrescado, que es más nuevo que la semilla
+    assert georef.ServicioGeografico(vigencia=3600).indice.provincias == ("Córdoba", "Santa Fe")
+
+
+# El snapshot que se versiona con el formulario (se toma antes de que otra prueba lo cambie)
+SNAPSHOT_DEL_REPO = georef.SNAPSHOT_PATH
+SEMILLA = georef.cargar_snapshot(SNAPSHOT_DEL_REPO).generado is None
+
+
+@pytest.mark.xfail(SEMILLA, strict=True,
+                   reason="el snapshot es la semilla sin descargar: regenerarlo con 'python georef.py' "
+                          "donde la API responda")
+def test_el_snapshot_versionado_tiene_todas_las_localidades():
+    indice = georef.cargar_snapshot(SNAPSHOT_DEL_REPO)
+    assert len(indice.provincias) == 24
+    for provincia in indice.provincias:
+        assert indice.departamentos(provincia), provincia
+        assert indice.localidades(provincia), provincia
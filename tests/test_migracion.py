@@ -0,0 +1,73 @@
+import pickle
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import pytest
+
+import progreso
+
+RAIZ = Path(__file__).resolve().parent.parent
+VIEJO = {"respuestas": {"Razón social": "Agro SA"}, "prov_real": "Santa Fe", "loc_real": "Rosario"}
+
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    # archivo_legado() busca los .pkl en la carpeta actual, como el formulario viejo
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def fila_pickle(almacen, cuit):
+    with almacen._conexion() as con:
+        con.execute(
+            "INSERT INTO progreso (cuit, formato, revision, actualizado, payload) VALUES (?, ?, 1, ?, ?)",
+            (cuit, progreso.FORMATO_PICKLE_ZLIB, time.time(), zlib.compress(pickle.dumps(VIEJO)))
+        )
+
+
+def test_cargar_no_lee_pickle(carpeta):
+    almacen = progreso.AlmacenProgreso(carpeta / "progreso.sqlite3")
+    (carpeta / "progreso_20111111111.pkl").write_bytes(pickle.dumps(VIEJO))
+    fila_pickle(almacen, "20222222222")
+
+    assert almacen.cargar("20111111111") is None
+    assert not almacen.existe("20111111111")
+    assert (carpeta / "progreso_20111111111.pkl").exists()
+    with pytest.raises(ValueError, match="--migrar"):
+        almacen.cargar("20222222222")
+
+
+@pytest.mark.parametrize("destino", ["progreso.sqlite3", "archivos://borradores"])
+def test_migrar_legado(carpeta, destino):
+    almacen = progreso.crear_almacen(destino)
+    (carpeta / "progreso_20111111111.pkl").write_bytes(pickle.dumps(VIEJO))
+    # Un .pkl de un CUIT que ya tiene un borrador más nuevo no lo pisa
+    almacen.guardar("20333333333", {"widgets": {"prov_real": "Córdoba"}})
+    (carpeta / "progreso_20333333333.pkl").write_bytes(pickle.dumps(VIEJO))
+    esperados = 1
+    if isinstance(almacen, progreso.AlmacenProgreso):
+        fila_pickle(almacen, "20222222222")
+        esperados = 2
+
+    assert progreso.migrar_legado(almacen, carpeta) == esperados
+    assert almacen.cargar("20111111111") == VIEJO
+    assert (carpeta / "progreso_20111111111.pkl.migrado").exists()
+    assert almacen.cargar("20333333333") == {"prov_real": "Córdoba"}
+    assert (carpeta / "progreso_20333333333.pkl").exists()
+    if esperados == 2:
+        assert almacen.cargar("20222222222") == VIEJO
+    # Una segunda corrida no encuentra nada
+    assert progreso.migrar_legado(almacen, carpeta) == 0
+
+
+def test_comando_migrar(carpeta):
+    (carpeta / "progreso_20111111111.pkl").write_bytes(pickle.dumps(VIEJO))
+    salida = subprocess.run(
+        [sys.executable, str(RAIZ / "progreso.py"), "--migrar", "--db", str(carpeta / "progreso.sqlite3")],
+        cwd=carpeta, capture_output=True, text=True, check=True
+    ).stdout
+    assert "1 borradores migrados" in salida
+    assert progreso.AlmacenProgreso(carpeta / "progreso.sqlite3").cargar("20111111111") == VIEJO
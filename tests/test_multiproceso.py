@@ -0,0 +1,88 @@
+"""Dos procesos (spawn, como dos réplicas) guardando y cargando el mismo CUIT a la vez."""
+import multiprocessing
+
+import pytest
+
+import progreso
+
+CUIT = "20111111111"
+SECCIONES = ["respuestas", "avales"]
+RONDAS = 40
+
+
+@pytest.fixture(params=["sqlite", "archivos"])
+def destino(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite://{tmp_path}/progreso.sqlite3"
+    return f"archivos://{tmp_path}/borradores"
+
+
+def correr(destino, trabajo):
+    """Corre ``trabajo(destino, numero, barrera)`` en dos procesos; devuelve sus errores juntos"""
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(2)
+    resultados = contexto.Queue()
+    hijos = [contexto.Process(target=_hijo, args=(trabajo, destino, numero, barrera, resultados)) for numero in range(2)]
+    for hijo in hijos:
+        hijo.start()
+    errores = [error for _ in hijos for error in resultados.get(timeout=120)]
+    for hijo in hijos:
+        hijo.join(10)
+        assert hijo.exitcode == 0
+    return errores
+
+
+def _hijo(trabajo, destino, numero, barrera, resultados):
+    try:
+        resultados.put(trabajo(destino, numero, barrera))
+    except Exception as e:
+        resultados.put([f"proceso {numero}: {e!r}"])
+        raise
+
+
+def _parciales(destino, numero, barrera):
+    """Guarda sólo su sección y carga el borrador entero, ronda tras ronda"""
+    almacen = progreso.crear_almacen(destino)
+    propia, ajena = SECCIONES[numero], SECCIONES[1 - numero]
+    errores = []
+    vista = -1
+    barrera.wait()
+    for ronda in range(RONDAS):
+        almacen.guardar(CUIT, {propia: {f"marca_{propia}": ronda}}, completo=False)
+        cargado = almacen.cargar(CUIT)
+        if cargado.get(f"marca_{propia}") != ronda:
+            errores.append(f"{propia}: guardó {ronda} y cargó {cargado.get(f'marca_{propia}')}")
+        ajena_vista = cargado.get(f"marca_{ajena}", -1)
+        if ajena_vista < vista:
+            errores.append(f"{ajena}: volvió de {vista} a {ajena_vista}")
+        vista = ajena_vista
+    return errores
+
+
+def _enteros(destino, numero, barrera):
+    """El proceso 0 guarda borradores completos; el 1 los carga y nunca tiene que ver uno mezclado"""
+    almacen = progreso.crear_almacen(destino)
+    errores = []
+    barrera.wait()
+    for ronda in range(RONDAS):
+        if numero == 0:
+            almacen.guardar(CUIT, {seccion: {f"marca_{seccion}": ronda} for seccion in SECCIONES})
+            continue
+        cargado = almacen.cargar(CUIT)
+        if cargado is not None and cargado["marca_respuestas"] != cargado["marca_avales"]:
+            errores.append(f"borrador mezclado: {cargado}")
+    return errores
+
+
+def test_guardados_parciales_intercalados(destino):
+    assert correr(destino, _parciales) == []
+    assert progreso.crear_almacen(destino).cargar(CUIT) == {
+        "marca_respuestas": RONDAS - 1, "marca_avales": RONDAS - 1
+    }
+
+
+def test_se_carga_un_borrador_entero_o_el_anterior(destino):
+    assert correr(destino, _enteros) == []
+    assert progreso.crear_almacen(destino).cargar(CUIT) == {
+        "marca_respuestas": RONDAS - 1, "marca_avales": RONDAS - 1
+    }
@@ -0,0 +1,82 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import progreso
+
+RAIZ = Path(__file__).resolve().parent.parent
+CUIT = "20111111111"
+
+
+def borrador(numero):
+    return {"respuestas": {"respuestas": {"Razón social": f"Agro {numero}"}}, "avales": {"avales": [numero]}}
+
+
+def test_conserva_las_ultimas_versiones(tmp_path):
+    almacen = progreso.AlmacenProgreso(tmp_path / "progreso.sqlite3", versiones=2)
+    for numero in range(1, 5):
+        almacen.guardar(CUIT, borrador(numero))
+
+    # Vigente la revisión 4; quedan la 3 y la 2
+    assert [revision for revision, _ in almacen.versiones_guardadas(CUIT)] == [3, 2]
+    almacen.restaurar(CUIT, 2)
+    assert almacen.cargar(CUIT) == {"respuestas": {"Razón social": "Agro 2"}, "avales": [2]}
+    # Lo que se reemplazó al restaurar también se puede recuperar
+    assert [revision for revision, _ in almacen.versiones_guardadas(CUIT)] == [4, 3]
+    with pytest.raises(KeyError):
+        almacen.restaurar(CUIT, 1)
+
+
+def test_los_guardados_parciales_no_rotan_versiones(tmp_path):
+    almacen = progreso.AlmacenProgreso(tmp_path / "progreso.sqlite3", versiones=2)
+    almacen.guardar(CUIT, borrador(1))
+    almacen.guardar(CUIT, borrador(2))
+    for numero in range(10):
+        almacen.guardar(CUIT, {"avales": {"avales": [numero]}}, completo=False)
+    assert [revision for revision, _ in almacen.versiones_guardadas(CUIT)] == [1]
+
+    # El guardado completo siguiente guarda el borrador con todos los cambios parciales
+    almacen.guardar(CUIT, borrador(3))
+    assert [revision for revision, _ in almacen.versiones_guardadas(CUIT)] == [12, 1]
+    almacen.restaurar(CUIT, 12)
+    assert almacen.cargar(CUIT) == {"respuestas": {"Razón social": "Agro 2"}, "avales": [9]}
+
+
+def test_sin_versiones(tmp_path):
+    almacen = progreso.AlmacenProgreso(tmp_path / "progreso.sqlite3", versiones=0)
+    almacen.guardar(CUIT, borrador(1))
+    almacen.guardar(CUIT, borrador(2))
+    assert almacen.versiones_guardadas(CUIT) == []
+
+
+def test_borrar_y_expirar_se_llevan_las_versiones(tmp_path):
+    almacen = progreso.AlmacenProgreso(tmp_path / "progreso.sqlite3")
+    for cuit in (CUIT, "20222222222"):
+        almacen.guardar(cuit, borrador(1))
+        almacen.guardar(cuit, borrador(2))
+
+    almacen.borrar(CUIT)
+    assert almacen.versiones_guardadas(CUIT) == []
+    almacen.expirar(-1)
+    assert almacen.versiones_guardadas("20222222222") == []
+
+
+def test_sincronizacion_completa(tmp_path):
+    almacen = progreso.AlmacenProgreso(tmp_path / "progreso.sqlite3")
+    # 2 = FULL
+    assert almacen._conexion().execute("PRAGMA synchronous").fetchone()[0] == 2
+
+
+def test_comando_restaurar(tmp_path):
+    db = tmp_path / "progreso.sqlite3"
+    almacen = progreso.AlmacenProgreso(db)
+    almacen.guardar(CUIT, borrador(1))
+    almacen.guardar(CUIT, borrador(2))
+
+    comando = [sys.executable, str(RAIZ / "progreso.py"), "--db", str(db)]
+    salida = subprocess.run(comando + ["--versiones", CUIT], capture_output=True, text=True, check=True).stdout
+    assert salida.startswith("1\t")
+    subprocess.run(comando + ["--restaurar", CUIT, "1"], capture_output=True, text=True, check=True)
+    assert almacen.cargar(CUIT)["respuestas"] == {"Razón social": "Agro 1"}
@@ -0,0 +1,103 @@
+"""Ventas y compras mensuales del formulario en una sola tabla larga.
+
+Hay una fila por (flujo, fila de la tabla ancha, año), con estas columnas:
+    Flujo, Fila, Año, Mes, Tipo, Subtipo, Región, Monto
+Todas son categóricas salvo Fila (int32) y Monto (float64). Dentro
+de cada flujo las filas van por año (en el orden de COLUMNAS_ANIO) y, dentro
+de cada año, en el orden de la tabla ancha. Las tablas anchas que muestran los
+editores y que van al Excel (Mes, Tipo, Subtipo, una columna por año y Región
+en ventas externas) son proyecciones de esta tabla.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import opciones
+
+FLUJOS = ["ventas_interno", "ventas_externo", "compras"]
+FLUJO_CON_REGION = "ventas_externo"
+COLUMNAS_ANIO = ["Año en curso", "Año 1", "Año 2", "Año 3"]
+
+COLUMNAS = ["Flujo", "Fila", "Año", "Mes", "Tipo", "Subtipo", "Región", "Monto"]
+
+
+def vacia():
+    """Tabla larga sin filas"""
+    return desde_anchas({})
+
+
+def desde_ancha(flujo, ancha):
+    """Tabla larga de un flujo a partir de su tabla ancha"""
+    n = len(ancha)
+    anios = len(COLUMNAS_ANIO)
+
+    def repetir(columna, defecto=None):
+        if columna not in ancha:
+            return np.full(n * anios, defecto, dtype=object)
+        return np.tile(ancha[columna].to_numpy(dtype=object), anios)
+
+    montos = [
+        pd.to_numeric(ancha[columna], errors="coerce").to_numpy(dtype="float64") if columna in ancha
+        else np.zeros(n)
+        for columna in COLUMNAS_ANIO
+    ]
+    return pd.DataFrame({
+        "Flujo": pd.Categorical([flujo] * (n * anios), categories=FLUJOS),
+        "Fila": np.tile(np.arange(n, dtype="int32"), anios),
+        "Año": pd.Categorical.from_codes(np.repeat(np.arange(anios), n), categories=COLUMNAS_ANIO),
+        "Mes": opciones.categorica(repetir("Mes"), opciones.MESES),
+        "Tipo": opciones.categorica(repetir("Tipo"), opciones.TIPOS_ACTIVIDAD),
+        # Las tablas de tipos que no son agropecuarios se guardaban sin Subtipo
+        "Subtipo": opciones.categorica(repetir("Subtipo", "COMPLETAR"), opciones.SUBCATEGORIAS_AGRO),
+        # Texto libre, pero con pocos valores distintos: también conviene como categórica
+        "Región": opciones.categorica(repetir("Región", "" if flujo == FLUJO_CON_REGION else None), []),
+        "Monto": np.concatenate(montos) if montos else np.zeros(0),
+    }, columns=COLUMNAS)
+
+
+def _unir(partes):
+    # Columna por columna: union_categoricals suma las categorías nuevas al final sin pasar por object
+    partes = [parte for parte in partes if len(parte)] or partes[:1]
+    columnas = {}
+    for columna in COLUMNAS:
+        if isinstance(partes[0][columna].dtype, pd.CategoricalDtype):
+            columnas[columna] = union_categoricals([parte[columna] for parte in partes])
+        else:
+            columnas[columna] = np.concatenate([parte[columna].to_numpy() for parte in partes])
+    return pd.DataFrame(columnas, columns=COLUMNAS)
+
+
+def desde_anchas(anchas):
+    """Tabla larga a partir de {flujo: tabla ancha}, en el orden de FLUJOS"""
+    return _unir([desde_ancha(flujo, anchas.get(flujo, pd.DataFrame())) for flujo in FLUJOS])
+
+
+def a_ancha(largo, flujo):
+    """Tabla ancha de un flujo (la que muestran los editores y va al Excel).
+
+    Mes, Tipo y Subtipo siguen siendo categóricas; Región va como texto porque en
+    el editor es una columna libre.
+    """
+    datos = largo[largo["Flujo"] == flujo]
+    n = len(datos) // len(COLUMNAS_ANIO)
+    base = datos.iloc[:n]
+    ancha = pd.DataFrame({
+        "Mes": base["Mes"].array,
+        "Tipo": base["Tipo"].array,
+        "Subtipo": base["Subtipo"].array,
+    })
+    montos = datos["Monto"].to_numpy().reshape(len(COLUMNAS_ANIO), n)
+    for i, columna in enumerate(COLUMNAS_ANIO):
+        ancha[columna] = montos[i]
+    if flujo == FLUJO_CON_REGION:
+        ancha["Región"] = base["Región"].to_numpy()
+    return ancha
+
+
+def reemplazar_flujo(largo, flujo, ancha):
+    """Tabla larga con las filas de ``flujo`` reemplazadas por las de la tabla ancha"""
+    partes = [
+        desde_ancha(flujo, ancha) if nombre == flujo else largo[largo["Flujo"] == nombre]
+        for nombre in FLUJOS
+    ]
+    return _unir(partes)